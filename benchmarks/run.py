@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite
+=======================
+
+Measures the Story Renderer without network access or a GLM API key: every
+LLM call is answered by the fake backend (``core.fake_llm``) after a
+configurable latency, so the numbers reflect our own overhead plus a
+controlled, deterministic upstream delay.
+
+Measured:
+  * ontology load time (source parse vs. snapshot quick-load)
+  * extract_soul / process overhead (fake latency 0)
+  * /api/render and /api/upload throughput and p50/p99 latency under concurrency
+  * memory per request (tracemalloc peak)
+
+Usage:
+    python benchmarks/run.py
+    python benchmarks/run.py --latency 0.2 --requests 400 --concurrency 32
+    python benchmarks/run.py --baseline benchmarks/results/old.json
+
+Results are written as JSON (default: benchmarks/results/bench-<timestamp>.json).
+With --baseline, the change of every latency/throughput figure is printed.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+ONTOLOGY_PATH = PROJECT_ROOT / "ontology"
+SAMPLE_TEXT = (PROJECT_ROOT / "data" / "hashire_merosu_base.txt").read_text(encoding="utf-8")
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds"""
+    ms = [s * 1000 for s in samples]
+    return {
+        "n": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "max_ms": round(max(ms), 3),
+    }
+
+
+def timed(fn: Callable[[], Any], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def unique_text(i: int) -> str:
+    # Distinct inputs defeat the soul cache and MemU so every call does the full work
+    return f"{SAMPLE_TEXT[:1500]}\n（第{i}稿）"
+
+
+def bench_ontology(repeat: int) -> Dict[str, Any]:
+    from core.engine import OntologyLoader
+    from core.snapshot import parse_sources, build_snapshot
+
+    build_snapshot(ONTOLOGY_PATH)
+    loader = OntologyLoader(ONTOLOGY_PATH)
+    return {
+        "parse_sources": summarize(timed(lambda: parse_sources(ONTOLOGY_PATH), repeat)),
+        "loader_from_snapshot": summarize(timed(lambda: OntologyLoader(ONTOLOGY_PATH), repeat)),
+        "concepts": len(loader.concepts),
+        "nodes": len(loader.nodes),
+    }
+
+
+def bench_engine(repeat: int) -> Dict[str, Any]:
+    from core.engine import StoryEngine
+    from core.fake_llm import FakeLLMClient, AsyncFakeLLMClient
+
+    engine = StoryEngine(ONTOLOGY_PATH)
+    engine.llm, engine.async_llm = FakeLLMClient(latency=0), AsyncFakeLLMClient(latency=0)
+
+    counter = iter(range(10 ** 9))
+    results = {
+        "extract_soul_cold": summarize(timed(lambda: engine.extract_soul(unique_text(next(counter))), repeat)),
+        "extract_soul_cached": summarize(timed(lambda: engine.extract_soul(unique_text(0)), repeat)),
+        "process_cold": summarize(timed(lambda: engine.process(unique_text(next(counter)), "jidai"), repeat)),
+    }
+
+    tracemalloc.start()
+    engine.process(unique_text(next(counter)), "jidai")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results["process_peak_bytes"] = peak
+    engine.memory.close()
+    return results
+
+
+async def run_load(send: Callable[[int], Awaitable[int]], requests: int, concurrency: int) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            status = await send(i)
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        **summarize(latencies),
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 2),
+    }
+
+
+def make_pdf(pages: int) -> bytes:
+    try:
+        from pypdf import PdfWriter
+    except ImportError:
+        return b""
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(595, 842)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+async def bench_api(requests: int, concurrency: int) -> Dict[str, Any]:
+    import httpx
+    from api.main import app
+
+    results: Dict[str, Any] = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+
+            async def render(i: int) -> int:
+                response = await client.post("/api/render", json={"text": unique_text(i), "domain": "jidai"})
+                return response.status_code
+
+            async def render_cached(i: int) -> int:
+                response = await client.post("/api/render", json={"text": unique_text(0), "domain": "jidai"})
+                return response.status_code
+
+            text_body = SAMPLE_TEXT.encode("utf-8")
+
+            async def upload_text(i: int) -> int:
+                response = await client.post("/api/upload", files={"file": ("story.txt", text_body)})
+                return response.status_code
+
+            pdf_body = make_pdf(20)
+
+            async def upload_pdf(i: int) -> int:
+                response = await client.post("/api/upload", files={"file": ("story.pdf", pdf_body)})
+                return response.status_code
+
+            tracemalloc.start()
+            results["render"] = await run_load(render, requests, concurrency)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results["render"]["peak_bytes_per_inflight_request"] = peak // concurrency
+
+            results["render_cached"] = await run_load(render_cached, requests, concurrency)
+            results["upload_text"] = await run_load(upload_text, requests, concurrency)
+            if pdf_body:
+                results["upload_pdf_20_pages"] = await run_load(upload_pdf, max(1, requests // 4), concurrency)
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def flatten(data: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    now, before = flatten(current["results"]), flatten(baseline["results"])
+    print(f"\nChange vs. baseline {baseline['meta'].get('git_revision')} ({baseline['meta'].get('timestamp')}):")
+    for name, value in now.items():
+        old = before.get(name)
+        if not old or not name.endswith(("_ms", "_rps", "_bytes")) or ".max_ms" in name:
+            continue
+        delta = 100 * (value - old) / old
+        print(f"  {name:<55} {old:>12.3f} -> {value:>12.3f}  ({delta:+.1f}%)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline Story Renderer benchmarks")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake LLM latency per call (seconds)")
+    parser.add_argument("--repeat", type=int, default=50, help="Iterations for micro benchmarks")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per API load test")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent API requests")
+    parser.add_argument("--output", type=Path, help="Result JSON path")
+    parser.add_argument("--baseline", type=Path, help="Earlier result JSON to compare against")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="lnaes-bench-")
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "FAKE_LLM_LATENCY": str(args.latency),
+        "MEMU_DB_PATH": str(Path(workdir) / "memu.sqlite3"),
+        "DOCUMENT_STORE_DIR": str(Path(workdir) / "documents"),
+        "RENDER_QUEUE_SIZE": str(max(32, args.requests)),
+    })
+    os.environ.pop("SOUL_CACHE_DIR", None)
+    os.environ.pop("PROSE_CACHE_DIR", None)
+    sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+    started = time.time()
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+        },
+        "results": {},
+    }
+    print("ontology ...", flush=True)
+    report["results"]["ontology"] = bench_ontology(args.repeat)
+    print("engine ...", flush=True)
+    report["results"]["engine"] = bench_engine(args.repeat)
+    print("api ...", flush=True)
+    report["results"]["api"] = asyncio.run(bench_api(args.requests, args.concurrency))
+    report["meta"]["duration_s"] = round(time.time() - started, 2)
+
+    output = args.output or PROJECT_ROOT / "benchmarks" / "results" / f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(json.dumps(report["results"], ensure_ascii=False, indent=2))
+    print(f"\nWritten to {output}")
+
+    if args.baseline:
+        compare(report, json.loads(args.baseline.read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+In-process fake Neo4j driver
+============================
+
+Drop-in stand-in for ``neo4j.Driver`` that records every query instead of
+talking to a database. Pass it to ``LNAESv3OntologyManager.connect_neo4j(driver=...)``
+to exercise the bulk loader offline (dry runs, round-trip counting, tests).
+
+Only the subset of the driver API used by the manager is implemented:
+``session()``, ``session.run()``, ``session.begin_transaction()``,
+``tx.run()/commit()/rollback()`` and ``result.single()``.
+"""
+
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+
+@dataclass
+class RecordedQuery:
+    """A query as seen by the fake driver"""
+    query: str
+    params: Dict[str, Any]
+    transaction: Optional[int]  # None for auto-commit
+
+
+@dataclass
+class FakeResult:
+    records: List[Dict[str, Any]] = field(default_factory=list)
+
+    def single(self) -> Optional[Dict[str, Any]]:
+        return self.records[0] if self.records else None
+
+    def consume(self) -> None:
+        return None
+
+
+class FakeTransaction:
+    def __init__(self, driver: "FakeNeo4jDriver", tx_id: int):
+        self.driver = driver
+        self.tx_id = tx_id
+        self.pending: List[RecordedQuery] = []
+        self.closed = False
+
+    def run(self, query: str, parameters: Optional[Dict[str, Any]] = None, **kwargs) -> FakeResult:
+        params = {**(parameters or {}), **kwargs}
+        self.driver._check_failure(query)
+        self.pending.append(RecordedQuery(query, params, self.tx_id))
+        return FakeResult()
+
+    def commit(self) -> None:
+        with self.driver._lock:
+            self.driver.queries.extend(self.pending)
+            self.driver.commits += 1
+        self.closed = True
+
+    def rollback(self) -> None:
+        with self.driver._lock:
+            self.driver.rollbacks += 1
+        self.pending = []
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.closed:
+            self.rollback() if exc_type else self.commit()
+
+
+class FakeSession:
+    def __init__(self, driver: "FakeNeo4jDriver"):
+        self.driver = driver
+
+    def run(self, query: str, parameters: Optional[Dict[str, Any]] = None, **kwargs) -> FakeResult:
+        params = {**(parameters or {}), **kwargs}
+        self.driver._check_failure(query)
+        with self.driver._lock:
+            self.driver.queries.append(RecordedQuery(query, params, None))
+            self.driver.auto_commits += 1
+            # Minimal support for the loader's checksum bookkeeping
+            if "OntologyLoad" in query:
+                name = params.get("name")
+                if query.lstrip().startswith("MERGE"):
+                    self.driver.checksums[name] = params.get("checksum")
+                elif name in self.driver.checksums:
+                    return FakeResult([{"checksum": self.driver.checksums[name]}])
+        return FakeResult()
+
+    def begin_transaction(self) -> FakeTransaction:
+        with self.driver._lock:
+            self.driver._next_tx += 1
+            return FakeTransaction(self.driver, self.driver._next_tx)
+
+    def close(self) -> None:
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class FakeNeo4jDriver:
+    """
+    Records queries in ``queries``; ``commits``/``auto_commits`` count round trips.
+    ``fail_on`` is an optional regex: matching queries raise, to simulate bad statements.
+    """
+
+    def __init__(self, fail_on: Optional[str] = None):
+        self.queries: List[RecordedQuery] = []
+        self.checksums: Dict[str, str] = {}
+        self.commits = 0
+        self.rollbacks = 0
+        self.auto_commits = 0
+        self._next_tx = 0
+        self._lock = threading.Lock()
+        self._fail: Optional[Callable[[str], bool]] = re.compile(fail_on).search if fail_on else None
+
+    def _check_failure(self, query: str) -> None:
+        if self._fail is not None and self._fail(query):
+            raise RuntimeError(f"Simulated failure for query: {query[:60]}")
+
+    def session(self, **kwargs) -> FakeSession:
+        return FakeSession(self)
+
+    def close(self) -> None:
+        return None
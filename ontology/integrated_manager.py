@@ -11,14 +11,77 @@ Version: 3.0
 """
 
 import os
+import re
 import json
+import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 import yaml
-import neo4j
 from dataclasses import dataclass
 
+try:
+    import neo4j
+except ImportError:  # Optional: only needed for a real database connection
+    neo4j = None
+
+# Checksum bookkeeping so unchanged files are not reloaded
+_CHECKSUM_READ = "MATCH (l:OntologyLoad {name: $name}) RETURN l.checksum AS checksum"
+_CHECKSUM_WRITE = "MERGE (l:OntologyLoad {name: $name}) SET l.checksum = $checksum, l.loaded_at = datetime()"
+
+_SCHEMA_RE = re.compile(r"\s*(CREATE|DROP)\s+(INDEX|CONSTRAINT)\b", re.I)
+_NODE_MERGE_RE = re.compile(r"MERGE\s*\(\s*\w*\s*((?::\w+)+)\s*\{([^{}]*)\}\s*\)", re.S)
+_PROP_RE = re.compile(r"""(\w+)\s*:\s*('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|[-+]?\d+(?:\.\d+)?|true|false)\s*(?:,|$)""")
+_CREATED_LABEL_RE = re.compile(r"MERGE\s*\(\s*\w*\s*((?::\w+)+)")
+_MATCHED_LABEL_RE = re.compile(r"MATCH\s*\(\s*\w*\s*((?::\w+)+)")
+
+
+def _strip_comments(text: str) -> str:
+    return "\n".join(line.split("//", 1)[0] for line in text.splitlines())
+
+
+def _split_statements(cypher_content: str) -> List[str]:
+    return [stmt.strip() for stmt in _strip_comments(cypher_content).split(';') if stmt.strip()]
+
+
+def _labels(pattern: re.Pattern, content: str) -> set:
+    # Every label of multi-label patterns such as (:Concept:Emotion)
+    return {label for labels in pattern.findall(content) for label in labels.split(":") if label}
+
+
+def _parse_literal(raw: str) -> Any:
+    if raw[0] in "'\"":
+        return raw[1:-1].replace("\\" + raw[0], raw[0])
+    if raw in ("true", "false"):
+        return raw == "true"
+    return float(raw) if "." in raw else int(raw)
+
+
+def _parse_node_merges(statement: str) -> Optional[List[Tuple[str, Dict[str, Any]]]]:
+    """Return [(labels, props)] if the statement is nothing but literal node MERGEs, else None"""
+    merges = []
+    pos = 0
+    for match in _NODE_MERGE_RE.finditer(statement):
+        if statement[pos:match.start()].strip():
+            return None
+        body = match.group(2).strip()
+        props = {}
+        covered = 0
+        for prop in _PROP_RE.finditer(body):
+            if body[covered:prop.start()].strip():
+                return None
+            props[prop.group(1)] = _parse_literal(prop.group(2))
+            covered = prop.end()
+        if body[covered:].strip() or not props:
+            return None
+        merges.append((match.group(1), props))
+        pos = match.end()
+    if statement[pos:].strip() or not merges:
+        return None
+    return merges
+
+
 @dataclass
 class OntologyConfig:
     """Configuration for individual ontology"""
@@ -53,6 +116,8 @@ class LNAESv3OntologyManager:
         self.config_path = config_path or self._get_default_config_path()
         self.ontologies: Dict[str, OntologyConfig] = {}
         self.neo4j_driver = None
+        self.tx_batch_size = 100       # operations per explicit transaction
+        self.unwind_batch_size = 500   # rows per UNWIND batch
         self.aesthetic_standards = self._load_yuki_aesthetic_standards()
         
         # Load configuration
@@ -240,67 +305,187 @@ class LNAESv3OntologyManager:
         
         self.ontologies = default_ontologies
     
-    def connect_neo4j(self, uri: str = "bolt://localhost:7687", 
-                     user: str = "neo4j", password: str = "userpass123"):
-        """Connect to Neo4j database"""
+    def connect_neo4j(self, uri: str = "bolt://localhost:7687",
+                     user: str = "neo4j", password: str = "userpass123",
+                     driver: Any = None):
+        """Connect to Neo4j database (or use an already constructed driver, e.g. a fake)"""
+        if driver is not None:
+            self.neo4j_driver = driver
+            return
+        if neo4j is None:
+            raise RuntimeError("neo4j package is not installed")
         try:
             self.neo4j_driver = neo4j.GraphDatabase.driver(uri, auth=(user, password))
             self.logger.info("Connected to Neo4j database")
         except Exception as e:
             self.logger.error(f"Failed to connect to Neo4j: {e}")
             raise
-    
-    def load_ontology_to_neo4j(self, ontology_name: str) -> bool:
-        """Load specific ontology to Neo4j"""
+
+    def _plan_statements(self, cypher_content: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """Turn a .cypher file into (query, params) operations, batching node MERGE runs into UNWINDs"""
+        operations: List[Tuple[str, Dict[str, Any]]] = []
+        shape = None
+        rows: List[Dict[str, Any]] = []
+
+        def flush():
+            nonlocal shape, rows
+            if rows:
+                labels, keys = shape
+                pattern = ", ".join(f"`{k}`: row.`{k}`" for k in keys)
+                operations.append((f"UNWIND $rows AS row MERGE (n{labels} {{{pattern}}})", {"rows": rows}))
+            shape, rows = None, []
+
+        for statement in _split_statements(cypher_content):
+            merges = _parse_node_merges(statement)
+            if merges is None:
+                flush()
+                operations.append((statement, {}))
+                continue
+            for labels, props in merges:
+                row_shape = (labels, tuple(props))
+                if row_shape != shape or len(rows) >= self.unwind_batch_size:
+                    flush()
+                    shape = row_shape
+                rows.append(props)
+        flush()
+        return operations
+
+    def _run_operations(self, session, ontology_name: str,
+                        operations: List[Tuple[str, Dict[str, Any]]]) -> int:
+        """Run operations in explicit transactions of tx_batch_size; returns the number that failed"""
+        failed = 0
+        batch: List[Tuple[str, Dict[str, Any]]] = []
+
+        def commit(ops):
+            nonlocal failed
+            if not ops:
+                return
+            try:
+                tx = session.begin_transaction()
+                try:
+                    for query, params in ops:
+                        tx.run(query, params)
+                    tx.commit()
+                except Exception:
+                    tx.rollback()
+                    raise
+            except Exception as tx_error:
+                # Retry one by one so a single bad statement doesn't drop the whole batch
+                self.logger.debug(f"Transaction failed for {ontology_name}, retrying individually: {tx_error}")
+                for query, params in ops:
+                    try:
+                        session.run(query, params)
+                    except Exception as stmt_error:
+                        failed += 1
+                        self.logger.warning(f"Statement failed for {ontology_name}: {stmt_error}")
+
+        for query, params in operations:
+            if _SCHEMA_RE.match(query):
+                # Schema changes cannot share a transaction with writes
+                commit(batch)
+                batch = []
+                try:
+                    session.run(query, params)
+                except Exception as stmt_error:
+                    failed += 1
+                    self.logger.warning(f"Schema statement failed for {ontology_name}: {stmt_error}")
+                continue
+            batch.append((query, params))
+            if len(batch) >= self.tx_batch_size:
+                commit(batch)
+                batch = []
+        commit(batch)
+        return failed
+
+    def load_ontology_to_neo4j(self, ontology_name: str, force: bool = False) -> bool:
+        """Load specific ontology to Neo4j, skipping it if its checksum is unchanged"""
         if ontology_name not in self.ontologies:
             self.logger.error(f"Unknown ontology: {ontology_name}")
             return False
-        
+
         onto_config = self.ontologies[ontology_name]
         ontology_path = Path(__file__).parent / onto_config.file_path
-        
+
         if not ontology_path.exists():
             self.logger.error(f"Ontology file not found: {ontology_path}")
             return False
-        
+
         try:
             with open(ontology_path, 'r', encoding='utf-8') as f:
                 cypher_content = f.read()
-            
-            # Split cypher statements by semicolon and execute individually
-            statements = [stmt.strip() for stmt in cypher_content.split(';') if stmt.strip()]
-            
+            checksum = hashlib.sha256(cypher_content.encode('utf-8')).hexdigest()
+
             with self.neo4j_driver.session() as session:
-                for i, statement in enumerate(statements):
-                    if statement:  # Skip empty statements
-                        try:
-                            session.run(statement)
-                            self.logger.debug(f"Executed statement {i+1}/{len(statements)} for {ontology_name}")
-                        except Exception as stmt_error:
-                            self.logger.warning(f"Statement {i+1} failed for {ontology_name}: {stmt_error}")
-                            # Continue with next statement instead of failing completely
-                
-                self.logger.info(f"Successfully loaded ontology: {ontology_name} ({len(statements)} statements)")
+                if not force:
+                    record = session.run(_CHECKSUM_READ, {"name": ontology_name}).single()
+                    if record is not None and record["checksum"] == checksum:
+                        self.logger.info(f"Skipped unchanged ontology: {ontology_name}")
+                        return True
+
+                operations = self._plan_statements(cypher_content)
+                failed = self._run_operations(session, ontology_name, operations)
+
+                # Only remember the checksum of a clean load so failures are retried next time
+                if failed == 0:
+                    session.run(_CHECKSUM_WRITE, {"name": ontology_name, "checksum": checksum})
+
+                self.logger.info(f"Successfully loaded ontology: {ontology_name} "
+                                 f"({len(operations)} operations, {failed} failed)")
                 return True
-                
+
         except Exception as e:
             self.logger.error(f"Failed to load ontology {ontology_name}: {e}")
             return False
-    
-    def load_all_ontologies(self) -> Dict[str, bool]:
+
+    def _dependency_waves(self, names: List[str]) -> List[List[str]]:
+        """Split ontologies of one layer into waves that can be loaded concurrently"""
+        created: Dict[str, set] = {}
+        matched: Dict[str, set] = {}
+        for name in names:
+            path = Path(__file__).parent / self.ontologies[name].file_path
+            try:
+                content = _strip_comments(path.read_text(encoding='utf-8'))
+            except OSError:
+                content = ""
+            created[name] = _labels(_CREATED_LABEL_RE, content)
+            matched[name] = _labels(_MATCHED_LABEL_RE, content) - created[name]
+
+        def blocked(n: str, remaining: List[str]) -> bool:
+            # Wait for files that create labels we MATCH, and never MERGE the
+            # same label concurrently with an earlier file (MERGE races duplicate nodes)
+            earlier = remaining[:remaining.index(n)]
+            return (any(matched[n] & created[o] for o in remaining if o != n)
+                    or any(created[n] & created[o] for o in earlier))
+
+        remaining = list(names)
+        waves = []
+        while remaining:
+            wave = [n for n in remaining if not blocked(n, remaining)]
+            if not wave:
+                # Cyclic dependency: fall back to loading the rest one by one
+                waves.extend([n] for n in remaining)
+                break
+            waves.append(wave)
+            remaining = [n for n in remaining if n not in wave]
+        return waves
+
+    def load_all_ontologies(self, max_workers: int = 4, force: bool = False) -> Dict[str, bool]:
         """Load all ontologies to Neo4j"""
         results = {}
-        
-        # Load in layer order (foundation first, meta last)
+
+        # Load in layer order (foundation first, meta last); independent
+        # ontologies within a layer are loaded concurrently
         layer_order = ["foundation", "relational", "structural", "cultural", "advanced", "meta", "emotions"]
-        
-        for layer in layer_order:
-            layer_ontologies = [name for name, config in self.ontologies.items() 
-                              if config.layer == layer]
-            
-            for onto_name in layer_ontologies:
-                results[onto_name] = self.load_ontology_to_neo4j(onto_name)
-        
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for layer in layer_order:
+                layer_ontologies = [name for name, config in self.ontologies.items()
+                                  if config.layer == layer]
+
+                for wave in self._dependency_waves(layer_ontologies):
+                    loaded = pool.map(lambda name: self.load_ontology_to_neo4j(name, force=force), wave)
+                    results.update(zip(wave, loaded))
+
         return results
     
     def get_ontology_weights(self, aesthetic_context: str = "default") -> Dict[str, float]:
@@ -1,18 +1,17 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from pathlib import Path
 import sys
-import shutil
-from typing import Optional
-
-# Attempt to import pypdf for PDF processing
-try:
-    from pypdf import PdfReader
-    HAS_PYPDF = True
-except ImportError:
-    HAS_PYPDF = False
+import hmac
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Literal, Optional
 
 # Setup paths
 current_dir = Path(__file__).resolve().parent
@@ -20,8 +19,34 @@ project_root = current_dir.parent.parent
 sys.path.append(str(project_root / "src"))
 
 from core.engine import StoryEngine
+from core.schema import StorySoul
+from core.jobs import JobQueue, QueueFullError
+from core.metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, HTTP_REQUESTS, HTTP_LATENCY, RENDER_JOBS,
+    UPLOAD_BYTES, UPLOAD_PDF_PAGES,
+)
+from core.tracing import trace, profile, profile_dir_from_env
+from core.ingest import HAS_PYPDF, IngestLimitError, PdfExtractor, spool_upload
+
+# Initialize Engine
+ontology_path = project_root / "ontology"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the engine once per process; every request shares it
+    app.state.engine = StoryEngine(ontology_path)
+    # Per-request cProfile/tracemalloc capture is only possible when PROFILE_DIR is set
+    app.state.profile_dir = profile_dir_from_env()
+    app.state.jobs = JobQueue.from_env()
+    app.state.jobs.start()
+    app.state.pdf = PdfExtractor.from_env()
+    yield
+    app.state.pdf.shutdown()
+    await app.state.jobs.stop()
+    await app.state.engine.aclose()
+    app.state.engine = None
 
-app = FastAPI(title="Universal Story Renderer API")
+app = FastAPI(title="Universal Story Renderer API", lifespan=lifespan)
 
 # Allow CORS for development
 app.add_middleware(
@@ -32,32 +57,162 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize Engine
-ontology_path = project_root / "ontology"
-# Note: Engine might need to be initialized lazily or mocked if ontology doesn't exist yet
-# engine = StoryEngine(ontology_path)
+@app.middleware("http")
+async def record_http_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template (not raw path) to keep cardinality bounded
+        route = request.scope.get("route")
+        path = getattr(route, "path", None) or "unmatched"
+        HTTP_REQUESTS.inc(route=path, method=request.method, status=str(status))
+        HTTP_LATENCY.observe(time.perf_counter() - started, route=path, method=request.method)
 
 # Preset path
 preset_path = project_root / "assets" / "preset.md"
 
+# Uploads larger than this are rejected with 413 (PDF page limit: PDF_MAX_PAGES)
+MAX_UPLOAD_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(20 * 1024 * 1024)))
+# Shared secret for admin endpoints (/api/reload); unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
 class StoryRequest(BaseModel):
-    text: str
+    text: Optional[str] = None # May be omitted when document_id refers to a stored document
     domain: str
+    document_id: Optional[str] = None # Stored document to render; sent with edited text, the document it was edited from (only changed parts are re-extracted)
+    trace: bool = False # Return structured timing spans (or send X-Trace: 1)
+    profile: bool = False # Write cProfile/tracemalloc output to PROFILE_DIR (or send X-Profile: 1)
+    mode: Optional[Literal["whole", "scenes"]] = None # "scenes" renders scenes in parallel; defaults to STORY_MODE
 
 class StoryResponse(BaseModel):
     story: str
     logs: list[str]
     graph: dict
     soul_structure: dict # Explicitly adding soul structure
+    document_id: Optional[str] = None
+    trace: Optional[dict[str, Any]] = None
+    profile: Optional[dict[str, str]] = None
+
+class BatchStoryRequest(BaseModel):
+    text: Optional[str] = None
+    domains: list[str]
+    document_id: Optional[str] = None
+    trace: bool = False
+    profile: bool = False
+    mode: Optional[Literal["whole", "scenes"]] = None
+
+class SceneRenderRequest(BaseModel):
+    text: Optional[str] = None
+    domain: str
+    document_id: Optional[str] = None
+    soul: Optional[StorySoul] = None # Edited soul graph; rendered instead of the one extracted from text/document_id
+    regenerate: list[str] = [] # Scene IDs to render afresh; all other scenes reuse cached prose when unchanged
+    trace: bool = False
+    profile: bool = False
+
+class SceneText(BaseModel):
+    id: str
+    text: str
+    cached: bool
+    failed: bool = False # Generation failed; text is the scene's summary and will be retried
+
+class SceneRenderResponse(BaseModel):
+    story: str
+    scenes: list[SceneText]
+    logs: list[str]
+    graph: dict
+    document_id: Optional[str] = None
+    trace: Optional[dict[str, Any]] = None
+    profile: Optional[dict[str, str]] = None
+
+class DomainResult(BaseModel):
+    story: str
+    logs: list[str]
+
+class BatchStoryResponse(BaseModel):
+    results: dict[str, DomainResult]
+    logs: list[str]
+    graph: dict
+    document_id: Optional[str] = None
+    trace: Optional[dict[str, Any]] = None
+    profile: Optional[dict[str, str]] = None
 
 
 class PresetResponse(BaseModel):
     text: str
 
+class UploadResponse(BaseModel):
+    text: str
+    document_id: str # Pass this instead of the text to /api/render
+
+class DocumentRequest(BaseModel):
+    text: str
+
+class DocumentResponse(BaseModel):
+    document_id: str
+    chars: int
+
+def get_engine(request: Request) -> StoryEngine:
+    engine = getattr(request.app.state, "engine", None)
+    if engine is None:
+        raise HTTPException(status_code=503, detail="Story engine is not initialized")
+    return engine
+
+async def resolve_text(text: Optional[str], document_id: Optional[str], engine: StoryEngine) -> str:
+    # Either the text itself or the ID of a stored document
+    if text is not None:
+        return text
+    if not document_id:
+        raise HTTPException(status_code=400, detail="Either text or document_id is required")
+    stored = await run_in_threadpool(engine.documents.get, document_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Unknown document")
+    return stored
+
+def diagnostics_requested(flag: bool, http_request: Request, header: str) -> bool:
+    return flag or http_request.headers.get(header, "").lower() in ("1", "true", "yes")
+
+def profile_dir_for(flag: bool, http_request: Request) -> Optional[Path]:
+    if diagnostics_requested(flag, http_request, "X-Profile"):
+        return http_request.app.state.profile_dir
+    return None
+
 @app.get("/api/health")
 async def health_check():
     return {"status": "ok"}
 
+@app.get("/api/metrics")
+async def metrics(request: Request):
+    # Queue occupancy is sampled at scrape time
+    jobs = getattr(request.app.state, "jobs", None)
+    if jobs is not None:
+        for state, value in jobs.stats().items():
+            RENDER_JOBS.set(value, state=state)
+    return Response(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/api/llm/stats")
+async def llm_stats(request: Request):
+    return get_engine(request).llm_stats()
+
+def require_admin(request: Request) -> None:
+    # Admin endpoints are disabled unless ADMIN_TOKEN is set; callers send it as X-Admin-Token
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set)")
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", "").encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+@app.post("/api/reload")
+async def reload_engine(request: Request):
+    # Re-read the ontology without restarting the worker
+    require_admin(request)
+    engine = get_engine(request)
+    await engine.reload_async()
+    return {"status": "reloaded", "concepts": len(engine.ontology.concepts)}
+
 @app.get("/api/preset", response_model=PresetResponse)
 async def get_preset():
     if preset_path.exists():
@@ -68,65 +223,245 @@ async def get_preset():
             raise HTTPException(status_code=500, detail=f"Failed to read preset: {str(e)}")
     return {"text": ""}
 
-@app.post("/api/upload", response_model=PresetResponse)
-async def upload_file(file: UploadFile = File(...)):
+def decode_text(content_bytes: bytes) -> str:
+    # Try decoding with utf-8, fallback to shift_jis if needed (common in Japan)
+    try:
+        return content_bytes.decode("utf-8")
+    except UnicodeDecodeError:
+        try:
+            return content_bytes.decode("shift_jis")
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="Could not decode file content. Please use UTF-8.")
+
+async def read_text_upload(file: UploadFile) -> str:
+    content_bytes = await file.read(MAX_UPLOAD_BYTES + 1)
+    if len(content_bytes) > MAX_UPLOAD_BYTES:
+        raise IngestLimitError(f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+    UPLOAD_BYTES.observe(len(content_bytes), kind="text")
+    return decode_text(content_bytes)
+
+async def spool_pdf(file: UploadFile, extractor: PdfExtractor) -> tuple[Path, int]:
+    # Unique temp file per upload, so concurrent uploads never share a path
+    if not HAS_PYPDF:
+        raise HTTPException(status_code=400, detail="PDF processing not available (pypdf not installed)")
+    temp_path = await spool_upload(file, MAX_UPLOAD_BYTES, suffix=".pdf")
+    try:
+        UPLOAD_BYTES.observe(temp_path.stat().st_size, kind="pdf")
+        pages = await extractor.page_count(temp_path)
+        UPLOAD_PDF_PAGES.observe(pages)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    return temp_path, pages
+
+def check_upload_type(filename: str) -> None:
+    if not filename.endswith((".pdf", ".txt", ".md")):
+        raise HTTPException(status_code=400, detail="Unsupported file type. Please upload .txt, .md, or .pdf")
+
+@app.post("/api/upload", response_model=UploadResponse)
+async def upload_file(http_request: Request, file: UploadFile = File(...)):
     filename = file.filename.lower()
-    content = ""
+    check_upload_type(filename)
 
     try:
         if filename.endswith(".pdf"):
-            if not HAS_PYPDF:
-                raise HTTPException(status_code=400, detail="PDF processing not available (pypdf not installed)")
-            
-            # Save temporary file to read
-            temp_path = project_root / "temp_upload.pdf"
-            with temp_path.open("wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
+            extractor = http_request.app.state.pdf
+            temp_path, pages = await spool_pdf(file, extractor)
             try:
-                reader = PdfReader(str(temp_path))
-                text_parts = []
-                for page in reader.pages:
-                    text_parts.append(page.extract_text())
-                content = "\n".join(text_parts)
+                content = await extractor.extract_text(temp_path, pages)
             finally:
-                if temp_path.exists():
-                    temp_path.unlink()
-
-        elif filename.endswith(".txt") or filename.endswith(".md"):
-            content_bytes = await file.read()
-            # Try decoding with utf-8, fallback to shift_jis if needed (common in Japan)
-            try:
-                content = content_bytes.decode("utf-8")
-            except UnicodeDecodeError:
-                try:
-                    content = content_bytes.decode("shift_jis")
-                except UnicodeDecodeError:
-                    raise HTTPException(status_code=400, detail="Could not decode file content. Please use UTF-8.")
+                temp_path.unlink(missing_ok=True)
         else:
-            raise HTTPException(status_code=400, detail="Unsupported file type. Please upload .txt, .md, or .pdf")
+            content = await read_text_upload(file)
 
-        return {"text": content}
+        document_id = await run_in_threadpool(get_engine(http_request).documents.put, content)
+        return {"text": content, "document_id": document_id}
 
+    except IngestLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/upload/stream")
+async def upload_file_stream(http_request: Request, file: UploadFile = File(...)):
+    # Server-Sent Events: "meta", then "text" per page range in order, then "done" with the document_id
+    filename = file.filename.lower()
+    check_upload_type(filename)
+    extractor = http_request.app.state.pdf
+    engine = get_engine(http_request)
+
+    try:
+        if filename.endswith(".pdf"):
+            temp_path, pages = await spool_pdf(file, extractor)
+            text = None
+        else:
+            temp_path, pages = None, 0
+            text = await read_text_upload(file)
+    except IngestLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        # Failures before the stream starts get a status code, as in /api/upload
+        raise HTTPException(status_code=500, detail=str(e))
+
+    def sse(event: str, data) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    async def event_stream():
+        try:
+            yield sse("meta", {"pages": pages})
+            if temp_path is None:
+                parts = [text]
+                yield sse("text", {"start_page": 0, "end_page": 0, "text": text})
+            else:
+                parts = []
+                async for start, end, part in extractor.iter_ranges(temp_path, pages):
+                    parts.append(part)
+                    yield sse("text", {"start_page": start, "end_page": end, "text": part})
+            content = "\n".join(parts)
+            document_id = await run_in_threadpool(engine.documents.put, content)
+            yield sse("done", {"pages": pages, "chars": len(content), "document_id": document_id})
+        except Exception as e:
+            yield sse("error", str(e))
+        finally:
+            if temp_path is not None:
+                temp_path.unlink(missing_ok=True)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/api/documents", response_model=DocumentResponse)
+async def store_document(request: DocumentRequest, http_request: Request):
+    engine = get_engine(http_request)
+    document_id = await run_in_threadpool(engine.documents.put, request.text)
+    return {"document_id": document_id, "chars": len(request.text)}
+
+@app.get("/api/documents/{document_id}", response_model=PresetResponse)
+async def get_document(document_id: str, http_request: Request):
+    engine = get_engine(http_request)
+    return {"text": await resolve_text(None, document_id, engine)}
+
 @app.post("/api/render", response_model=StoryResponse)
-async def render_story(request: StoryRequest):
-    # Initialize engine (lazy init to avoid overhead on import if needed)
-    engine = StoryEngine(ontology_path)
+async def render_story(request: StoryRequest, http_request: Request):
+    engine = get_engine(http_request)
+    text = await resolve_text(request.text, request.document_id, engine)
     
-    result = engine.process(request.text, request.domain)
+    traced = diagnostics_requested(request.trace, http_request, "X-Trace")
+    with trace("render", enabled=traced) as collected, \
+            profile(profile_dir_for(request.profile, http_request), "render") as profiled:
+        result = await engine.process_async(text, request.domain, request.document_id, request.mode)
     
     return {
         "story": result["story"],
         "logs": result["logs"],
         "graph": result["graph"],
-        "soul_structure": result["graph"] # Using graph/soul as the structure
+        "soul_structure": result["graph"], # Using graph/soul as the structure
+        "document_id": result["document_id"],
+        "trace": collected.to_dict() if collected else None,
+        "profile": profiled or None,
+    }
+
+@app.get("/api/souls/{document_id}")
+async def get_soul(document_id: str, http_request: Request):
+    # Previously extracted soul for a document, without re-extracting
+    engine = get_engine(http_request)
+    soul = await run_in_threadpool(engine.recall_soul, document_id)
+    if soul is None:
+        raise HTTPException(status_code=404, detail="No soul stored for this document")
+    return soul.model_dump()
+
+@app.post("/api/jobs", status_code=202)
+async def submit_render_job(request: StoryRequest, http_request: Request):
+    # Queue a render and return immediately; poll GET /api/jobs/{job_id}
+    engine = get_engine(http_request)
+    text = await resolve_text(request.text, request.document_id, engine)
+    try:
+        job = http_request.app.state.jobs.submit(
+            lambda: engine.process_async(text, request.domain, request.document_id, request.mode)
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    return {"job_id": job.id, "status": job.status}
+
+@app.get("/api/jobs/{job_id}")
+async def get_render_job(job_id: str, http_request: Request):
+    job = http_request.app.state.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.to_dict()
+
+@app.post("/api/render/batch", response_model=BatchStoryResponse)
+async def render_story_batch(request: BatchStoryRequest, http_request: Request):
+    # One extraction, every requested domain rendered concurrently
+    if not request.domains:
+        raise HTTPException(status_code=400, detail="At least one domain is required")
+    engine = get_engine(http_request)
+    text = await resolve_text(request.text, request.document_id, engine)
+    traced = diagnostics_requested(request.trace, http_request, "X-Trace")
+    with trace("render_batch", enabled=traced) as collected, \
+            profile(profile_dir_for(request.profile, http_request), "render_batch") as profiled:
+        try:
+            result = await engine.process_batch_async(text, request.domains, request.document_id, request.mode)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    result["trace"] = collected.to_dict() if collected else None
+    result["profile"] = profiled or None
+    return result
+
+@app.post("/api/render/scenes", response_model=SceneRenderResponse)
+async def render_story_scenes(request: SceneRenderRequest, http_request: Request):
+    # Scene-mode render for iterative editing: only changed or listed scenes cost a generation
+    engine = get_engine(http_request)
+    traced = diagnostics_requested(request.trace, http_request, "X-Trace")
+    with trace("render_scenes", enabled=traced) as collected, \
+            profile(profile_dir_for(request.profile, http_request), "render_scenes") as profiled:
+        logs: list[str] = []
+        document_id = request.document_id
+        if request.soul is not None:
+            soul = engine.ontology.normalize_soul(request.soul)
+        else:
+            text = await resolve_text(request.text, request.document_id, engine)
+            soul, document_id = await engine.soul_for_async(text, request.document_id, logs=logs)
+        try:
+            result = await engine.regenerate_scenes_async(soul, request.domain, request.regenerate)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "story": result["story"],
+        "scenes": result["scenes"],
+        "logs": logs + result["logs"],
+        "graph": soul.model_dump(),
+        "document_id": document_id,
+        "trace": collected.to_dict() if collected else None,
+        "profile": profiled or None,
     }
 
+@app.post("/api/render/stream")
+async def render_story_stream(request: StoryRequest, http_request: Request):
+    # Server-Sent Events: stage/log/graph/token/done events as the pipeline runs
+    engine = get_engine(http_request)
+    text = await resolve_text(request.text, request.document_id, engine)
+
+    async def event_stream():
+        try:
+            async for event, data in engine.process_stream(text, request.domain, request.document_id, request.mode):
+                yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps(str(e), ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # Mount static files (Frontend)
 static_dir = project_root / "src" / "web" / "static"
 if static_dir.exists():
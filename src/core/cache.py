@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+from cachetools import LRUCache
+
+from .schema import StorySoul
+
+
+class _TwoTierCache:
+    """Bounded in-memory LRU of JSON-able values plus an optional directory of <key>.json files"""
+
+    def __init__(self, maxsize: int, persist_dir: Optional[Path] = None):
+        self._memory: LRUCache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.persist_dir = persist_dir
+        if self.persist_dir is not None:
+            self.persist_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(text: str, model: str, prompt_version: str) -> str:
+        digest = hashlib.sha256()
+        for part in (model, prompt_version, text):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.persist_dir / f"{key}.json"
+
+    def _get(self, key: str) -> tuple[Any, Optional[str]]:
+        with self._lock:
+            data = self._memory.get(key)
+        if data is not None:
+            return data, "memory"
+
+        if self.persist_dir is not None:
+            path = self._path(key)
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                return None, None
+            with self._lock:
+                self._memory[key] = data
+            return data, "disk"
+
+        return None, None
+
+    def _put(self, key: str, data: Any) -> None:
+        with self._lock:
+            self._memory[key] = data
+
+        if self.persist_dir is not None:
+            path = self._path(key)
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            try:
+                tmp_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"{type(self).__name__} write failed: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+
+
+class SoulCache(_TwoTierCache):
+    """
+    Content-addressed cache for extracted Story Souls.
+
+    Entries are keyed by a hash of the input text, the model name and the
+    extraction prompt version, so changing any of them naturally misses.
+    The memory tier is a bounded LRU; the optional disk tier stores one JSON
+    file per key and survives restarts.
+    """
+
+    def __init__(self, maxsize: int = 128, persist_dir: Optional[Path] = None):
+        super().__init__(maxsize, persist_dir)
+
+    @classmethod
+    def from_env(cls) -> "SoulCache":
+        persist_dir = os.getenv("SOUL_CACHE_DIR")
+        return cls(
+            maxsize=int(os.getenv("SOUL_CACHE_SIZE", "128")),
+            persist_dir=Path(persist_dir) if persist_dir else None,
+        )
+
+    def get(self, key: str) -> tuple[Optional[StorySoul], Optional[str]]:
+        """Returns (soul, tier) where tier is "memory", "disk" or None on a miss."""
+        data, tier = self._get(key)
+        return (StorySoul(**data), tier) if data is not None else (None, None)
+
+    def put(self, key: str, soul: StorySoul) -> None:
+        self._put(key, soul.model_dump())
+
+
+class ProseCache(_TwoTierCache):
+    """
+    Cache for generated prose: whole stories, and scenes and cast sheets in
+    scene-mode renders.
+
+    Scene keys combine the scene's content, its surrounding context, the
+    domain, the model and the scene prompt version (see StoryEngine._scene_key),
+    so a scene is re-rendered only when something its prompt depends on
+    changes. Whole stories are keyed by their prompts (StoryEngine._story_key).
+    """
+
+    def __init__(self, maxsize: int = 1024, persist_dir: Optional[Path] = None):
+        super().__init__(maxsize, persist_dir)
+
+    @classmethod
+    def from_env(cls) -> "ProseCache":
+        persist_dir = os.getenv("PROSE_CACHE_DIR")
+        return cls(
+            maxsize=int(os.getenv("PROSE_CACHE_SIZE", "1024")),
+            persist_dir=Path(persist_dir) if persist_dir else None,
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        return self._get(key)[0]
+
+    def put(self, key: str, text: str) -> None:
+        self._put(key, text)
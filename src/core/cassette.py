@@ -0,0 +1,165 @@
+"""
+LLM record/replay cassettes
+===========================
+
+``LLM_BACKEND=record`` wraps the real GLM clients and writes every
+request/response pair to ``LLM_CASSETTE_DIR`` as one JSON file named by
+the prompt hash. ``LLM_BACKEND=replay`` serves those responses back
+instantly with no API key or network, and raises CassetteMiss for any
+prompt that was never recorded instead of falling back to local extraction.
+
+The hash covers kind (json/text), model, both prompts and temperature, so
+sync, async and streaming calls share recordings.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
+
+from .llm_client import LLMClient, AsyncLLMClient, GLM_MODEL
+from .singleflight import SingleFlight
+
+
+class CassetteMiss(LookupError):
+    """Replay mode was asked for a prompt that is not on the cassette."""
+
+
+def cassette_key(kind: str, model: str, system_prompt: str, user_prompt: str, temperature: float) -> str:
+    raw = json.dumps([kind, model, system_prompt, user_prompt, temperature], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _prompts(payload: Dict[str, Any]) -> tuple[str, str]:
+    messages = {m["role"]: m["content"] for m in payload["messages"]}
+    return messages.get("system", ""), messages.get("user", "")
+
+
+class Cassette:
+    """Directory of recorded responses, one <key>.json per prompt."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self._cache: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.recorded = 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._cache:
+                self.hits += 1
+                return self._cache[key]
+        path = self._path(key)
+        if not path.exists():
+            return None
+        response = json.loads(path.read_text(encoding="utf-8"))["response"]
+        with self._lock:
+            self._cache[key] = response
+            self.hits += 1
+        return response
+
+    def put(self, key: str, request: Dict[str, Any], response: str) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        record = {"key": key, "request": request, "response": response}
+        # Atomic write so concurrent recorders never leave a torn file
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self._path(key))
+        with self._lock:
+            self._cache[key] = response
+            self.recorded += 1
+
+    def require(self, key: str, kind: str, user_prompt: str) -> str:
+        response = self.get(key)
+        if response is None:
+            preview = user_prompt.strip().replace("\n", " ")[:80]
+            raise CassetteMiss(f"No recording for {kind} prompt {key[:12]} in {self.directory}: {preview!r}")
+        return response
+
+
+def _request(kind: str, model: str, system_prompt: str, user_prompt: str, temperature: float) -> Dict[str, Any]:
+    return {"kind": kind, "model": model, "system": system_prompt, "user": user_prompt, "temperature": temperature}
+
+
+class RecordingLLMClient(LLMClient):
+    """Real sync client that also writes every upstream response to the cassette"""
+
+    def __init__(self, cassette: Cassette):
+        super().__init__()
+        self.cassette = cassette
+
+    def _create(self, system_prompt: str, user_prompt: str, temperature: float, kind: str) -> str:
+        content = super()._create(system_prompt, user_prompt, temperature, kind)
+        key = cassette_key(kind, self.model, system_prompt, user_prompt, temperature)
+        self.cassette.put(key, _request(kind, self.model, system_prompt, user_prompt, temperature), content)
+        return content
+
+
+class AsyncRecordingLLMClient(AsyncLLMClient):
+    def __init__(self, cassette: Cassette):
+        super().__init__()
+        self.cassette = cassette
+
+    def _record(self, kind: str, system_prompt: str, user_prompt: str, temperature: float, content: str) -> None:
+        key = cassette_key(kind, self.model, system_prompt, user_prompt, temperature)
+        self.cassette.put(key, _request(kind, self.model, system_prompt, user_prompt, temperature), content)
+
+    async def _post(self, payload: Dict[str, Any], kind: str) -> str:
+        content = await super()._post(payload, kind)
+        self._record(kind, *_prompts(payload), payload["temperature"], content)
+        return content
+
+    async def stream_text(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        parts = []
+        async for token in super().stream_text(system_prompt, user_prompt):
+            parts.append(token)
+            yield token
+        # Streams are stored like generate_text, so either call can replay them
+        self._record("text", system_prompt, user_prompt, 0.7, "".join(parts))
+
+
+class ReplayLLMClient(LLMClient):
+    """Offline sync client that only answers from the cassette"""
+
+    def __init__(self, cassette: Cassette):
+        self.api_key = "replay"
+        self.client = object()  # is_available() only checks for a client
+        self.model = GLM_MODEL
+        self.flights = SingleFlight()
+        self.cassette = cassette
+
+    def _create(self, system_prompt: str, user_prompt: str, temperature: float, kind: str) -> str:
+        key = cassette_key(kind, self.model, system_prompt, user_prompt, temperature)
+        return self.cassette.require(key, kind, user_prompt)
+
+
+class AsyncReplayLLMClient(AsyncLLMClient):
+    def __init__(self, cassette: Cassette, chunk_chars: int = 16):
+        super().__init__()
+        self.api_key = "replay"
+        self.cassette = cassette
+        self.chunk_chars = chunk_chars
+
+    async def _post(self, payload: Dict[str, Any], kind: str) -> str:
+        system_prompt, user_prompt = _prompts(payload)
+        key = cassette_key(kind, self.model, system_prompt, user_prompt, payload["temperature"])
+        return self.cassette.require(key, kind, user_prompt)
+
+    async def stream_text(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        key = cassette_key("text", self.model, system_prompt, user_prompt, 0.7)
+        story = self.cassette.require(key, "text", user_prompt)
+        for start in range(0, len(story), self.chunk_chars):
+            yield story[start:start + self.chunk_chars]
+            await asyncio.sleep(0)
+
+    async def aclose(self) -> None:
+        return None
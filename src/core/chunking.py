@@ -0,0 +1,110 @@
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from .schema import StorySoul, CharacterNode, SceneNode, RelationshipEdge
+
+
+def _name_key(name: str) -> str:
+    return "".join(name.split()).lower()
+
+
+def _in_source_order(structure: List[SceneNode]) -> List[SceneNode]:
+    # The LLM may list scenes out of order; aligned scenes are sorted by offset and
+    # unaligned ones stay right after the scene they followed in the reply
+    keyed = []
+    position = -1
+    for index, scene in enumerate(structure):
+        if scene.source_span is not None:
+            position = scene.source_span[0]
+        keyed.append(((position, scene.source_span is None, index), scene))
+    return [scene for _, scene in sorted(keyed, key=lambda item: item[0])]
+
+
+def _unique_scene_ids(scenes: List[SceneNode]) -> List[SceneNode]:
+    # Unaligned scenes may reuse an ID another segment already has (each partial starts at SC01)
+    taken = {scene.id for scene in scenes}
+    used = set()
+    number = 0
+    out = []
+    for scene in scenes:
+        if scene.id in used:
+            while f"SC{number + 1:02d}" in taken:
+                number += 1
+            number += 1
+            scene = scene.model_copy(update={"id": f"SC{number:02d}"})
+            taken.add(scene.id)
+        used.add(scene.id)
+        out.append(scene)
+    return out
+
+
+def merge_souls(partials: List[StorySoul]) -> StorySoul:
+    """
+    Reduces per-segment souls (in document order) into a single StorySoul.
+
+    - Characters are matched by name and renumbered CH001.. in order of first appearance.
+    - Scenes are put in source order and keep their segmenter IDs and
+      source_span; a scene whose source_span overlaps the previous scene's is
+      a duplicate and dropped.
+      Scenes whose ID is already taken get the next free SCxx number.
+    - Relationships are remapped onto canonical IDs and deduplicated,
+      keeping the strongest edge.
+    """
+    if not partials:
+        raise ValueError("No partial souls to merge")
+
+    characters: List[CharacterNode] = []
+    canonical_by_name: Dict[str, str] = {}
+    scenes: List[SceneNode] = []
+    edges: Dict[tuple, RelationshipEdge] = {}
+    themes = Counter()
+    theme_refs = {}
+    last_span: Optional[Tuple[int, int]] = None
+
+    for part in partials:
+        local_ids: Dict[str, str] = {}
+        for character in part.characters:
+            key = _name_key(character.name)
+            if key not in canonical_by_name:
+                canonical_by_name[key] = f"CH{len(characters) + 1:03d}"
+                characters.append(character.model_copy(update={"id": canonical_by_name[key]}))
+            local_ids[character.id] = canonical_by_name[key]
+
+        def remap(cid: Optional[str]) -> Optional[str]:
+            if cid is None:
+                return None
+            return local_ids.get(cid, cid)
+
+        for scene in _in_source_order(part.structure):
+            events = [
+                event.model_copy(update={"actor_id": remap(event.actor_id), "target_id": remap(event.target_id)})
+                for event in scene.events
+            ]
+            span = scene.source_span
+            if span is not None and last_span is not None and span[0] < last_span[1]:
+                continue
+            if span is not None:
+                last_span = span
+            scenes.append(scene.model_copy(update={"events": events}))
+
+        for edge in part.relationships:
+            source, target = remap(edge.source_id), remap(edge.target_id)
+            key = (source, target, edge.relation.label)
+            if key not in edges or edges[key].strength < edge.strength:
+                edges[key] = edge.model_copy(update={"source_id": source, "target_id": target})
+
+        if part.theme is not None:
+            themes[part.theme.label] += 1
+            theme_refs.setdefault(part.theme.label, part.theme)
+
+    scenes = _unique_scene_ids(scenes)
+    # most_common keeps first-seen order on ties, so the opening theme wins a draw
+    theme = theme_refs[themes.most_common(1)[0][0]] if themes else None
+
+    return StorySoul(
+        title=partials[0].title,
+        theme=theme,
+        characters=characters,
+        structure=scenes,
+        relationships=list(edges.values()),
+    )
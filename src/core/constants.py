@@ -42,3 +42,42 @@ CORE_ONTOLOGIES = [
     OntologyCategory.FOOD_CULTURE,
     OntologyCategory.META,
 ]
+
+# ID prefixes used by the CSV ontology and by the extraction prompt (e.g. EM001, EM_ANGER)
+ID_PREFIX_CATEGORIES = {
+    "TM": OntologyCategory.TEMPORAL,
+    "SP": OntologyCategory.SPATIAL,
+    "EM": OntologyCategory.EMOTION,
+    "SN": OntologyCategory.SENSATION,
+    "NT": OntologyCategory.NATURAL,
+    "RL": OntologyCategory.RELATIONSHIP,
+    "CS": OntologyCategory.CAUSALITY,
+    "AC": OntologyCategory.ACTION,
+    "NA": OntologyCategory.NARRATIVE_STRUCTURE,
+    "CF": OntologyCategory.CHARACTER_FUNCTION,
+    "CH": OntologyCategory.CHARACTER_FUNCTION,
+    "DS": OntologyCategory.DISCOURSE_STRUCTURE,
+    "IE": OntologyCategory.INDIRECT_EMOTION,
+    "SF": OntologyCategory.STYLE_FORMULA,
+    "LS": OntologyCategory.STYLE_FORMULA,
+    "FC": OntologyCategory.FOOD_CULTURE,
+    "MT": OntologyCategory.META,
+}
+
+# Node labels of the .cypher ontologies and the category they belong to
+NODE_LABEL_CATEGORIES = {
+    "TimeConcept": OntologyCategory.TEMPORAL,
+    "Spatial": OntologyCategory.SPATIAL,
+    "Emotion": OntologyCategory.EMOTION,
+    "Sensation": OntologyCategory.SENSATION,
+    "Natural": OntologyCategory.NATURAL,
+    "Relation": OntologyCategory.RELATIONSHIP,
+    "Causality": OntologyCategory.CAUSALITY,
+    "Action": OntologyCategory.ACTION,
+    "NarrativeStructure": OntologyCategory.NARRATIVE_STRUCTURE,
+    "CharacterFunction": OntologyCategory.CHARACTER_FUNCTION,
+    "DiscourseStructure": OntologyCategory.DISCOURSE_STRUCTURE,
+    "BodyCue": OntologyCategory.INDIRECT_EMOTION,
+    "StoryCategory": OntologyCategory.STYLE_FORMULA,
+    "FoodCulture": OntologyCategory.FOOD_CULTURE,
+}
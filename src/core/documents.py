@@ -0,0 +1,72 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional
+
+from cachetools import LRUCache
+
+_DOCUMENT_ID_RE = re.compile(r"^[0-9a-f]{16,64}$")
+
+
+def document_id_for(text: str) -> str:
+    """Content-derived ID; matches the default MemU soul key for the same text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class DocumentStore:
+    """
+    Server-side store for uploaded/decoded documents, keyed by content hash.
+
+    Texts are written once as <id>.txt under `directory` (atomically, so
+    concurrent uploads of the same book are harmless) and the most recently
+    used ones are kept in a small in-memory LRU. Pass directory=None for a
+    memory-only store.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, hot_size: int = 16):
+        self.directory = directory
+        self._hot: LRUCache = LRUCache(maxsize=hot_size)
+        self._lock = threading.Lock()
+        if directory is not None:
+            directory.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, default_dir: Optional[Path] = None) -> "DocumentStore":
+        directory = os.getenv("DOCUMENT_STORE_DIR")
+        return cls(
+            directory=Path(directory) if directory else default_dir,
+            hot_size=int(os.getenv("DOCUMENT_STORE_HOT_SIZE", "16")),
+        )
+
+    def _path(self, document_id: str) -> Path:
+        return self.directory / f"{document_id}.txt"
+
+    def put(self, text: str) -> str:
+        document_id = document_id_for(text)
+        with self._lock:
+            self._hot[document_id] = text
+        if self.directory is not None and not self._path(document_id).exists():
+            # Bytes, not text mode: newline translation would change the text behind its hash ID
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(text.encode("utf-8"))
+            os.replace(tmp, self._path(document_id))
+        return document_id
+
+    def get(self, document_id: str) -> Optional[str]:
+        # IDs become file names, so anything that is not a hex digest is rejected
+        if not _DOCUMENT_ID_RE.match(document_id):
+            return None
+        with self._lock:
+            text = self._hot.get(document_id)
+        if text is not None:
+            return text
+        if self.directory is None or not self._path(document_id).exists():
+            return None
+        text = self._path(document_id).read_bytes().decode("utf-8")
+        with self._lock:
+            self._hot[document_id] = text
+        return text
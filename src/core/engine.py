@@ -1,65 +1,274 @@
 from pathlib import Path
-from typing import Dict, List, Any, Optional
-import csv
+from typing import Dict, List, Any, Optional, AsyncIterator, Iterable
+import asyncio
+import hashlib
 import json
+import os
+import re
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+
+from .constants import CORE_ONTOLOGIES, OntologyCategory, ID_PREFIX_CATEGORIES, NODE_LABEL_CATEGORIES
+from .schema import StorySoul, ConceptRef
+from .llm_client import LLMClient, AsyncLLMClient
+from .fake_llm import FakeLLMClient, AsyncFakeLLMClient
+from .cassette import (
+    Cassette, CassetteMiss, RecordingLLMClient, AsyncRecordingLLMClient, ReplayLLMClient, AsyncReplayLLMClient,
+)
+from .ratelimit import RateLimiter
+from .cache import SoulCache, ProseCache
+from .memory import MemUStore
+from .documents import DocumentStore, document_id_for
+from .chunking import merge_souls
+from .segmenter import Segmentation, SceneSpan, segment_text, group_scenes, align_scenes
+from .lexicon import Lexicon, heuristic_soul
+from .stitching import parse_cast, next_part, stitch, stitch_parts
+from .snapshot import load_or_build
+from .soul_codec import encode_soul, estimate_tokens
+from .metrics import LLM_FALLBACKS, STAGE_LATENCY
+from .tracing import span, bind
+
+# Bump whenever the extraction prompt changes so cached souls are invalidated
+EXTRACTION_PROMPT_VERSION = "4"
+# Upper bound for a scene's "[SCxx] heading" marker line and separator (headings are at most 40 chars)
+_SCENE_MARKER_CHARS = 64
+# Bump whenever the cast/scene prompts change so cached scene prose is invalidated
+SCENE_PROMPT_VERSION = "1"
+# Bump whenever the whole-story prompt changes so cached stories are invalidated
+STORY_PROMPT_VERSION = "1"
+
+def _label_key(label: str) -> str:
+    return "".join(unicodedata.normalize("NFKC", label).casefold().split())
 
-from .constants import CORE_ONTOLOGIES, OntologyCategory
-from .schema import StorySoul, CharacterNode, SceneNode, EventNode, RelationshipEdge, ConceptRef
-from .llm_client import LLMClient
 
 class OntologyLoader:
     def __init__(self, ontology_root: Path):
         self.root = ontology_root
         self.concepts: Dict[str, Dict[str, str]] = {}
         self.categories: Dict[str, List[str]] = {c.value: [] for c in CORE_ONTOLOGIES}
+        self.labels: Dict[str, List[str]] = {}
         self._load_all()
+        self._build_indexes()
 
     def _load_all(self):
-        # Recursively load all csv files
-        # In a real implementation, we would map specific CSVs to specific Categories
-        # For now, we load everything and try to infer or just store flat
-        for csv_file in self.root.glob("**/*.csv"):
-            with open(csv_file, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    if 'id' in row:
-                        self.concepts[row['id']] = row
-                        # Heuristic mapping for demo purposes
-                        # Ideally, the CSV filename or a 'type' column maps to OntologyCategory
-                        pass
+        # CSV concepts plus node/relationship MERGEs from the .cypher sources,
+        # quick-loaded from the precompiled snapshot unless the sources changed
+        data = load_or_build(self.root)
+        self.concepts = dict(data["concepts"])
+        self.nodes: List[Dict[str, Any]] = data["nodes"]
+        self.relationships: List[Dict[str, Any]] = data["relationships"]
+
+    def _build_indexes(self):
+        # Cypher nodes become concepts too, with IDs in the prompt's style (EM_ANGER)
+        prefixes: Dict[str, str] = {}
+        for prefix, category in ID_PREFIX_CATEGORIES.items():
+            prefixes.setdefault(category.value, prefix)
+        for node in self.nodes:
+            category = NODE_LABEL_CATEGORIES.get(node["labels"][0])
+            name_en = node["props"].get("name_en")
+            if category is None or not name_en:
+                continue
+            slug = re.sub(r"[^0-9A-Za-z]+", "_", str(name_en)).strip("_").upper()
+            cid = f"{prefixes[category.value]}_{slug}"
+            self.concepts.setdefault(cid, {
+                "id": cid,
+                "category": category.value,
+                "concept": str(name_en),
+                "description": "",
+                "name_en": str(name_en),
+                "name_ja": str(node["props"].get("name_ja", "")),
+            })
+
+        # category -> IDs, label (ja/en) -> IDs
+        for cid, row in self.concepts.items():
+            category = self.category_for_id(cid)
+            if category is not None:
+                self.categories.setdefault(category, []).append(cid)
+            for label in (row.get("concept"), row.get("name_en"), row.get("name_ja")):
+                if label:
+                    ids = self.labels.setdefault(_label_key(label), [])
+                    if cid not in ids:
+                        ids.append(cid)
 
     def get_concept(self, concept_id: str) -> Optional[Dict[str, str]]:
         return self.concepts.get(concept_id)
-    
+
+    def category_for_id(self, concept_id: str) -> Optional[str]:
+        match = re.match(r"[A-Za-z]+", concept_id)
+        category = ID_PREFIX_CATEGORIES.get(match.group(0).upper()) if match else None
+        return category.value if category else None
+
+    def concepts_in(self, category: str) -> List[Dict[str, str]]:
+        return [self.concepts[cid] for cid in self.categories.get(category, [])]
+
+    def find_by_label(self, label: str, category: Optional[str] = None) -> Optional[str]:
+        """Returns the concept ID for a Japanese or English label, only within category if given."""
+        ids = self.labels.get(_label_key(label), [])
+        if category is not None:
+            ids = [cid for cid in ids if self.category_for_id(cid) == category]
+        return ids[0] if ids else None
+
     def create_ref(self, cat: OntologyCategory, cid: str, label: str) -> ConceptRef:
         return ConceptRef(category=cat.value, id=cid, label=label)
 
+    def resolve_refs(self, refs: Iterable[ConceptRef]) -> List[ConceptRef]:
+        """
+        Maps ConceptRefs from an LLM response onto canonical ontology entries.
+        A known ID wins, then a label match within the ref's category (repaired
+        from the ID prefix if it is not a core category). A label that only
+        matches other categories is ignored, so the ref keeps its ID and
+        category rather than moving to another category. The LLM's label is kept.
+        """
+        valid = set(self.categories)
+        resolved: Dict[tuple, ConceptRef] = {}
+        out = []
+        for ref in refs:
+            key = (ref.category, ref.id, ref.label)
+            if key not in resolved:
+                category = ref.category if ref.category in valid else self.category_for_id(ref.id) or ref.category
+                cid = ref.id if ref.id in self.concepts else self.find_by_label(ref.label, category)
+                if cid is not None:
+                    category = self.category_for_id(cid) or category
+                else:
+                    cid = ref.id
+                resolved[key] = ref.model_copy(update={"id": cid, "category": category})
+            out.append(resolved[key])
+        return out
 
-class MemUClientStub:
-    def __init__(self) -> None:
-        self._store: Dict[str, Any] = {}
+    def normalize_soul(self, soul: StorySoul) -> StorySoul:
+        """Resolves every ConceptRef in the soul with one resolve_refs call."""
+        soul = soul.model_copy(deep=True)
+        slots = []
+        if soul.theme is not None:
+            slots.append((soul, "theme"))
+        for character in soul.characters:
+            slots.append((character, "role"))
+            if character.archetype is not None:
+                slots.append((character, "archetype"))
+        for scene in soul.structure:
+            slots.extend((scene.context, key) for key in scene.context)
+            for event in scene.events:
+                slots.extend((event, field) for field in ("action", "emotion", "motivation", "sensory_detail")
+                             if getattr(event, field) is not None)
+        for edge in soul.relationships:
+            slots.append((edge, "relation"))
 
-    def store(self, key: str, value: Any) -> None:
-        # Convert Pydantic models to dict
-        if hasattr(value, "model_dump"):
-             self._store[key] = value.model_dump()
-        else:
-             self._store[key] = value
+        def read(owner, name):
+            return owner[name] if isinstance(owner, dict) else getattr(owner, name)
 
-    def retrieve(self, key: str) -> Any:
-        return self._store.get(key)
+        refs = self.resolve_refs(read(owner, name) for owner, name in slots)
+        for (owner, name), ref in zip(slots, refs):
+            if isinstance(owner, dict):
+                owner[name] = ref
+            else:
+                setattr(owner, name, ref)
+        return soul
+
+
+def make_llm_clients(cassette_dir: Optional[Path] = None) -> tuple[LLMClient, AsyncLLMClient]:
+    # LLM_BACKEND=fake answers offline with canned data (benchmarks, demos without a key);
+    # record/replay write or serve real responses from the cassette directory
+    backend = os.getenv("LLM_BACKEND", "glm").lower()
+    if backend == "fake":
+        return FakeLLMClient(), AsyncFakeLLMClient()
+    if backend in ("record", "replay"):
+        cassette = Cassette(Path(os.getenv("LLM_CASSETTE_DIR") or cassette_dir or "cassettes"))
+        if backend == "record":
+            return RecordingLLMClient(cassette), AsyncRecordingLLMClient(cassette)
+        return ReplayLLMClient(cassette), AsyncReplayLLMClient(cassette)
+    if backend != "glm":
+        raise ValueError(f"Unknown LLM_BACKEND: {backend}")
+    return LLMClient(), AsyncLLMClient()
 
 
 class StoryEngine:
     def __init__(self, ontology_path: Path):
+        self.ontology_path = ontology_path
         self.ontology = OntologyLoader(ontology_path)
-        self.memory = MemUClientStub()
-        self.llm = LLMClient()
+        # Local extractor used whenever the LLM is unavailable or fails
+        self.lexicon = Lexicon.from_ontology(self.ontology)
+        # Recording must send every call to the LLM, so it starts from empty, memory-only
+        # stores instead of recalling souls and prose cached by earlier runs
+        recording = os.getenv("LLM_BACKEND", "glm").lower() == "record"
+        self.memory = (MemUStore() if recording
+                       else MemUStore.from_env(default_path=ontology_path.parent / ".cache" / "memu.sqlite3"))
+        # Uploaded texts, so renders can reference them by document_id instead of re-posting
+        self.documents = DocumentStore.from_env(default_dir=ontology_path.parent / ".cache" / "documents")
+        self.llm, self.async_llm = make_llm_clients(ontology_path.parent / "cassettes")
+        self.soul_cache = SoulCache() if recording else SoulCache.from_env()
+        # Texts are segmented into scenes of at most scene_chars; when they do not
+        # fit one prompt of chunk_size, groups of whole scenes are extracted map-reduce style
+        self.chunk_size = int(os.getenv("SOUL_CHUNK_SIZE", "3000"))
+        self.scene_chars = int(os.getenv("SOUL_SCENE_CHARS", "1500"))
+        self.extraction_concurrency = int(os.getenv("SOUL_EXTRACTION_CONCURRENCY", "4"))
+        # Upper bound (estimated tokens) for the soul embedded in instantiation prompts
+        self.prompt_budget = int(os.getenv("SOUL_PROMPT_BUDGET", "6000"))
+        # "whole" renders the story in one call; "scenes" renders every scene concurrently
+        self.story_mode = os.getenv("STORY_MODE", "whole")
+        self.scene_length = int(os.getenv("STORY_SCENE_LENGTH", "400"))
+        self.scene_concurrency = int(os.getenv("STORY_SCENE_CONCURRENCY", "8"))
+        # Domains are free text, so batch renders are capped by count (this also bounds their threads)
+        self.batch_max_domains = int(os.getenv("BATCH_MAX_DOMAINS", "8"))
+        # Rendered scenes (and cast sheets), so re-renders only pay for scenes that changed
+        self.prose_cache = ProseCache() if recording else ProseCache.from_env()
+        self._retired_async_clients: List[AsyncLLMClient] = []
+        self._reload_lock = threading.Lock()
 
-    def extract_soul(self, text: str) -> StorySoul:
-        # 1. Use LLM to extract "The Soul" if available
-        if self.llm.is_available():
-            system_prompt = """
+    def reload(self) -> None:
+        """
+        Re-reads the ontology and rebuilds the LLM clients in place.
+        The new objects are built outside the engine and swapped in under a lock.
+        LLM calls already in progress finish on the old clients, but each later
+        step of a render reads the engine's attributes again, so a render that
+        spans a reload may mix the old ontology or client with the new ones.
+        The old async client is kept until reload_async (or aclose) closes it.
+        """
+        with self._reload_lock:
+            ontology = OntologyLoader(self.ontology_path)
+            lexicon = Lexicon.from_ontology(ontology)
+            llm, async_llm = make_llm_clients(self.ontology_path.parent / "cassettes")
+            # Keep coalescing (and its stats) across the swap
+            llm.flights = self.llm.flights
+            async_llm.flights = self.async_llm.flights
+            # In-flight async calls may still hold the old pool (see reload_async)
+            self._retired_async_clients.append(self.async_llm)
+            self.ontology = ontology
+            self.lexicon = lexicon
+            self.llm = llm
+            self.async_llm = async_llm
+
+    async def reload_async(self) -> None:
+        """
+        reload() from the event loop: the swap runs in a worker thread, then
+        replaced async clients close their pools once their in-flight calls end.
+        """
+        await asyncio.to_thread(self.reload)
+        retired, self._retired_async_clients = self._retired_async_clients, []
+        for client in retired:
+            await client.retire()
+        # Clients still busy close themselves; they are kept only so aclose() covers shutdown
+        self._retired_async_clients.extend(client for client in retired if client.in_flight)
+
+    async def aclose(self) -> None:
+        """Releases pooled HTTP connections and closes the MemU database."""
+        for client in [*self._retired_async_clients, self.async_llm]:
+            await client.aclose()
+        self._retired_async_clients.clear()
+        self.memory.close()
+
+    def llm_stats(self) -> Dict[str, Any]:
+        """Upstream-call savings from request coalescing."""
+        return {
+            "coalescing": {
+                "sync": self.llm.flights.stats(),
+                "async": self.async_llm.flights.stats(),
+            },
+            "rate_limit": RateLimiter.all_stats(),
+        }
+
+    def _extraction_prompts(self, text: str) -> tuple[str, str]:
+        system_prompt = """
             あなたは物語構造解析のエキスパートです。
             入力された物語（小説や脚本）を解析し、独自の「LNA-ES Ontology」スキーマに基づいて
             JSON形式の構造データ（Story Soul）を抽出してください。
@@ -96,101 +305,341 @@ class StoryEngine:
                     {"source_id": "CH001", "target_id": "CH002", "relation": {"category": "relationship", "id": "RL_XXX", "label": "関係性"}}
                 ]
             }
+
+            本文は場面ごとに [SC01] のような見出しで区切られています。
+            structure には見出しごとに SceneNode を1つ、見出しと同じ id で出力してください。
             """
+        # The input is already bounded by chunk_size (see _group_scenes)
+        user_prompt = f"以下の物語を解析してください:\n\n{text}"
+        return system_prompt, user_prompt
+
+    def _chunk_prompts(self, chunk: str, index: int, total: int) -> tuple[str, str]:
+        system_prompt, _ = self._extraction_prompts("")
+        user_prompt = (
+            f"以下は長編の物語の一部（{index + 1}/{total}）です。"
+            f"この部分に登場する人物・場面・関係性のみを解析してください:\n\n{chunk}"
+        )
+        return system_prompt, user_prompt
+
+    def _soul_cache_key(self, text: str) -> str:
+        version = f"{EXTRACTION_PROMPT_VERSION}-{self.chunk_size}-{self.scene_chars}"
+        return SoulCache.make_key(text, self.llm.model, version)
+
+    def segment(self, text: str, logs: Optional[List[str]] = None) -> Segmentation:
+        """Splits text into SC01.. scenes with source offsets (see core.segmenter)."""
+        with span("segment", chars=len(text)):
+            segmentation = segment_text(text, self.scene_chars)
+            # Every scene must fit one extraction prompt next to the title line and its marker
+            limit = self.chunk_size - len(self._segment_input(segmentation, [])) - _SCENE_MARKER_CHARS
+            if self.scene_chars > limit:
+                segmentation = segment_text(text, max(limit, 1))
+        if logs is not None:
+            dialogue = sum(scene.dialogue_runs for scene in segmentation.scenes)
+            logs.append(f">> Segmenter: {len(segmentation.scenes)} scenes, {dialogue} dialogue runs, "
+                        f"{len(text)} -> {len(segmentation.compact())} chars")
+        return segmentation
+
+    def _segment_input(self, segmentation: Segmentation, scenes: List[SceneSpan]) -> str:
+        body = segmentation.compact(scenes)
+        return f"タイトル: {segmentation.title}\n\n{body}" if segmentation.title else body
+
+    def _group_scenes(self, segmentation: Segmentation) -> List[List[SceneSpan]]:
+        # The title line is prepended to every group, so it counts against chunk_size
+        overhead = len(self._segment_input(segmentation, []))
+        return group_scenes(segmentation.scenes, self.chunk_size, overhead)
+
+    def _lookup_soul(self, key: str, logs: Optional[List[str]]) -> Optional[StorySoul]:
+        soul, tier = self.soul_cache.get(key)
+        if logs is not None:
+            if soul is not None:
+                logs.append(f">> Soul Cache: hit ({tier}) {key[:12]}")
+            else:
+                logs.append(f">> Soul Cache: miss {key[:12]}")
+        return soul
+
+    def extract_soul(self, text: str, logs: Optional[List[str]] = None) -> StorySoul:
+        return self._extract(text, logs)[0]
+
+    async def extract_soul_async(self, text: str, logs: Optional[List[str]] = None) -> StorySoul:
+        return (await self._extract_async(text, logs))[0]
+
+    def _extract(self, text: str, logs: Optional[List[str]],
+                 base_id: Optional[str] = None) -> tuple[StorySoul, bool]:
+        # Returns (soul, from_llm); from_llm is False for the lexicon fallback.
+        # With base_id (the document the text was edited from), long texts are
+        # re-extracted incrementally.
+        # 1. Use LLM to extract "The Soul" if available
+        segmentation = None
+        if self.llm.is_available():
+            key = self._soul_cache_key(text)
+            cached = self._lookup_soul(key, logs)
+            if cached is not None:
+                return cached, True
+
             try:
-                data = self.llm.generate_json(system_prompt, f"以下の物語を解析してください:\n\n{text[:3000]}") # Limit text for token safety
-                # Basic validation/repair could go here
-                return StorySoul(**data)
+                segmentation = self.segment(text, logs)
+                groups = self._group_scenes(segmentation)
+                if len(groups) > 1:
+                    soul = self.extract_soul_chunked(segmentation, groups, logs, document_id_for(text), base_id)
+                else:
+                    compact = self._segment_input(segmentation, segmentation.scenes) or text
+                    system_prompt, user_prompt = self._extraction_prompts(compact)
+                    data = self.llm.generate_json(system_prompt, user_prompt)
+                    # Basic validation/repair could go here
+                    soul = align_scenes(StorySoul(**data), segmentation.scenes)
+                soul = self.ontology.normalize_soul(soul)
+                self.soul_cache.put(key, soul)
+                return soul, True
+            except CassetteMiss:
+                # A replay miss must fail the run, not fall back to local extraction
+                raise
             except Exception as e:
-                print(f"LLM Extraction failed, falling back to mock: {e}")
+                print(f"LLM Extraction failed, falling back to lexicon extraction: {e}")
         
-        # Fallback Mock (Previous implementation)
-        # Characters
-        c_hero = CharacterNode(
-            id="CH001", 
-            name="メロス (Mock)",
-            role=self.ontology.create_ref(OntologyCategory.CHARACTER_FUNCTION, "CF_HERO", "主人公")
-        )
-        c_villain = CharacterNode(
-            id="CH002", 
-            name="ディオニス (Mock)",
-            role=self.ontology.create_ref(OntologyCategory.CHARACTER_FUNCTION, "CF_VILLAIN", "敵対者")
-        )
-        c_friend = CharacterNode(
-            id="CH003", 
-            name="セリヌンティウス (Mock)",
-            role=self.ontology.create_ref(OntologyCategory.CHARACTER_FUNCTION, "CF_HELPER", "協力者")
-        )
+        LLM_FALLBACKS.inc(stage="extract")
+        return self._heuristic_soul(text, logs, segmentation), False
 
-        # Scene 1: The Outrage
-        s1 = SceneNode(
-            id="SC01",
-            context={
-                "time": self.ontology.create_ref(OntologyCategory.TEMPORAL, "TM_DAY", "昼"),
-                "place": self.ontology.create_ref(OntologyCategory.SPATIAL, "SP_CITY", "市街"),
-                "atmosphere": self.ontology.create_ref(OntologyCategory.NATURAL, "NT_SILENCE", "静寂")
-            },
-            events=[
-                EventNode(
-                    actor_id="CH001",
-                    action=self.ontology.create_ref(OntologyCategory.ACTION, "AC_OBSERVE", "目撃する"),
-                    emotion=self.ontology.create_ref(OntologyCategory.EMOTION, "EM_ANGER", "激怒")
-                ),
-                EventNode(
-                    actor_id="CH001",
-                    action=self.ontology.create_ref(OntologyCategory.ACTION, "AC_DECIDE", "決意する"),
-                    motivation=self.ontology.create_ref(OntologyCategory.CAUSALITY, "CS_JUSTICE", "正義感")
-                )
-            ]
-        )
+    async def _extract_async(self, text: str, logs: Optional[List[str]],
+                             base_id: Optional[str] = None) -> tuple[StorySoul, bool]:
+        segmentation = None
+        if self.async_llm.is_available():
+            key = self._soul_cache_key(text)
+            cached = await asyncio.to_thread(self._lookup_soul, key, logs)
+            if cached is not None:
+                return cached, True
 
-        # Relationships
-        rels = [
-            RelationshipEdge(
-                source_id="CH001", target_id="CH002",
-                relation=self.ontology.create_ref(OntologyCategory.RELATIONSHIP, "RL_HOSTILITY", "敵対")
-            )
-        ]
-
-        soul = StorySoul(
-            title="走れメロス (Mock)",
-            theme=self.ontology.create_ref(OntologyCategory.META, "MT_TRUST", "信頼"),
-            characters=[c_hero, c_villain, c_friend],
-            structure=[s1],
-            relationships=rels
-        )
-        
-        return soul
+            try:
+                segmentation = await asyncio.to_thread(self.segment, text, logs)
+                groups = self._group_scenes(segmentation)
+                if len(groups) > 1:
+                    soul = await self.extract_soul_chunked_async(segmentation, groups, logs,
+                                                                 document_id_for(text), base_id)
+                else:
+                    compact = self._segment_input(segmentation, segmentation.scenes) or text
+                    system_prompt, user_prompt = self._extraction_prompts(compact)
+                    data = await self.async_llm.generate_json(system_prompt, user_prompt)
+                    soul = align_scenes(StorySoul(**data), segmentation.scenes)
+                soul = await asyncio.to_thread(self.ontology.normalize_soul, soul)
+                await asyncio.to_thread(self.soul_cache.put, key, soul)
+                return soul, True
+            except CassetteMiss:
+                raise
+            except Exception as e:
+                print(f"LLM Extraction failed, falling back to lexicon extraction: {e}")
+
+        LLM_FALLBACKS.inc(stage="extract")
+        return await asyncio.to_thread(self._heuristic_soul, text, logs, segmentation), False
+
+    def _document_key(self, text: str, document_id: Optional[str]) -> tuple[str, str, Optional[str]]:
+        # Souls are stored under the text's content ID only, so they are immutable and
+        # shared safely; a different caller ID names the document the text was edited from
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        content_id = document_id_for(text)
+        return content_id, text_hash, document_id if document_id != content_id else None
+
+    def _recall_soul(self, document_id: str, text_hash: str, logs: List[str]) -> Optional[StorySoul]:
+        # A remembered soul is reused only while the document text is unchanged
+        with span("memory.retrieve", document_id=document_id):
+            entry = self.memory.retrieve(f"soul:{document_id}")
+        if entry and entry.get("text_sha256") == text_hash:
+            logs.append(f">> MemU: recalled soul for document {document_id}")
+            return StorySoul(**entry["soul"])
+        return None
+
+    def _remember_soul(self, document_id: str, text_hash: str, soul: StorySoul, from_llm: bool) -> None:
+        # Lexicon fallbacks are never remembered, so a later render retries the LLM
+        if from_llm:
+            with span("memory.store", document_id=document_id):
+                self.memory.store(f"soul:{document_id}", {"text_sha256": text_hash, "soul": soul.model_dump()})
+
+    def soul_for(self, text: str, document_id: Optional[str] = None,
+                 logs: Optional[List[str]] = None) -> tuple[StorySoul, str]:
+        """
+        Returns (soul, document_id), recalling it from MemU or extracting and
+        remembering it. document_id is always the text's content ID; a caller
+        ID of another document marks the text as an edit of it, and segments
+        unchanged since that document are not re-extracted.
+        """
+        logs = logs if logs is not None else []
+        document_id, text_hash, base_id = self._document_key(text, document_id)
+        with STAGE_LATENCY.time(stage="extract"):
+            soul = self._recall_soul(document_id, text_hash, logs)
+            if soul is None:
+                with span("extract_soul", chars=len(text)):
+                    soul, from_llm = self._extract(text, logs, base_id)
+                self._remember_soul(document_id, text_hash, soul, from_llm)
+        return soul, document_id
+
+    async def soul_for_async(self, text: str, document_id: Optional[str] = None,
+                             logs: Optional[List[str]] = None) -> tuple[StorySoul, str]:
+        # Hashing, MemU (SQLite) and the CPU-bound extraction steps run in worker
+        # threads, so a long text does not stall other requests on the event loop
+        logs = logs if logs is not None else []
+        document_id, text_hash, base_id = await asyncio.to_thread(self._document_key, text, document_id)
+        with STAGE_LATENCY.time(stage="extract"):
+            soul = await asyncio.to_thread(self._recall_soul, document_id, text_hash, logs)
+            if soul is None:
+                with span("extract_soul", chars=len(text)):
+                    soul, from_llm = await self._extract_async(text, logs, base_id)
+                await asyncio.to_thread(self._remember_soul, document_id, text_hash, soul, from_llm)
+        return soul, document_id
+
+    def recall_soul(self, document_id: str) -> Optional[StorySoul]:
+        entry = self.memory.retrieve(f"soul:{document_id}")
+        return StorySoul(**entry["soul"]) if entry else None
+
+    def _merge_partials(self, partials: List[Optional[StorySoul]], logs: Optional[List[str]]) -> StorySoul:
+        extracted = [p for p in partials if p is not None]
+        if logs is not None:
+            logs.append(f">> Chunked Extraction: {len(extracted)}/{len(partials)} segments merged")
+        if not extracted:
+            raise RuntimeError("All segment extractions failed")
+        return merge_souls(extracted)
+
+    def _segment_key(self, segmentation: Segmentation, group: List[SceneSpan]) -> str:
+        # Content of the group without scene IDs, which shift when earlier scenes change
+        raw = json.dumps([EXTRACTION_PROMPT_VERSION, self.llm.model, segmentation.title,
+                          [[scene.heading, scene.body()] for scene in group]], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+    def _reusable_partials(self, document_ids: Iterable[Optional[str]], keys: List[str],
+                           groups: List[List[SceneSpan]]) -> List[Optional[StorySoul]]:
+        """Previous results of these documents for groups whose content is unchanged"""
+        previous: Dict[str, Any] = {}
+        for document_id in document_ids:
+            if document_id is None:
+                continue
+            with span("memory.retrieve", document_id=document_id):
+                entry = self.memory.retrieve(f"segments:{document_id}")
+            if entry:
+                previous.update(entry.get("groups", {}))
+        partials: List[Optional[StorySoul]] = []
+        for key, group in zip(keys, groups):
+            record = previous.get(key)
+            if record is None:
+                partials.append(None)
+                continue
+            # Renumber the stored scenes onto the group's current IDs and offsets
+            ids = dict(zip(record["scene_ids"], (scene.id for scene in group)))
+            soul = StorySoul(**record["soul"])
+            structure = [node.model_copy(update={"id": ids.get(node.id, node.id), "source_span": None})
+                         for node in soul.structure]
+            partials.append(align_scenes(soul.model_copy(update={"structure": structure}), group))
+        return partials
+
+    def _store_partials(self, document_id: Optional[str], keys: List[str], groups: List[List[SceneSpan]],
+                        partials: List[Optional[StorySoul]], reused: int, logs: Optional[List[str]]) -> None:
+        if logs is not None and reused:
+            logs.append(f">> Incremental Extraction: reused {reused}/{len(groups)} segments, "
+                        f"re-extracted {len(groups) - reused}")
+        if document_id is None:
+            return
+        # Written under the text's content ID, so the record never changes for other readers
+        records = {
+            key: {"scene_ids": [scene.id for scene in group], "soul": partial.model_dump()}
+            for key, group, partial in zip(keys, groups, partials) if partial is not None
+        }
+        with span("memory.store", document_id=document_id):
+            self.memory.store(f"segments:{document_id}", {"groups": records})
+
+    def extract_soul_chunked(self, segmentation: Segmentation, groups: List[List[SceneSpan]],
+                             logs: Optional[List[str]] = None, document_id: Optional[str] = None,
+                             base_id: Optional[str] = None) -> StorySoul:
+        """
+        Map-reduce extraction for texts longer than one prompt: groups of whole
+        scenes are extracted on a bounded thread pool, aligned with their
+        source offsets and merged in order.
+
+        With the text's content ID as document_id the per-group results are
+        kept in MemU; for an edit of document base_id only groups whose
+        content changed since it are sent to the LLM again.
+        """
+        keys = [self._segment_key(segmentation, group) for group in groups]
+        partials = self._reusable_partials((document_id, base_id), keys, groups)
+        pending = [i for i, partial in enumerate(partials) if partial is None]
+
+        def extract(index: int) -> Optional[StorySoul]:
+            chunk = self._segment_input(segmentation, groups[index])
+            system_prompt, user_prompt = self._chunk_prompts(chunk, index, len(groups))
+            try:
+                return align_scenes(StorySoul(**self.llm.generate_json(system_prompt, user_prompt)), groups[index])
+            except CassetteMiss:
+                raise
+            except Exception as e:
+                print(f"Segment {index + 1}/{len(groups)} extraction failed: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.extraction_concurrency) as pool:
+            for index, partial in zip(pending, pool.map(bind(extract), pending)):
+                partials[index] = partial
+        self._store_partials(document_id, keys, groups, partials, len(groups) - len(pending), logs)
+        return self._merge_partials(partials, logs)
+
+    async def extract_soul_chunked_async(self, segmentation: Segmentation, groups: List[List[SceneSpan]],
+                                         logs: Optional[List[str]] = None, document_id: Optional[str] = None,
+                                         base_id: Optional[str] = None) -> StorySoul:
+        keys = [self._segment_key(segmentation, group) for group in groups]
+        partials = await asyncio.to_thread(self._reusable_partials, (document_id, base_id), keys, groups)
+        pending = [i for i, partial in enumerate(partials) if partial is None]
+        semaphore = asyncio.Semaphore(self.extraction_concurrency)
+
+        async def extract(index: int) -> Optional[StorySoul]:
+            chunk = self._segment_input(segmentation, groups[index])
+            system_prompt, user_prompt = self._chunk_prompts(chunk, index, len(groups))
+            async with semaphore:
+                try:
+                    data = await self.async_llm.generate_json(system_prompt, user_prompt)
+                    return align_scenes(StorySoul(**data), groups[index])
+                except CassetteMiss:
+                    raise
+                except Exception as e:
+                    print(f"Segment {index + 1}/{len(groups)} extraction failed: {e}")
+                    return None
+
+        for index, partial in zip(pending, await asyncio.gather(*(extract(i) for i in pending))):
+            partials[index] = partial
+        await asyncio.to_thread(self._store_partials, document_id, keys, groups, partials,
+                                len(groups) - len(pending), logs)
+        return self._merge_partials(partials, logs)
+
+    def _heuristic_soul(self, text: str, logs: Optional[List[str]],
+                        segmentation: Optional[Segmentation] = None) -> StorySoul:
+        """Builds the soul locally from ontology lexicon matches (see core.lexicon)."""
+        if segmentation is None:
+            segmentation = self.segment(text, logs)
+        with span("lexicon_extract", scenes=len(segmentation.scenes)):
+            soul = heuristic_soul(self.lexicon, text, segmentation)
+        if logs is not None:
+            logs.append(f">> Lexicon Extraction: {len(soul.characters)} characters, {len(soul.structure)} scenes")
+        return self.ontology.normalize_soul(soul)
 
     def contextual_forgetting(self, soul: StorySoul, domain: str) -> tuple[StorySoul, List[str]]:
         # "Forget" details that don't fit the target domain
         
-        logs = []
-        logs.append("--- [Contextual Forgetting Process] ---")
-        logs.append(f">> Target Domain: {domain}")
+        with STAGE_LATENCY.time(stage="forget"), span("contextual_forgetting", domain=domain):
+            logs = []
+            logs.append("--- [Contextual Forgetting Process] ---")
+            logs.append(f">> Target Domain: {domain}")
         
-        # If LLM is available, we could ask it what to forget/adapt
-        # For now, we simulate the logic
-        logs.append(">> Filtering Schema Nodes based on Domain Rules...")
+            # If LLM is available, we could ask it what to forget/adapt
+            # For now, we simulate the logic
+            logs.append(">> Filtering Schema Nodes based on Domain Rules...")
         
-        if domain == "school_drama":
-             logs.append("   - Rule Applied: Replace 'Sword/Violence' with 'Social Conflict'")
-             logs.append("   - Rule Applied: Scale down 'Death' to 'Social Exile/Expulsion'")
-        elif domain == "jidai":
-             logs.append("   - Rule Applied: Align Social Status to Edo Period (Samurai, Merchant)")
+            if domain == "school_drama":
+                 logs.append("   - Rule Applied: Replace 'Sword/Violence' with 'Social Conflict'")
+                 logs.append("   - Rule Applied: Scale down 'Death' to 'Social Exile/Expulsion'")
+            elif domain == "jidai":
+                 logs.append("   - Rule Applied: Align Social Status to Edo Period (Samurai, Merchant)")
         
-        logs.append(f"   - Retained Theme: {soul.theme.label if soul.theme else 'None'}")
-        logs.append(f"   - Retained Characters: {[c.role.label for c in soul.characters]}")
-        logs.append(f"   - Retained Scenes: {len(soul.structure)}")
-        logs.append("---------------------------------------")
+            logs.append(f"   - Retained Theme: {soul.theme.label if soul.theme else 'None'}")
+            logs.append(f"   - Retained Characters: {[c.role.label for c in soul.characters]}")
+            logs.append(f"   - Retained Scenes: {len(soul.structure)}")
+            logs.append("---------------------------------------")
         
-        return soul, logs
+            return soul, logs
 
-    def instantiate_story(self, soul: StorySoul, domain: str) -> str:
-        # Reconstruct story based on domain using the Structured Soul
-        
-        if self.llm.is_available():
-            system_prompt = f"""
+    def _instantiation_prompts(self, soul: StorySoul, domain: str) -> tuple[str, str]:
+        system_prompt = f"""
             あなたはプロの小説家・シナリオライターです。
             提供された物語の構造データ（Story Soul）を元に、指定されたドメイン（世界観）で物語を再構築（リライト）してください。
             
@@ -203,42 +652,498 @@ class StoryEngine:
             - 文体はドメインにふさわしいものにすること。
             - 長さは500〜1000文字程度で、物語のハイライトを描くこと。
             """
-            
-            user_prompt = f"""
-            # Story Soul Data (JSON)
-            {json.dumps(soul.model_dump(), ensure_ascii=False, indent=2)}
-            
-            # Output
+        
+        user_prompt = f"""
+# Story Soul Data
+{encode_soul(soul, max_tokens=self.prompt_budget)}
+
+# Output
+"""
+        return system_prompt, user_prompt
+
+    def _prompt_size_log(self, soul: StorySoul) -> str:
+        # Compares the compact encoding with the indented JSON it replaced
+        before = estimate_tokens(json.dumps(soul.model_dump(), ensure_ascii=False, indent=2))
+        after = estimate_tokens(encode_soul(soul, max_tokens=self.prompt_budget))
+        saved = 100 * (before - after) // before if before else 0
+        return f">> Prompt: Soul encoded in ~{after} tokens (JSON ~{before}, -{saved}%)"
+
+    def _story_key(self, system_prompt: str, user_prompt: str) -> str:
+        # Whole-mode prose is keyed by its prompts, which hold the domain and the encoded soul
+        return ProseCache.make_key(f"{system_prompt}\0{user_prompt}", self.llm.model, STORY_PROMPT_VERSION)
+
+    def _scene_mode(self, soul: StorySoul, mode: Optional[str]) -> bool:
+        mode = mode or self.story_mode
+        if mode not in ("whole", "scenes"):
+            raise ValueError(f"Unknown story mode: {mode}")
+        return mode == "scenes" and bool(soul.structure)
+
+    @staticmethod
+    def _scene_position(index: int, total: int) -> str:
+        return "冒頭" if index == 0 else "結末" if index == total - 1 else "途中"
+
+    def _cast_key(self, soul: StorySoul, domain: str) -> str:
+        characters = [[c.name, c.role.label] for c in soul.characters]
+        payload = json.dumps(["cast", domain, characters], ensure_ascii=False)
+        return ProseCache.make_key(payload, self.llm.model, SCENE_PROMPT_VERSION)
+
+    def _scene_key(self, soul: StorySoul, domain: str, index: int, cast: Dict[str, str]) -> str:
+        """
+        Prose cache key for one scene: a hash of the scene's own content, a
+        hash of the story-level context its prompt is built from (cast,
+        characters, relationships, theme, position, length) and the domain.
+        Neighbouring scenes are prompt context only and scene IDs and source
+        offsets are left out, so editing one scene invalidates just that scene;
+        list its neighbours in regenerate to refresh the transitions as well.
+        """
+        def content(node) -> Any:
+            return node.model_dump(mode="json", exclude={"id", "source_span"})
+
+        def digest(data: Any) -> str:
+            return hashlib.sha256(json.dumps(data, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+        scenes = soul.structure
+        scene = content(scenes[index])
+        context = {
+            "title": soul.title,
+            "theme": soul.theme.model_dump(mode="json") if soul.theme else None,
+            "characters": [c.model_dump(mode="json") for c in soul.characters],
+            "relationships": [r.model_dump(mode="json") for r in soul.relationships],
+            "position": self._scene_position(index, len(scenes)),
+            "cast": cast,
+            "length": self.scene_length,
+            "budget": self.prompt_budget,
+        }
+        # Identical scenes (common in sparse souls) are told apart by their occurrence
+        occurrence = sum(1 for node in scenes[:index] if content(node) == scene)
+        payload = json.dumps([digest(scene), occurrence, digest(context), domain])
+        return ProseCache.make_key(payload, self.llm.model, SCENE_PROMPT_VERSION)
+
+    def _cast_prompts(self, soul: StorySoul, domain: str) -> tuple[str, str]:
+        system_prompt = f"""
+            あなたはプロの小説家です。物語をドメイン「{domain}」に翻案するにあたり、
+            登場人物の名前をドメインにふさわしい名前へ置き換える配役表を作成してください。
+            出力は {{"cast": {{"元の名前": "新しい名前"}}}} の形式のJSONのみとすること。
             """
-            
+        characters = "\n".join(f"- {c.name}（{c.role.label}）" for c in soul.characters)
+        return system_prompt, f"# 登場人物\n{characters}"
+
+    def _scene_prompts(self, soul: StorySoul, domain: str, index: int, cast: Dict[str, str]) -> tuple[str, str]:
+        scenes = soul.structure
+        scene = scenes[index]
+        position = self._scene_position(index, len(scenes))
+        system_prompt = f"""
+            あなたはプロの小説家・シナリオライターです。
+            提供された物語の構造データ（Story Soul）を元に、指定されたドメイン（世界観）で物語を再構築（リライト）しています。
+            今回は全{len(scenes)}場面のうち {scene.id}（{position}の場面）だけを書いてください。
+
+            # 指示
+            - ターゲットドメイン: {domain}
+            - 元の構造（キャラクターの役割、感情の流れ、因果関係）は厳密に守ること。
+            - 登場人物は配役表の名前で書くこと。その他の固有名詞や設定はドメインに合わせて「翻訳」すること。
+            - 前後の場面は別に書かれて連結されるため、見出し・あらすじ・前置きは書かず、{scene.id} の本文だけを書くこと。
+            - 文体はドメインにふさわしいものにすること。
+            - 長さは{self.scene_length}文字程度。
+            """
+        cast_lines = "\n".join(f"{original} -> {renamed}" for original, renamed in cast.items()) or "(元の名前のまま)"
+        # Neighbouring scenes are included so the scene connects to its surroundings
+        window = soul.model_copy(update={"structure": scenes[max(0, index - 1):index + 2]})
+        user_prompt = f"""
+# 配役
+{cast_lines}
+
+# Story Soul Data (前後の場面を含む)
+{encode_soul(window, max_tokens=self.prompt_budget)}
+
+# Output ({scene.id})
+"""
+        return system_prompt, user_prompt
+
+    def _cast_sheet(self, soul: StorySoul, domain: str) -> Dict[str, str]:
+        if not soul.characters:
+            return {}
+        # Reusing the cast keeps the scene keys (which include it) stable across renders
+        key = self._cast_key(soul, domain)
+        cached = self.prose_cache.get(key)
+        if cached is not None:
+            return json.loads(cached)
+        try:
+            data = self.llm.generate_json(*self._cast_prompts(soul, domain))
+            cast = parse_cast(data, (c.name for c in soul.characters))
+            # An empty cast is a valid answer too; only failed calls are retried
+            self.prose_cache.put(key, json.dumps(cast, ensure_ascii=False))
+            return cast
+        except CassetteMiss:
+            raise
+        except Exception as e:
+            # Scenes are still rendered, just without a shared cast
+            print(f"Cast sheet failed: {e}")
+            return {}
+
+    async def _cast_sheet_async(self, soul: StorySoul, domain: str) -> Dict[str, str]:
+        if not soul.characters:
+            return {}
+        key = self._cast_key(soul, domain)
+        # The prose cache may read and write files, so it is used from a worker thread
+        cached = await asyncio.to_thread(self.prose_cache.get, key)
+        if cached is not None:
+            return json.loads(cached)
+        try:
+            data = await self.async_llm.generate_json(*self._cast_prompts(soul, domain))
+            cast = parse_cast(data, (c.name for c in soul.characters))
+            await asyncio.to_thread(self.prose_cache.put, key, json.dumps(cast, ensure_ascii=False))
+            return cast
+        except CassetteMiss:
+            raise
+        except Exception as e:
+            print(f"Cast sheet failed: {e}")
+            return {}
+
+    def _scene_summary(self, soul: StorySoul, index: int, cast: Dict[str, str]) -> str:
+        """Stand-in for a scene whose generation failed: its events as one bracketed line"""
+        scene = soul.structure[index]
+        names = {c.id: cast.get(c.name, c.name) for c in soul.characters}
+        events = []
+        for event in scene.events:
+            line = f"{names.get(event.actor_id, event.actor_id)}は{event.action.label}"
+            if event.emotion:
+                line += f"（{event.emotion.label}）"
+            events.append(line)
+        # 〔〕 rather than （SC02: …）, which the continuity pass would strip as a scene heading
+        return f"〔{'。'.join(events) or 'この場面は生成できませんでした'}〕"
+
+    def _scene_failed(self, soul: StorySoul, index: int, cast: Dict[str, str],
+                      error: Exception) -> tuple[str, bool, bool]:
+        print(f"Scene {soul.structure[index].id} generation failed, using its summary: {error}")
+        LLM_FALLBACKS.inc(stage="scene")
+        return self._scene_summary(soul, index, cast), False, True
+
+    def _render_scene(self, soul: StorySoul, domain: str, index: int, cast: Dict[str, str],
+                      force: bool = False) -> tuple[str, bool, bool]:
+        """
+        Returns (text, cached, failed). Cached prose is reused unless force is
+        set; successful renders are stored. A failed render is never cached and
+        its text is the scene's summary (see _scene_summary), not error output.
+        """
+        scene_id = soul.structure[index].id
+        key = self._scene_key(soul, domain, index, cast)
+        if not force:
+            cached = self.prose_cache.get(key)
+            if cached is not None:
+                return cached, True, False
+        with span("instantiate_scene", scene=scene_id):
             try:
-                return self.llm.generate_text(system_prompt, user_prompt)
+                text = self.llm.generate_text(*self._scene_prompts(soul, domain, index, cast))
+            except CassetteMiss:
+                raise
             except Exception as e:
-                print(f"LLM Generation failed: {e}")
-                return f"Error generating story: {e}"
+                return self._scene_failed(soul, index, cast, e)
+        self.prose_cache.put(key, text)
+        return text, False, False
+
+    async def _render_scene_async(self, soul: StorySoul, domain: str, index: int, cast: Dict[str, str],
+                                  semaphore: asyncio.Semaphore, force: bool = False) -> tuple[str, bool, bool]:
+        scene_id = soul.structure[index].id
+        key = self._scene_key(soul, domain, index, cast)
+        if not force:
+            cached = await asyncio.to_thread(self.prose_cache.get, key)
+            if cached is not None:
+                return cached, True, False
+        async with semaphore:
+            with span("instantiate_scene", scene=scene_id):
+                try:
+                    text = await self.async_llm.generate_text(*self._scene_prompts(soul, domain, index, cast))
+                except CassetteMiss:
+                    raise
+                except Exception as e:
+                    return self._scene_failed(soul, index, cast, e)
+        await asyncio.to_thread(self.prose_cache.put, key, text)
+        return text, False, False
+
+    async def _scene_parts_async(self, soul: StorySoul, domain: str,
+                                 regenerate: Iterable[str] = ()) -> tuple[List[tuple[str, bool, bool]], Dict[str, str]]:
+        cast = await self._cast_sheet_async(soul, domain)
+        forced = set(regenerate)
+        semaphore = asyncio.Semaphore(self.scene_concurrency)
+        parts = await asyncio.gather(*(self._render_scene_async(soul, domain, i, cast, semaphore, node.id in forced)
+                                       for i, node in enumerate(soul.structure)))
+        return list(parts), cast
+
+    def instantiate_scenes(self, soul: StorySoul, domain: str) -> str:
+        """
+        Scene-parallel instantiation: a short cast-sheet call fixes the
+        characters' domain names, then every scene is rendered concurrently
+        (with its neighbours as context) and the results are stitched in
+        order by a local continuity pass (see core.stitching). Scenes whose
+        prompt inputs are unchanged reuse their cached prose.
+        """
+        cast = self._cast_sheet(soul, domain)
+        indices = range(len(soul.structure))
+        with ThreadPoolExecutor(max_workers=max(1, min(self.scene_concurrency, len(indices)))) as pool:
+            parts = list(pool.map(bind(lambda i: self._render_scene(soul, domain, i, cast)), indices))
+        return stitch([text for text, _, _ in parts], cast)
+
+    async def instantiate_scenes_async(self, soul: StorySoul, domain: str) -> str:
+        parts, cast = await self._scene_parts_async(soul, domain)
+        return stitch([text for text, _, _ in parts], cast)
+
+    async def instantiate_scenes_stream(self, soul: StorySoul, domain: str) -> AsyncIterator[str]:
+        """Renders all scenes concurrently but yields each one, stitched, in story order"""
+        cast = await self._cast_sheet_async(soul, domain)
+        semaphore = asyncio.Semaphore(self.scene_concurrency)
+        tasks = [asyncio.ensure_future(self._render_scene_async(soul, domain, i, cast, semaphore))
+                 for i in range(len(soul.structure))]
+        previous: Optional[str] = None
+        try:
+            for task in tasks:
+                text = next_part(previous, (await task)[0], cast)
+                if text:
+                    yield text if previous is None else f"\n\n{text}"
+                    previous = text
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def regenerate_scenes_async(self, soul: StorySoul, domain: str,
+                                      scene_ids: Iterable[str] = ()) -> Dict[str, Any]:
+        """
+        Scene-mode render for iterative editing: the scenes in scene_ids are
+        rendered afresh, every other scene reuses its cached prose as long as
+        nothing its prompt depends on has changed (see _scene_key). Returns the
+        stitched story, per-scene texts flagged as cached or not (and as failed
+        when a scene fell back to its summary), and logs.
+        """
+        scene_ids = list(dict.fromkeys(scene_ids))
+        unknown = [scene_id for scene_id in scene_ids if scene_id not in {node.id for node in soul.structure}]
+        if unknown:
+            raise ValueError(f"Unknown scene IDs: {', '.join(unknown)}")
+
+        filtered_soul, logs = self.contextual_forgetting(soul, domain)
+        logs.append(self._prompt_size_log(filtered_soul))
+        if not self.async_llm.is_available() or not filtered_soul.structure:
+            # Scene-less souls (empty or failed extraction) are rendered whole; without an LLM
+            # this is the local fallback
+            story = await self.instantiate_story_async(filtered_soul, domain, "whole")
+            return {"story": story, "scenes": [], "logs": logs}
+        with STAGE_LATENCY.time(stage="instantiate"), span("instantiate_story", domain=domain):
+            parts, cast = await self._scene_parts_async(filtered_soul, domain, scene_ids)
+
+        texts = stitch_parts([text for text, _, _ in parts], cast)
+        reused = sum(1 for _, cached, _ in parts if cached)
+        logs.append(f">> Scene Cache: reused {reused}/{len(parts)} scenes, rendered {len(parts) - reused}")
+        failed = [node.id for node, (_, _, error) in zip(filtered_soul.structure, parts) if error]
+        if failed:
+            logs.append(f">> Scene Fallback: {', '.join(failed)} failed, summarized instead (not cached)")
+        return {
+            "story": "\n\n".join(text for text in texts if text),
+            "scenes": [{"id": node.id, "text": text, "cached": cached, "failed": error}
+                       for node, text, (_, cached, error) in zip(filtered_soul.structure, texts, parts)],
+            "logs": logs,
+        }
 
+    def instantiate_story(self, soul: StorySoul, domain: str, mode: Optional[str] = None) -> str:
+        # Reconstruct story based on domain using the Structured Soul
+        
+        with STAGE_LATENCY.time(stage="instantiate"), span("instantiate_story", domain=domain):
+            if self.llm.is_available():
+                if self._scene_mode(soul, mode):
+                    return self.instantiate_scenes(soul, domain)
+                system_prompt, user_prompt = self._instantiation_prompts(soul, domain)
+                key = self._story_key(system_prompt, user_prompt)
+                cached = self.prose_cache.get(key)
+                if cached is not None:
+                    return cached
+                try:
+                    story = self.llm.generate_text(system_prompt, user_prompt)
+                except CassetteMiss:
+                    raise
+                except Exception as e:
+                    print(f"LLM Generation failed: {e}")
+                    return f"Error generating story: {e}"
+                self.prose_cache.put(key, story)
+                return story
+
+            return self._mock_story(soul, domain)
+
+    async def instantiate_story_async(self, soul: StorySoul, domain: str, mode: Optional[str] = None) -> str:
+        with STAGE_LATENCY.time(stage="instantiate"), span("instantiate_story", domain=domain):
+            if self.async_llm.is_available():
+                if self._scene_mode(soul, mode):
+                    return await self.instantiate_scenes_async(soul, domain)
+                system_prompt, user_prompt = self._instantiation_prompts(soul, domain)
+                key = self._story_key(system_prompt, user_prompt)
+                cached = await asyncio.to_thread(self.prose_cache.get, key)
+                if cached is not None:
+                    return cached
+                try:
+                    story = await self.async_llm.generate_text(system_prompt, user_prompt)
+                except CassetteMiss:
+                    raise
+                except Exception as e:
+                    print(f"LLM Generation failed: {e}")
+                    return f"Error generating story: {e}"
+                await asyncio.to_thread(self.prose_cache.put, key, story)
+                return story
+
+            return self._mock_story(soul, domain)
+
+    async def instantiate_story_stream(self, soul: StorySoul, domain: str,
+                                       mode: Optional[str] = None) -> AsyncIterator[str]:
+        """Yields the instantiated story piece by piece as the LLM produces it (scene by scene in scenes mode)."""
+        with STAGE_LATENCY.time(stage="instantiate"):
+            if self.async_llm.is_available():
+                if self._scene_mode(soul, mode):
+                    async for part in self.instantiate_scenes_stream(soul, domain):
+                        yield part
+                    return
+                system_prompt, user_prompt = self._instantiation_prompts(soul, domain)
+                key = self._story_key(system_prompt, user_prompt)
+                cached = await asyncio.to_thread(self.prose_cache.get, key)
+                if cached is not None:
+                    yield cached
+                    return
+                tokens: List[str] = []
+                try:
+                    async for token in self.async_llm.stream_text(system_prompt, user_prompt):
+                        tokens.append(token)
+                        yield token
+                except CassetteMiss:
+                    raise
+                except Exception as e:
+                    print(f"LLM Generation failed: {e}")
+                    yield f"Error generating story: {e}"
+                    return
+                # Only a stream that ran to completion is cached
+                await asyncio.to_thread(self.prose_cache.put, key, "".join(tokens))
+                return
+
+            yield self._mock_story(soul, domain)
+
+    def _mock_story(self, soul: StorySoul, domain: str) -> str:
         # Fallback logic (Mock)
+        LLM_FALLBACKS.inc(stage="instantiate")
+        hero = soul.characters[0].name if soul.characters else "主人公"
         if domain == "jidai":
-            hero = soul.characters[0].name.replace("メロス", "若き剣士") 
+            hero = hero.replace("メロス", "若き剣士") 
             return f"（Mock出力: LLM未接続）\n【時代劇版】{hero}は走った..."
         else:
             return f"（Mock出力: LLM未接続）\n【学園版】{hero}は走った..."
 
-    def process(self, text: str, domain: str) -> Dict[str, Any]:
+    def process(self, text: str, domain: str, document_id: Optional[str] = None,
+                mode: Optional[str] = None) -> Dict[str, Any]:
         # 1. Extract Soul (Normalize to 15 Core Ontologies JSON)
-        soul = self.extract_soul(text)
-        
-        # 2. Store in Memory
-        self.memory.store("narrative_soul", soul)
+        # 2. Store in Memory (keyed by document, recalled if the text is unchanged)
+        extract_logs: List[str] = []
+        soul, document_id = self.soul_for(text, document_id, logs=extract_logs)
         
         # 3. Contextual Forgetting & Filtering
         filtered_soul, logs = self.contextual_forgetting(soul, domain)
+        logs = extract_logs + logs + [self._prompt_size_log(filtered_soul)]
         
         # 4. Instantiate (The New Skin)
-        story = self.instantiate_story(filtered_soul, domain)
+        story = self.instantiate_story(filtered_soul, domain, mode)
         
         return {
             "story": story,
             "logs": logs,
-            "graph": soul.model_dump() # Return JSON structure for visualization
+            "graph": soul.model_dump(), # Return JSON structure for visualization
+            "document_id": document_id
+        }
+
+    async def process_async(self, text: str, domain: str, document_id: Optional[str] = None,
+                            mode: Optional[str] = None) -> Dict[str, Any]:
+        # Same pipeline as process(), but LLM round trips yield to the event loop
+        extract_logs: List[str] = []
+        soul, document_id = await self.soul_for_async(text, document_id, logs=extract_logs)
+        
+        filtered_soul, logs = self.contextual_forgetting(soul, domain)
+        logs = extract_logs + logs + [self._prompt_size_log(filtered_soul)]
+        
+        story = await self.instantiate_story_async(filtered_soul, domain, mode)
+        
+        return {
+            "story": story,
+            "logs": logs,
+            "graph": soul.model_dump(),
+            "document_id": document_id
+        }
+
+    def _render_domain(self, soul: StorySoul, domain: str, mode: Optional[str] = None) -> Dict[str, Any]:
+        filtered_soul, logs = self.contextual_forgetting(soul, domain)
+        logs.append(self._prompt_size_log(filtered_soul))
+        return {"story": self.instantiate_story(filtered_soul, domain, mode), "logs": logs}
+
+    async def _render_domain_async(self, soul: StorySoul, domain: str, mode: Optional[str] = None) -> Dict[str, Any]:
+        filtered_soul, logs = self.contextual_forgetting(soul, domain)
+        logs.append(self._prompt_size_log(filtered_soul))
+        return {"story": await self.instantiate_story_async(filtered_soul, domain, mode), "logs": logs}
+
+    def _batch_domains(self, domains: List[str]) -> List[str]:
+        domains = list(dict.fromkeys(domains))
+        if len(domains) > self.batch_max_domains:
+            raise ValueError(f"At most {self.batch_max_domains} domains per batch (got {len(domains)})")
+        return domains
+
+    def process_batch(self, text: str, domains: List[str], document_id: Optional[str] = None,
+                      mode: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Extracts the soul once and renders it into every domain in parallel.
+        Returns the shared extraction logs and graph plus per-domain results.
+        """
+        domains = self._batch_domains(domains)
+        extract_logs: List[str] = []
+        soul, document_id = self.soul_for(text, document_id, logs=extract_logs)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(len(domains), self.batch_max_domains))) as pool:
+            rendered = list(pool.map(bind(lambda d: self._render_domain(soul, d, mode)), domains))
+
+        return {
+            "logs": extract_logs,
+            "graph": soul.model_dump(),
+            "results": dict(zip(domains, rendered)),
+            "document_id": document_id,
         }
+
+    async def process_batch_async(self, text: str, domains: List[str],
+                                  document_id: Optional[str] = None, mode: Optional[str] = None) -> Dict[str, Any]:
+        domains = self._batch_domains(domains)
+        extract_logs: List[str] = []
+        soul, document_id = await self.soul_for_async(text, document_id, logs=extract_logs)
+
+        rendered = await asyncio.gather(*(self._render_domain_async(soul, d, mode) for d in domains))
+
+        return {
+            "logs": extract_logs,
+            "graph": soul.model_dump(),
+            "results": dict(zip(domains, rendered)),
+            "document_id": document_id,
+        }
+
+    async def process_stream(self, text: str, domain: str, document_id: Optional[str] = None,
+                             mode: Optional[str] = None) -> AsyncIterator[tuple[str, Any]]:
+        """
+        Streaming form of process_async. Yields (event, data) pairs:
+        "stage" when a pipeline stage starts, "log" for each log line,
+        "graph" once the soul exists, "token" for each story fragment
+        and finally "done" with the full story.
+        """
+        yield "stage", "extract"
+        extract_logs: List[str] = []
+        soul, document_id = await self.soul_for_async(text, document_id, logs=extract_logs)
+        for line in extract_logs:
+            yield "log", line
+        yield "graph", soul.model_dump()
+
+        yield "stage", "forget"
+        filtered_soul, logs = self.contextual_forgetting(soul, domain)
+        logs.append(self._prompt_size_log(filtered_soul))
+        for line in logs:
+            yield "log", line
+
+        yield "stage", "instantiate"
+        parts: List[str] = []
+        async for token in self.instantiate_story_stream(filtered_soul, domain, mode):
+            parts.append(token)
+            yield "token", token
+
+        yield "done", {"story": "".join(parts), "document_id": document_id}
@@ -0,0 +1,125 @@
+"""
+In-process fake GLM backend
+===========================
+
+Deterministic stand-ins for ``LLMClient`` / ``AsyncLLMClient`` that answer
+with canned Story Soul JSON and prose after a configurable delay, without
+network access or an API key. They subclass the real clients and replace
+only the upstream call, so request coalescing, JSON parsing and tracing
+behave exactly as in production.
+
+Select them with ``LLM_BACKEND=fake`` (latency from ``FAKE_LLM_LATENCY``,
+in seconds) or construct them directly for benchmarks.
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+from .llm_client import LLMClient, AsyncLLMClient, GLM_MODEL
+from .singleflight import SingleFlight
+
+
+def _ref(category: str, concept_id: str, label: str) -> Dict[str, Any]:
+    return {"category": category, "id": concept_id, "label": label}
+
+
+CANNED_SOUL: Dict[str, Any] = {
+    "title": "走れメロス (Fake)",
+    "theme": _ref("meta", "MT_TRUST", "信頼"),
+    "characters": [
+        {"id": "CH001", "name": "メロス", "role": _ref("character_function", "CF_HERO", "主人公")},
+        {"id": "CH002", "name": "ディオニス", "role": _ref("character_function", "CF_VILLAIN", "敵対者")},
+        {"id": "CH003", "name": "セリヌンティウス", "role": _ref("character_function", "CF_HELPER", "協力者")},
+    ],
+    "structure": [
+        {
+            "id": "SC01",
+            "context": {
+                "time": _ref("temporal", "TM_DAY", "昼"),
+                "place": _ref("spatial", "SP_CITY", "市街"),
+            },
+            "events": [
+                {"actor_id": "CH001", "action": _ref("action", "AC_OBSERVE", "目撃する"),
+                 "emotion": _ref("emotion", "EM_ANGER", "激怒")},
+                {"actor_id": "CH001", "action": _ref("action", "AC_DECIDE", "決意する"),
+                 "target_id": "CH002", "motivation": _ref("causality", "CS_JUSTICE", "正義感")},
+            ],
+        },
+        {
+            "id": "SC02",
+            "context": {"time": _ref("temporal", "TM_DUSK", "夕暮れ")},
+            "events": [
+                {"actor_id": "CH001", "action": _ref("action", "AC_RUN", "走る"),
+                 "target_id": "CH003", "emotion": _ref("emotion", "EM_HOPE", "希望")},
+            ],
+        },
+    ],
+    "relationships": [
+        {"source_id": "CH001", "target_id": "CH002", "relation": _ref("relationship", "RL_HOSTILITY", "敵対")},
+        {"source_id": "CH001", "target_id": "CH003", "relation": _ref("relationship", "RL_FRIENDSHIP", "友情"),
+         "strength": 0.9},
+    ],
+}
+
+CANNED_STORY = (
+    "（Fake出力）若き剣士は城下の噂に激怒した。友との約束を胸に、"
+    "夕暮れの街道をひた走る。沈む陽よりも速く、信頼だけを頼りに。"
+)
+
+
+def _latency_from_env() -> float:
+    return float(os.getenv("FAKE_LLM_LATENCY", "0.05"))
+
+
+class FakeLLMClient(LLMClient):
+    """Synchronous fake: sleeps `latency` seconds per upstream call"""
+
+    def __init__(self, latency: Optional[float] = None, soul: Optional[Dict[str, Any]] = None,
+                 story: str = CANNED_STORY):
+        self.api_key = "fake"
+        self.client = object()  # is_available() only checks for a client
+        self.model = GLM_MODEL
+        self.flights = SingleFlight()
+        self.latency = _latency_from_env() if latency is None else latency
+        self.soul = soul or CANNED_SOUL
+        self.story = story
+        self.calls = 0
+
+    def _create(self, system_prompt: str, user_prompt: str, temperature: float, kind: str) -> str:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return json.dumps(self.soul, ensure_ascii=False) if kind == "json" else self.story
+
+
+class AsyncFakeLLMClient(AsyncLLMClient):
+    """Event-loop fake: awaits `latency` seconds per upstream call; streams the story in small pieces"""
+
+    def __init__(self, latency: Optional[float] = None, soul: Optional[Dict[str, Any]] = None,
+                 story: str = CANNED_STORY, chunk_chars: int = 8):
+        super().__init__()
+        self.api_key = "fake"
+        self.latency = _latency_from_env() if latency is None else latency
+        self.soul = soul or CANNED_SOUL
+        self.story = story
+        self.chunk_chars = chunk_chars
+        self.calls = 0
+
+    async def _post(self, payload: Dict[str, Any], kind: str) -> str:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return json.dumps(self.soul, ensure_ascii=False) if kind == "json" else self.story
+
+    async def stream_text(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        for start in range(0, len(self.story), self.chunk_chars):
+            yield self.story[start:start + self.chunk_chars]
+
+    async def aclose(self) -> None:
+        return None
@@ -0,0 +1,123 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, List, Optional, Tuple
+
+try:
+    from pypdf import PdfReader
+    HAS_PYPDF = True
+except ImportError:
+    HAS_PYPDF = False
+
+
+class IngestLimitError(ValueError):
+    """An upload exceeds the configured size or page limits."""
+
+
+async def spool_upload(upload, max_bytes: int, suffix: str = "", chunk_size: int = 1 << 20) -> Path:
+    """
+    Copies an upload (anything with `async read(n)`) to a unique temporary
+    file, aborting as soon as it grows past max_bytes. The caller owns the
+    returned path and must unlink it.
+    """
+    fd, name = tempfile.mkstemp(prefix="lnaes-upload-", suffix=suffix)
+    path = Path(name)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise IngestLimitError(f"Upload exceeds {max_bytes} bytes")
+                out.write(chunk)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return path
+
+
+def pdf_page_count(path: Path) -> int:
+    return len(PdfReader(str(path)).pages)
+
+
+def _extract_range(path: str, start: int, end: int) -> Tuple[int, str]:
+    # Runs in a worker process; each worker opens its own reader
+    reader = PdfReader(path)
+    return start, "\n".join((reader.pages[i].extract_text() or "") for i in range(start, end))
+
+
+class PdfExtractor:
+    """
+    Page-parallel PDF text extraction on a process pool.
+
+    Pages are split into ranges of `pages_per_task`; small documents (a single
+    range) are extracted in a thread instead, since starting worker processes
+    would cost more than it saves. The pool is created on first use and uses
+    the spawn start method, which is safe in a threaded server (scripts that
+    run the app in-process need the usual `if __name__ == "__main__"` guard).
+    """
+
+    def __init__(self, workers: int = 2, pages_per_task: int = 16, max_pages: int = 500):
+        self.workers = workers
+        self.pages_per_task = pages_per_task
+        self.max_pages = max_pages
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def from_env(cls) -> "PdfExtractor":
+        return cls(
+            workers=int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1)))),
+            pages_per_task=int(os.getenv("PDF_PAGES_PER_TASK", "16")),
+            max_pages=int(os.getenv("PDF_MAX_PAGES", "500")),
+        )
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def page_count(self, path: Path) -> int:
+        pages = await asyncio.to_thread(pdf_page_count, path)
+        if pages > self.max_pages:
+            raise IngestLimitError(f"PDF has {pages} pages (limit {self.max_pages})")
+        return pages
+
+    def _ranges(self, pages: int) -> List[Tuple[int, int]]:
+        return [(start, min(pages, start + self.pages_per_task))
+                for start in range(0, pages, self.pages_per_task)]
+
+    async def iter_ranges(self, path: Path, pages: int) -> AsyncIterator[Tuple[int, int, str]]:
+        """Yields (start_page, end_page, text) in page order as ranges finish"""
+        ranges = self._ranges(pages)
+        if len(ranges) <= 1 or self.workers <= 1:
+            for start, end in ranges:
+                _, text = await asyncio.to_thread(_extract_range, str(path), start, end)
+                yield start, end, text
+            return
+
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        futures = [loop.run_in_executor(pool, _extract_range, str(path), start, end) for start, end in ranges]
+        try:
+            # Awaiting in order still lets later ranges run in parallel meanwhile
+            for (start, end), future in zip(ranges, futures):
+                _, text = await future
+                yield start, end, text
+        finally:
+            for future in futures:
+                future.cancel()
+
+    async def extract_text(self, path: Path, pages: int) -> str:
+        return "\n".join([text async for _, _, text in self.iter_ranges(path, pages)])
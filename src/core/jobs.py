@@ -0,0 +1,118 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+class QueueFullError(Exception):
+    """Raised by JobQueue.submit when no more work can be accepted."""
+
+
+@dataclass
+class Job:
+    id: str
+    status: str = "queued"  # queued | running | done | failed
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """
+    Bounded background job queue with a fixed-size asyncio worker pool.
+
+    At most `workers` jobs run at once, which caps concurrent LLM load
+    independently of web traffic; at most `maxsize` jobs may wait, after
+    which submit() raises QueueFullError. Finished jobs are kept for polling
+    up to `keep_finished` entries, oldest evicted first.
+    """
+
+    def __init__(self, workers: int = 4, maxsize: int = 32, keep_finished: int = 1000):
+        self.workers = workers
+        self.maxsize = maxsize
+        self.keep_finished = keep_finished
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._jobs: Dict[str, Job] = {}
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        return cls(
+            workers=int(os.getenv("RENDER_WORKERS", "4")),
+            maxsize=int(os.getenv("RENDER_QUEUE_SIZE", "32")),
+        )
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, work: Callable[[], Awaitable[Any]]) -> Job:
+        if self._queue is None:
+            raise RuntimeError("JobQueue is not started")
+        job = Job(id=uuid.uuid4().hex)
+        try:
+            self._queue.put_nowait((job, work))
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Render queue is full ({self.maxsize} waiting)")
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return {**counts, "workers": self.workers, "capacity": self.maxsize}
+
+    def _finish(self, job: Job) -> None:
+        job.finished_at = time.time()
+        self._finished[job.id] = None
+        while len(self._finished) > self.keep_finished:
+            old_id, _ = self._finished.popitem(last=False)
+            self._jobs.pop(old_id, None)
+
+    async def _worker(self) -> None:
+        while True:
+            job, work = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = await work()
+                job.status = "done"
+            except asyncio.CancelledError:
+                job.status = "failed"
+                job.error = "cancelled"
+                self._finish(job)
+                raise
+            except Exception as e:
+                print(f"Render job {job.id} failed: {e}")
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                self._queue.task_done()
+            self._finish(job)
@@ -0,0 +1,306 @@
+"""
+Lexicon-driven soul extraction
+==============================
+
+Local, zero-cost StorySoul extractor used when the LLM is unavailable.
+
+Every concept label in the ontology (name_ja/name_en of the .cypher nodes,
+CSV concept names and the key terms of their descriptions) is compiled
+into a single Aho-Corasick automaton, together with conjugated forms of
+verb and adjective labels (走る -> 走っ/走り/走れ...). The text is scanned
+once; matches are bucketed into the segmenter's scenes and aggregated into
+scene context (time/place/atmosphere) and events (action, emotion,
+motivation, sensation). Characters are recurring katakana names and
+honorific-marked names.
+"""
+
+import re
+import unicodedata
+from bisect import bisect_right
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .schema import StorySoul, CharacterNode, SceneNode, EventNode, RelationshipEdge, ConceptRef
+from .segmenter import Segmentation
+
+# Concept categories feeding each slot of the soul
+_CONTEXT_SLOTS = {"time": "temporal", "place": "spatial", "atmosphere": "natural"}
+_EVENT_SLOTS = {"emotion": "emotion", "motivation": "causality", "sensory_detail": "sensation"}
+_MAX_EVENTS_PER_SCENE = 3
+
+# Godan verb endings -> conjugation endings that follow the stem
+_GODAN = {
+    "う": "わいえおっ", "く": "かきけこい", "ぐ": "がぎげごい", "す": "さしせそ", "つ": "たちてとっ",
+    "ぬ": "なにねのん", "ぶ": "ばびべぼん", "む": "まみめもん", "る": "らりれろっ",
+}
+_ICHIDAN = ["た", "て", "ない", "ます", "よう", "ず", "ろ"]
+_ADJECTIVE = ["く", "かっ", "さ", "けれ"]
+_DESCRIPTION_SPLIT_RE = re.compile(r"[、・「」〜（）()]|による|に対する|に基づく|への|から|する|の|に|を|が|は|と|や|な|で")
+_CONTENT_CHAR_RE = re.compile(r"[一-鿿゠-ヿ々]")
+_NAME_RE = re.compile(r"[ァ-ヴ][ァ-ヴー・]+")
+_HONORIFIC_RE = re.compile(r"([一-鿿々]{1,4})(?:さん|様|さま|君|くん|殿|先生|ちゃん)")
+_MIN_PATTERN_CHARS = 2
+_MIN_NAME_MENTIONS = 2
+_MAX_CHARACTERS = 6
+
+
+def _fold(text: str) -> str:
+    # Per-character NFKC + casefold; characters whose normal form is longer
+    # are kept as-is so that match offsets stay valid for the original text
+    out = []
+    for ch in text:
+        folded = unicodedata.normalize("NFKC", ch).casefold()
+        out.append(folded if len(folded) == 1 else ch)
+    return "".join(out)
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: all occurrences of all patterns in one pass over the text."""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, Any]]] = [[]]
+        self._built = False
+
+    def add(self, pattern: str, value: Any) -> None:
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(pattern), value))
+        self._built = False
+
+    def build(self) -> "AhoCorasick":
+        queue = deque(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+        return self
+
+    def iter(self, text: str) -> Iterable[Tuple[int, int, Any]]:
+        """Yields (start, end, value) for every (possibly overlapping) occurrence"""
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, value in out[node]:
+                yield i + 1 - length, i + 1, value
+
+
+@dataclass(frozen=True)
+class Term:
+    concept_id: str
+    category: str
+    label: str
+    weight: float
+    ascii: bool = False
+
+
+@dataclass
+class Match:
+    start: int
+    end: int
+    term: Term
+
+
+def _verb_forms(label: str) -> List[str]:
+    stem, last = label[:-1], label[-1]
+    if not stem or not _CONTENT_CHAR_RE.search(stem):
+        return []
+    forms = [stem + ending for ending in _GODAN.get(last, "")]
+    if last == "る":
+        forms += [stem + ending for ending in _ICHIDAN]
+    elif last == "い":
+        forms += [stem + ending for ending in _ADJECTIVE]
+    return forms
+
+
+def _description_terms(description: str) -> List[str]:
+    gloss = description.split("。")[0]
+    return [piece for piece in _DESCRIPTION_SPLIT_RE.split(gloss)
+            if 2 <= len(piece) <= 8 and _CONTENT_CHAR_RE.search(piece)]
+
+
+class Lexicon:
+    """Compiled concept-label automaton for one ontology."""
+
+    def __init__(self, terms: Iterable[Tuple[str, Term]]):
+        self.automaton = AhoCorasick()
+        self.size = 0
+        seen = set()
+        for pattern, term in terms:
+            pattern = _fold(pattern)
+            if len(pattern) < _MIN_PATTERN_CHARS or (pattern, term.concept_id) in seen:
+                continue
+            seen.add((pattern, term.concept_id))
+            self.automaton.add(pattern, term)
+            self.size += 1
+        self.automaton.build()
+
+    @classmethod
+    def from_ontology(cls, ontology) -> "Lexicon":
+        """Compiles every concept of an OntologyLoader"""
+        terms = []
+        for cid, row in ontology.concepts.items():
+            category = ontology.category_for_id(cid)
+            if category is None:
+                continue
+            name_ja = row.get("name_ja") or ""
+            gloss = (row.get("description") or "").split("。")[0]
+            label = name_ja or (gloss if 0 < len(gloss) <= 10 else row.get("concept") or cid)
+            for name in (row.get("concept"), row.get("name_en")):
+                if name and name.isascii() and len(name) >= 4:
+                    terms.append((name.replace("_", " "), Term(cid, category, label, 1.0, ascii=True)))
+            if name_ja:
+                terms.append((name_ja, Term(cid, category, label, 1.0)))
+                terms += [(form, Term(cid, category, label, 1.0)) for form in _verb_forms(name_ja)]
+            for piece in _description_terms(row.get("description") or ""):
+                terms.append((piece, Term(cid, category, label, 0.5)))
+        return cls(terms)
+
+    def scan(self, text: str) -> List[Match]:
+        """
+        Non-overlapping matches in text order; where patterns overlap the
+        longest (then earliest) one wins. ASCII labels must match whole words.
+        """
+        folded = _fold(text)
+        candidates = []
+        for start, end, term in self.automaton.iter(folded):
+            if term.ascii and ((start > 0 and folded[start - 1].isalnum())
+                               or (end < len(folded) and folded[end].isalnum())):
+                continue
+            candidates.append(Match(start, end, term))
+        candidates.sort(key=lambda m: (-(m.end - m.start), m.start))
+        taken = bytearray(len(text))
+        chosen = []
+        for match in candidates:
+            if any(taken[match.start:match.end]):
+                continue
+            taken[match.start:match.end] = b"\x01" * (match.end - match.start)
+            chosen.append(match)
+        chosen.sort(key=lambda m: m.start)
+        return chosen
+
+
+def find_characters(text: str, exclude: Iterable[str] = ()) -> List[Tuple[str, int]]:
+    """Recurring katakana or honorific-marked names, most mentioned first, as (name, mentions)"""
+    skip = {_fold(word) for word in exclude}
+    counts = Counter(name.strip("・") for name in _NAME_RE.findall(text))
+    counts.update(_HONORIFIC_RE.findall(text))
+    ranked = [(name, n) for name, n in counts.most_common()
+              if n >= _MIN_NAME_MENTIONS and len(name) >= 2 and _fold(name) not in skip]
+    return ranked[:_MAX_CHARACTERS]
+
+
+def _ref(term: Term) -> ConceptRef:
+    return ConceptRef(category=term.category, id=term.concept_id, label=term.label)
+
+
+def _top(matches: List[Match], category: str) -> Optional[Term]:
+    scores: Dict[Term, float] = {}
+    for match in matches:
+        if match.term.category == category:
+            key = Term(match.term.concept_id, category, match.term.label, 0.0)
+            scores[key] = scores.get(key, 0.0) + match.term.weight
+    # max() keeps the first-seen term on ties, i.e. the earliest in the scene
+    return max(scores, key=scores.get) if scores else None
+
+
+def heuristic_soul(lexicon: Lexicon, text: str, segmentation: Segmentation) -> StorySoul:
+    """Builds a StorySoul from lexicon matches, one SceneNode per segmenter scene."""
+    scenes = segmentation.scenes
+    matches = lexicon.scan(text)
+    starts = [scene.start for scene in scenes]
+    per_scene: List[List[Match]] = [[] for _ in scenes]
+    for match in matches:
+        index = bisect_right(starts, match.start) - 1
+        if index >= 0 and match.start < scenes[index].end:
+            per_scene[index].append(match)
+
+    labels = {m.term.label for m in matches}
+    body = "\n".join(text[scene.start:scene.end] for scene in scenes) or text
+    names = [name for name, _ in find_characters(body, exclude=labels)] or ["主人公"]
+    characters = [
+        CharacterNode(
+            id=f"CH{i + 1:03d}",
+            name=name,
+            role=ConceptRef(category="character_function", id="CF_HERO", label="主人公") if i == 0
+            else ConceptRef(category="character_function", id="CF_HELPER", label="協力者"),
+        )
+        for i, name in enumerate(names)
+    ]
+
+    structure = []
+    pair_scenes: Counter = Counter()
+    pair_relations: Dict[Tuple[str, str], Counter] = {}
+    for scene, found in zip(scenes, per_scene):
+        scene_text = text[scene.start:scene.end]
+        present = sorted((c for c in characters if c.name in scene_text),
+                         key=lambda c: -scene_text.count(c.name))
+        actor = present[0].id if present else characters[0].id
+        target = present[1].id if len(present) > 1 else None
+
+        context = {slot: _ref(term) for slot, category in _CONTEXT_SLOTS.items()
+                   if (term := _top(found, category)) is not None}
+        extras = {slot: _ref(term) for slot, category in _EVENT_SLOTS.items()
+                  if (term := _top(found, category)) is not None}
+        actions: List[Term] = []
+        for match in found:
+            if match.term.category == "action" and all(a.concept_id != match.term.concept_id for a in actions):
+                actions.append(match.term)
+        events = [
+            EventNode(actor_id=actor, action=_ref(term), target_id=target, **(extras if i == 0 else {}))
+            for i, term in enumerate(actions[:_MAX_EVENTS_PER_SCENE])
+        ]
+        structure.append(SceneNode(id=scene.id, context=context, events=events,
+                                   source_span=(scene.start, scene.end)))
+
+        for i, a in enumerate(present):
+            for b in present[i + 1:]:
+                pair = (a.id, b.id)
+                pair_scenes[pair] += 1
+                relation = _top(found, "relationship")
+                if relation is not None:
+                    pair_relations.setdefault(pair, Counter())[relation] += 1
+
+    relationships = []
+    for pair, together in pair_scenes.items():
+        relations = pair_relations.get(pair)
+        if not relations:
+            continue
+        relation = relations.most_common(1)[0][0]
+        relationships.append(RelationshipEdge(
+            source_id=pair[0], target_id=pair[1], relation=_ref(relation),
+            strength=round(min(1.0, together / max(1, len(scenes)) * 2), 2),
+        ))
+
+    theme = _top(matches, "meta")
+    return StorySoul(
+        title=segmentation.title or (scenes[0].heading if scenes and scenes[0].heading else "無題"),
+        theme=_ref(theme) if theme else None,
+        characters=characters,
+        structure=structure,
+        relationships=relationships,
+    )
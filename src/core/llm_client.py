@@ -1,30 +1,94 @@
 import os
 import json
+import asyncio
+import time
+import httpx
 from dotenv import load_dotenv
 from zhipuai import ZhipuAI
-from typing import Dict, Any, List
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional, AsyncIterator
+
+from .metrics import LLM_ERRORS, LLM_LATENCY, record_usage
+from .ratelimit import RateLimiter
+from .singleflight import SingleFlight, AsyncSingleFlight, flight_key
+from .tracing import span
 
 # Load environment variables
 load_dotenv()
 
+GLM_BASE_URL = "https://open.bigmodel.cn/api/coding/paas/v4"
+GLM_MODEL = "glm-4.7"
+
+
+def _parse_json_content(content: str) -> Dict[str, Any]:
+    # Basic cleanup to extract JSON if wrapped in code blocks
+    if "```json" in content:
+        content = content.split("```json")[1].split("```")[0]
+    elif "```" in content:
+        content = content.split("```")[1].split("```")[0]
+    return json.loads(content.strip())
+
+
 class LLMClient:
     def __init__(self):
         self.api_key = os.getenv("GLM_API_KEY")
+        # Same endpoint override as AsyncLLMClient, so both paths call one upstream
+        self.base_url = os.getenv("GLM_BASE_URL", GLM_BASE_URL)
         if not self.api_key:
             # Fallback for dev/test if env var not set
             print("Warning: GLM_API_KEY not found in environment variables.")
             self.client = None
         else:
+            # Retries are handled by RateLimiter so backoff honours our limits
             self.client = ZhipuAI(
                 api_key=self.api_key,
-                base_url="https://open.bigmodel.cn/api/coding/paas/v4"
+                base_url=self.base_url,
+                max_retries=0,
             )
         
-        self.model = "glm-4.7" # Try standard name first with coding endpoint
+        self.model = GLM_MODEL # Try standard name first with coding endpoint
+        # Identical concurrent requests share one upstream call
+        self.flights = SingleFlight()
+        self.limiter = RateLimiter.for_model(self.model)
 
     def is_available(self) -> bool:
         return self.client is not None
 
+    def _create(self, system_prompt: str, user_prompt: str, temperature: float, kind: str) -> str:
+        def create():
+            started = time.perf_counter()
+            try:
+                return self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                    top_p=0.7,
+                    temperature=temperature,
+                )
+            except Exception:
+                LLM_ERRORS.inc(client="sync", kind=kind)
+                raise
+            finally:
+                LLM_LATENCY.observe(time.perf_counter() - started, client="sync", kind=kind)
+
+        response = self.limiter.call(create)
+        record_usage(getattr(response, "usage", None))
+        return response.choices[0].message.content
+
+    def _chat(self, system_prompt: str, user_prompt: str, temperature: float, parse=None) -> Any:
+        kind = "json" if parse else "text"
+        key = flight_key(kind=kind, model=self.model, system=system_prompt,
+                         user=user_prompt, temperature=temperature, top_p=0.7)
+
+        def call():
+            content = self._create(system_prompt, user_prompt, temperature, kind)
+            return parse(content) if parse else content
+
+        with span(f"llm.{kind}", client="sync", model=self.model, prompt_chars=len(system_prompt) + len(user_prompt)):
+            return self.flights.do(key, call)
+
     def generate_json(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
         """
         Generates JSON output from the LLM.
@@ -33,25 +97,8 @@ class LLMClient:
             raise RuntimeError("LLM Client is not initialized (Missing API Key)")
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                top_p=0.7,
-                temperature=0.5,
-            )
-            
-            content = response.choices[0].message.content
-            # Basic cleanup to extract JSON if wrapped in code blocks
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0]
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0]
-            
-            return json.loads(content.strip())
-            
+            return self._chat(system_prompt, user_prompt, temperature=0.5, parse=_parse_json_content)
+
         except Exception as e:
             print(f"LLM JSON Generation Error: {e}")
             # Fallback empty dict or re-raise depending on strictness
@@ -65,16 +112,197 @@ class LLMClient:
             raise RuntimeError("LLM Client is not initialized (Missing API Key)")
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                top_p=0.7,
-                temperature=0.7,
+            return self._chat(system_prompt, user_prompt, temperature=0.7)
+        except Exception as e:
+            print(f"LLM Text Generation Error: {e}")
+            raise e
+
+
+class AsyncLLMClient:
+    """
+    Non-blocking counterpart of LLMClient for use inside the event loop.
+    Talks to the OpenAI-compatible GLM endpoint over a pooled httpx.AsyncClient,
+    so concurrent renders reuse keep-alive connections instead of blocking a worker.
+    Pool size and timeouts can be tuned with GLM_MAX_CONNECTIONS,
+    GLM_MAX_KEEPALIVE, GLM_CONNECT_TIMEOUT and GLM_READ_TIMEOUT.
+    """
+
+    def __init__(
+        self,
+        max_connections: Optional[int] = None,
+        max_keepalive: Optional[int] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+    ):
+        self.api_key = os.getenv("GLM_API_KEY")
+        self.model = GLM_MODEL
+        self.base_url = os.getenv("GLM_BASE_URL", GLM_BASE_URL)
+        self.limits = httpx.Limits(
+            max_connections=max_connections or int(os.getenv("GLM_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=max_keepalive or int(os.getenv("GLM_MAX_KEEPALIVE", "10")),
+            keepalive_expiry=30.0,
+        )
+        read = read_timeout or float(os.getenv("GLM_READ_TIMEOUT", "120"))
+        self.timeout = httpx.Timeout(
+            read,
+            connect=connect_timeout or float(os.getenv("GLM_CONNECT_TIMEOUT", "10")),
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self.flights = AsyncSingleFlight()
+        self.limiter = RateLimiter.for_model(self.model)
+        # Calls in progress; a retired client closes its pool when this drops to zero
+        self.in_flight = 0
+        self._retired = False
+
+    def is_available(self) -> bool:
+        return bool(self.api_key)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Created lazily so the pool binds to the running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                limits=self.limits,
+                timeout=self.timeout,
             )
-            return response.choices[0].message.content
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def retire(self) -> None:
+        """Closes the pool now if idle, otherwise when the last in-flight call finishes."""
+        self._retired = True
+        if not self.in_flight:
+            await self.aclose()
+
+    @asynccontextmanager
+    async def _tracked(self):
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            if self._retired and not self.in_flight:
+                await self.aclose()
+
+    def _payload(self, system_prompt: str, user_prompt: str, temperature: float, stream: bool = False) -> Dict[str, Any]:
+        if not self.is_available():
+            raise RuntimeError("LLM Client is not initialized (Missing API Key)")
+
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "top_p": 0.7,
+            "temperature": temperature,
+        }
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    async def _post(self, payload: Dict[str, Any], kind: str) -> str:
+        async def post():
+            started = time.perf_counter()
+            try:
+                response = await self._get_client().post("/chat/completions", json=payload)
+                response.raise_for_status()
+                return response
+            except Exception:
+                LLM_ERRORS.inc(client="async", kind=kind)
+                raise
+            finally:
+                LLM_LATENCY.observe(time.perf_counter() - started, client="async", kind=kind)
+
+        data = (await self.limiter.call_async(post)).json()
+        record_usage(data.get("usage"))
+        return data["choices"][0]["message"]["content"]
+
+    async def _chat(self, system_prompt: str, user_prompt: str, temperature: float, parse=None) -> Any:
+        payload = self._payload(system_prompt, user_prompt, temperature)
+        # Identical concurrent requests share one upstream call
+        kind = "json" if parse else "text"
+        key = flight_key(kind=kind, **payload)
+
+        async def call():
+            content = await self._post(payload, kind)
+            return parse(content) if parse else content
+
+        with span(f"llm.{kind}", client="async", model=self.model, prompt_chars=len(system_prompt) + len(user_prompt)):
+            async with self._tracked():
+                return await self.flights.do(key, call)
+
+    async def generate_json(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+        """
+        Generates JSON output from the LLM without blocking the event loop.
+        """
+        try:
+            return await self._chat(system_prompt, user_prompt, temperature=0.5, parse=_parse_json_content)
+        except Exception as e:
+            print(f"LLM JSON Generation Error: {e}")
+            raise e
+
+    async def generate_text(self, system_prompt: str, user_prompt: str) -> str:
+        """
+        Generates text output from the LLM without blocking the event loop.
+        """
+        try:
+            return await self._chat(system_prompt, user_prompt, temperature=0.7)
         except Exception as e:
             print(f"LLM Text Generation Error: {e}")
             raise e
+
+    async def stream_text(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        """
+        Streams text output from the LLM, yielding content deltas as the
+        server-sent chunks arrive.
+        """
+        payload = self._payload(system_prompt, user_prompt, temperature=0.7, stream=True)
+        self.limiter.calls += 1
+        with span("llm.stream", client="async", model=self.model,
+                  prompt_chars=len(system_prompt) + len(user_prompt)):
+            async with self._tracked():
+                attempt = 0
+                while True:
+                    started = await self.limiter.acquire_async()
+                    streamed = False
+                    try:
+                        async with self._get_client().stream("POST", "/chat/completions", json=payload) as response:
+                            response.raise_for_status()
+                            async for line in response.aiter_lines():
+                                if not line.startswith("data:"):
+                                    continue
+                                data = line[len("data:"):].strip()
+                                if data == "[DONE]":
+                                    break
+                                chunk = json.loads(data)
+                                # GLM reports usage on the final chunk
+                                record_usage(chunk.get("usage"))
+                                choices = chunk.get("choices") or []
+                                if choices:
+                                    delta = (choices[0].get("delta") or {}).get("content")
+                                    if delta:
+                                        streamed = True
+                                        yield delta
+                        LLM_LATENCY.observe(time.monotonic() - started, client="async", kind="stream")
+                        self.limiter.record_success(started)
+                        return
+                    except Exception as e:
+                        LLM_ERRORS.inc(client="async", kind="stream")
+                        # Only retry before the first token; a partial stream cannot be resumed
+                        delay = None if streamed else self.limiter.record_failure(e, started, attempt)
+                        if streamed:
+                            self.limiter.window.release()
+                        if delay is None:
+                            print(f"LLM Text Streaming Error: {e}")
+                            raise e
+                    except BaseException:
+                        self.limiter.window.release()
+                        raise
+                    await asyncio.sleep(delay)
+                    attempt += 1
@@ -0,0 +1,107 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from cachetools import LRUCache
+
+
+class MemUStore:
+    """
+    Multi-document narrative memory.
+
+    Values are keyed by document/session ID and kept in two tiers: a bounded
+    in-memory LRU for hot entries and an embedded SQLite database that
+    persists across restarts. Pydantic models are stored as their dict dump.
+    Pass db_path=None for a memory-only store.
+    """
+
+    def __init__(self, db_path: Optional[Path] = None, hot_size: int = 256):
+        self._hot: LRUCache = LRUCache(maxsize=hot_size)
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path is not None:
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS memu ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @classmethod
+    def from_env(cls, default_path: Optional[Path] = None) -> "MemUStore":
+        db_path = os.getenv("MEMU_DB_PATH")
+        path = Path(db_path) if db_path else default_path
+        return cls(db_path=path, hot_size=int(os.getenv("MEMU_HOT_SIZE", "256")))
+
+    @staticmethod
+    def _encode(value: Any) -> Any:
+        # Convert Pydantic models to dict
+        if hasattr(value, "model_dump"):
+            return value.model_dump()
+        return value
+
+    def store(self, key: str, value: Any) -> None:
+        self.put_many({key: value})
+
+    def retrieve(self, key: str) -> Any:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: Dict[str, Any]) -> None:
+        encoded = {key: self._encode(value) for key, value in items.items()}
+        now = time.time()
+        with self._lock:
+            for key, value in encoded.items():
+                self._hot[key] = value
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO memu (key, value, updated_at) VALUES (?, ?, ?)",
+                    [(key, json.dumps(value, ensure_ascii=False), now) for key, value in encoded.items()],
+                )
+                self._db.commit()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Returns the values found for keys; misses are simply absent."""
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, Any] = {}
+        with self._lock:
+            missing: List[str] = []
+            for key in keys:
+                if key in self._hot:
+                    found[key] = self._hot[key]
+                else:
+                    missing.append(key)
+
+            if missing and self._db is not None:
+                # Chunk to stay under SQLite's bound-parameter limit
+                for start in range(0, len(missing), 500):
+                    chunk = missing[start:start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = self._db.execute(
+                        f"SELECT key, value FROM memu WHERE key IN ({placeholders})", chunk
+                    ).fetchall()
+                    for key, raw in rows:
+                        value = json.loads(raw)
+                        self._hot[key] = value
+                        found[key] = value
+        return found
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._hot.pop(key, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM memu WHERE key = ?", (key,))
+                self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,220 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional["Registry"] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(_Metric):
+    """Monotonic counter; inc(amount, **labels)"""
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(v)}" for key, v in items]
+
+
+class Gauge(_Metric):
+    """Point-in-time value; set(value, **labels)"""
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(v)}" for key, v in items]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram; observe(value, **labels) or `with h.time(**labels):`"""
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, key, f'le="{_format_number(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_number(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- Application metrics -------------------------------------------------------
+
+HTTP_REQUESTS = Counter(
+    "lnaes_http_requests_total", "HTTP requests by route, method and status",
+    ["route", "method", "status"],
+)
+HTTP_LATENCY = Histogram(
+    "lnaes_http_request_duration_seconds", "HTTP request latency by route",
+    ["route", "method"],
+)
+STAGE_LATENCY = Histogram(
+    "lnaes_stage_duration_seconds", "StoryEngine pipeline stage latency (extract, forget, instantiate)",
+    ["stage"],
+)
+LLM_LATENCY = Histogram(
+    "lnaes_llm_request_duration_seconds", "Latency of each upstream GLM request",
+    ["client", "kind"],
+)
+LLM_ERRORS = Counter(
+    "lnaes_llm_errors_total", "Failed upstream GLM requests (including retried ones)",
+    ["client", "kind"],
+)
+LLM_FALLBACKS = Counter(
+    "lnaes_llm_fallbacks_total", "Pipeline stages answered by a local fallback instead of the LLM",
+    ["stage"],
+)
+LLM_TOKENS = Counter(
+    "lnaes_llm_tokens_total", "Token usage reported by GLM responses",
+    ["type"],
+)
+RENDER_JOBS = Gauge(
+    "lnaes_render_jobs", "Render job queue: jobs by status (queued, running, done, failed), workers and capacity",
+    ["state"],
+)
+UPLOAD_BYTES = Histogram(
+    "lnaes_upload_bytes", "Size of files received by /api/upload",
+    ["kind"], buckets=(1e3, 1e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7),
+)
+UPLOAD_PDF_PAGES = Histogram(
+    "lnaes_upload_pdf_pages", "Page count of PDFs received by /api/upload",
+    buckets=(1, 5, 10, 25, 50, 100, 200, 300, 500, 1000),
+)
+
+
+def record_usage(usage) -> None:
+    """Counts prompt/completion tokens from an OpenAI-style usage object or dict"""
+    if not usage:
+        return
+    for kind in ("prompt", "completion"):
+        field = f"{kind}_tokens"
+        value = usage.get(field) if isinstance(usage, dict) else getattr(usage, field, None)
+        if value:
+            LLM_TOKENS.inc(value, type=kind)
@@ -0,0 +1,323 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+import httpx
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+# Responses that mean the upstream is saturated; they shrink the concurrency window like a 429
+OVERLOAD_STATUS = {408, 429, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, holding at most `burst`.
+
+    reserve() takes a token immediately (the balance may go negative) and
+    returns how long the caller must wait before using it, so the same
+    bucket can pace threads and event-loop tasks alike.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+    def tokens(self) -> float:
+        with self._lock:
+            elapsed = time.monotonic() - self._updated
+            return min(self.burst, self._tokens + elapsed * self.rate)
+
+
+class _AsyncWaiter:
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+        self.granted = False
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency window shared by sync and async callers.
+
+    Every successful call under the latency target grows the window by
+    1/limit (about +1 per window of calls); a throttled or overloaded call
+    halves it, a slow call shrinks it by 10% and other failures leave it
+    unchanged. Decreases are applied at most once per
+    `cooldown` seconds so one burst of 429s does not collapse the window.
+    """
+
+    def __init__(self, initial: float = 4, minimum: float = 1, maximum: float = 16,
+                 latency_target: float = 60.0, cooldown: float = 1.0):
+        self.limit = float(initial)
+        self.minimum = float(minimum)
+        self.maximum = float(maximum)
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self.inflight = 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._async_waiters: Deque[_AsyncWaiter] = deque()
+
+    def _has_room(self) -> bool:
+        return self.inflight < max(1, int(self.limit))
+
+    def _wake_locked(self) -> None:
+        while self._async_waiters and self._has_room():
+            waiter = self._async_waiters.popleft()
+            if waiter.future.cancelled():
+                continue
+            waiter.granted = True
+            self.inflight += 1
+            waiter.loop.call_soon_threadsafe(_resolve, waiter.future)
+        self._cond.notify_all()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while not self._has_room():
+                self._cond.wait()
+            self.inflight += 1
+
+    async def acquire_async(self) -> None:
+        with self._lock:
+            if self._has_room() and not self._async_waiters:
+                self.inflight += 1
+                return
+            waiter = _AsyncWaiter()
+            self._async_waiters.append(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.granted:
+                    # The slot was handed over just as we were cancelled
+                    self.inflight -= 1
+                    self._wake_locked()
+                else:
+                    self._async_waiters.remove(waiter)
+            raise
+
+    def release(self, latency: Optional[float] = None, throttled: bool = False, failed: bool = False) -> None:
+        with self._lock:
+            self.inflight -= 1
+            now = time.monotonic()
+            if throttled or (latency is not None and latency > self.latency_target):
+                if now - self._last_decrease >= self.cooldown:
+                    factor = 0.5 if throttled else 0.9
+                    self.limit = max(self.minimum, self.limit * factor)
+                    self._last_decrease = now
+            elif latency is not None and not failed:
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._wake_locked()
+
+
+def _status_of(exc: BaseException) -> Optional[int]:
+    # Works for httpx.HTTPStatusError and zhipuai.APIStatusError alike
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    value = headers.get("retry-after") if headers is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def _is_connection_error(exc: BaseException) -> bool:
+    if isinstance(exc, httpx.TransportError):
+        return True
+    # zhipuai.APIConnectionError / APITimeoutError without importing the SDK here
+    return type(exc).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+class RateLimiter:
+    """
+    Client-side protection for one model on the GLM endpoint: a token bucket
+    for request rate, an AIMD window for concurrency, and retry with
+    exponential backoff and full jitter that honours Retry-After.
+
+    Use RateLimiter.for_model() so every client of a model shares one limiter.
+    Tunable with GLM_RATE_LIMIT, GLM_RATE_BURST, GLM_MAX_RETRIES,
+    GLM_BACKOFF_BASE, GLM_BACKOFF_MAX, GLM_CONCURRENCY_INITIAL,
+    GLM_CONCURRENCY_MAX and GLM_LATENCY_TARGET.
+    """
+
+    _registry: Dict[str, "RateLimiter"] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, bucket: TokenBucket, window: AdaptiveConcurrency,
+                 max_retries: int = 3, backoff_base: float = 1.0, backoff_max: float = 30.0):
+        self.bucket = bucket
+        self.window = window
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        return cls(
+            TokenBucket(
+                rate=float(os.getenv("GLM_RATE_LIMIT", "5")),
+                burst=int(os.getenv("GLM_RATE_BURST", "10")),
+            ),
+            AdaptiveConcurrency(
+                initial=float(os.getenv("GLM_CONCURRENCY_INITIAL", "4")),
+                maximum=float(os.getenv("GLM_CONCURRENCY_MAX", "16")),
+                latency_target=float(os.getenv("GLM_LATENCY_TARGET", "60")),
+            ),
+            max_retries=int(os.getenv("GLM_MAX_RETRIES", "3")),
+            backoff_base=float(os.getenv("GLM_BACKOFF_BASE", "1.0")),
+            backoff_max=float(os.getenv("GLM_BACKOFF_MAX", "30")),
+        )
+
+    @classmethod
+    def for_model(cls, model: str) -> "RateLimiter":
+        with cls._registry_lock:
+            if model not in cls._registry:
+                cls._registry[model] = cls.from_env()
+            return cls._registry[model]
+
+    @classmethod
+    def all_stats(cls) -> Dict[str, Dict[str, Any]]:
+        with cls._registry_lock:
+            return {model: limiter.stats() for model, limiter in cls._registry.items()}
+
+    def _classify(self, exc: BaseException) -> tuple[bool, bool, bool]:
+        """Returns (retryable, throttled, overloaded) for a failed call"""
+        status = _status_of(exc)
+        if status is not None:
+            return status in RETRYABLE_STATUS, status == 429, status in OVERLOAD_STATUS
+        # Timeouts and refused/reset connections are overload signals too
+        connection_error = _is_connection_error(exc)
+        return connection_error, False, connection_error
+
+    def backoff(self, attempt: int, exc: Optional[BaseException] = None) -> float:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        hint = _retry_after(exc) if exc is not None else None
+        if hint is not None:
+            delay = max(delay, min(hint, self.backoff_max))
+        return delay
+
+    def acquire(self) -> float:
+        """Waits for a token and a concurrency slot; returns the start time to pass back"""
+        self.bucket.acquire()
+        self.window.acquire()
+        return time.monotonic()
+
+    async def acquire_async(self) -> float:
+        await self.bucket.acquire_async()
+        await self.window.acquire_async()
+        return time.monotonic()
+
+    def record_success(self, started: float) -> None:
+        self.window.release(time.monotonic() - started)
+
+    def record_failure(self, exc: BaseException, started: float, attempt: int) -> Optional[float]:
+        """Releases the slot and returns the delay before the next attempt, or None to give up"""
+        retryable, throttled, overloaded = self._classify(exc)
+        self.window.release(time.monotonic() - started, throttled=overloaded, failed=True)
+        if throttled:
+            self.throttled += 1
+        if not retryable or attempt >= self.max_retries:
+            return None
+        self.retries += 1
+        delay = self.backoff(attempt, exc)
+        reason = str(exc).splitlines()[0] if str(exc) else type(exc).__name__
+        print(f"LLM call failed ({reason}); retrying in {delay:.1f}s")
+        return delay
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        self.calls += 1
+        attempt = 0
+        while True:
+            started = self.acquire()
+            try:
+                result = fn()
+            except Exception as e:
+                delay = self.record_failure(e, started, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                self.window.release()
+                raise
+            self.record_success(started)
+            return result
+
+    async def call_async(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        attempt = 0
+        while True:
+            started = await self.acquire_async()
+            try:
+                result = await fn()
+            except Exception as e:
+                delay = self.record_failure(e, started, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                self.window.release()
+                raise
+            self.record_success(started)
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "concurrency_limit": round(self.window.limit, 2),
+            "inflight": self.window.inflight,
+            "tokens": round(self.bucket.tokens(), 2),
+            "rate": self.bucket.rate,
+        }
@@ -1,4 +1,4 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from pydantic import BaseModel, Field
 
 # Represents a reference to an Ontology Concept
@@ -31,6 +31,7 @@ class SceneNode(BaseModel):
         description="Temporal, Spatial, Natural, Atmosphere"
     )
     events: List[EventNode] = []
+    source_span: Optional[Tuple[int, int]] = None # [start, end) character offsets in the source text
 
 # 3. Relational Layer
 class RelationshipEdge(BaseModel):
@@ -0,0 +1,240 @@
+"""
+Japanese prose segmenter
+========================
+
+Deterministic, dependency-free pre-pass that splits a novel into scenes
+before soul extraction. It works line by line (one line = one paragraph,
+as in Aozora Bunko and most web-novel text files) and recognises:
+
+  * chapter headings (第一章, 序章, プロローグ, ``# 見出し``, bare numerals)
+    -> start a new scene and become its heading
+  * section breaks (＊＊＊, ◇, a ruler line) or two or more blank lines
+    -> start a new scene
+  * runs of 「」/『』 dialogue lines -> one ``dialogue`` block
+  * everything else -> ``paragraph`` blocks
+
+Aozora Bunko front matter (title/author and the notation legend) and the
+colophon (底本：...) are excluded from the body. All offsets are character
+offsets into the original text; block text is cleaned of ruby and input
+annotations for prompting.
+"""
+
+import re
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from .schema import SceneNode, StorySoul
+
+_HEADING_RE = re.compile(
+    r"^(?:第[0-9０-９一二三四五六七八九十百千〇零]+[章話節部幕回編]"
+    r"|序章|終章|序幕|終幕|プロローグ|エピローグ|#{1,6}\s)"
+)
+_NUMBER_HEADING_RE = re.compile(r"^(?:[0-9０-９]{1,3}|[一二三四五六七八九十]{1,3}|[ⅠⅡⅢⅣⅤⅥⅦⅧⅨⅩ]+)[.．、]?$")
+_HEADING_MAX_CHARS = 40
+_BREAK_RE = re.compile(r"^(?:[＊*◇◆□■☆★○●※＃#・ 　]+|[-―—=＝─━]{3,})$")
+_RULER_RE = re.compile(r"^-{10,}$")
+_COLOPHON_RE = re.compile(r"^底本[：:]")
+_RUBY_RE = re.compile(r"《[^》]*》|［＃[^］]*］|｜")
+_DIALOGUE_OPEN = ("「", "『")
+_SENTENCE_END = "。"
+_STRIP = " \t\r　"
+# Content-defined soft boundaries: a block or scene whose checksum is divisible
+# by this ends its scene/group once that is at least a quarter full, so an edit
+# only moves boundaries near it and unchanged regions keep identical segments
+_CUT_MODULUS = 3
+
+
+@dataclass
+class TextBlock:
+    kind: str  # heading | paragraph | dialogue
+    start: int
+    end: int
+    text: str  # cleaned (ruby/annotations removed, indentation stripped)
+    lines: int = 1
+
+
+@dataclass
+class SceneSpan:
+    id: str
+    start: int
+    end: int
+    heading: Optional[str] = None
+    blocks: List[TextBlock] = field(default_factory=list)
+
+    @property
+    def dialogue_runs(self) -> int:
+        return sum(1 for block in self.blocks if block.kind == "dialogue")
+
+    def body(self) -> str:
+        return "\n".join(block.text for block in self.blocks if block.kind != "heading")
+
+    def compact(self) -> str:
+        """Scene as prompt input: an [id] marker line followed by the cleaned blocks"""
+        marker = f"[{self.id}]" if self.heading is None else f"[{self.id}] {self.heading}"
+        return f"{marker}\n{self.body()}"
+
+    def to_scene_node(self) -> SceneNode:
+        return SceneNode(id=self.id, source_span=(self.start, self.end))
+
+
+@dataclass
+class Segmentation:
+    title: Optional[str]
+    scenes: List[SceneSpan]
+
+    def compact(self, scenes: Optional[List[SceneSpan]] = None) -> str:
+        return "\n\n".join(scene.compact() for scene in (self.scenes if scenes is None else scenes))
+
+
+def clean_line(line: str) -> str:
+    return _RUBY_RE.sub("", line).strip(_STRIP)
+
+
+def _is_heading(line: str) -> bool:
+    if len(line) > _HEADING_MAX_CHARS or line.endswith(_SENTENCE_END):
+        return False
+    return bool(_HEADING_RE.match(line) or _NUMBER_HEADING_RE.match(line))
+
+
+def _is_cut_point(text: str) -> bool:
+    return zlib.crc32(text.encode("utf-8")) % _CUT_MODULUS == 0
+
+
+def _lines(text: str) -> List[Tuple[int, int, str]]:
+    # (start, end, raw) with end excluding the newline
+    out = []
+    start = 0
+    for raw in text.split("\n"):
+        out.append((start, start + len(raw), raw))
+        start += len(raw) + 1
+    return out
+
+
+def _front_matter_end(lines: List[Tuple[int, int, str]]) -> int:
+    """Index of the first body line after an Aozora notation legend, or 0"""
+    rulers = [i for i, (_, _, raw) in enumerate(lines[:60]) if _RULER_RE.match(raw.strip(_STRIP))]
+    if len(rulers) >= 2 and "記号について" in "".join(raw for _, _, raw in lines[rulers[0]:rulers[1]]):
+        return rulers[1] + 1
+    return 0
+
+
+def _cut(text: str, start: int, end: int, limit: int) -> List[Tuple[int, int]]:
+    # Splits an over-long paragraph at sentence ends (hard cut if a sentence alone is too long)
+    pieces = []
+    while end - start > limit:
+        pos = text.rfind(_SENTENCE_END, start, start + limit)
+        cut = pos + 1 if pos > start else start + limit
+        pieces.append((start, cut))
+        start = cut
+    pieces.append((start, end))
+    return pieces
+
+
+def segment_text(text: str, max_scene_chars: Optional[int] = None) -> Segmentation:
+    """
+    Splits text into scenes of heading/paragraph/dialogue blocks.
+
+    Scene boundaries come from headings, break lines and blank runs; with
+    max_scene_chars, longer scenes (and single paragraphs) are further
+    divided at paragraph, dialogue-line and sentence ends so that no scene
+    exceeds the limit, preferring content-defined cut points. Scene IDs are SC01.. in
+    document order.
+    """
+    lines = _lines(text)
+    first = _front_matter_end(lines)
+    title = None
+    if first:
+        front = [clean_line(raw) for _, _, raw in lines[:first] if clean_line(raw)]
+        title = front[0] if front else None
+
+    groups: List[Tuple[Optional[str], List[TextBlock]]] = [(None, [])]
+    blank_run = 0
+    for start, end, raw in lines[first:]:
+        stripped = raw.strip(_STRIP)
+        if not stripped:
+            blank_run += 1
+            continue
+        if _COLOPHON_RE.match(stripped):
+            break
+        if blank_run >= 2 and groups[-1][1]:
+            groups.append((None, []))
+        blank_run = 0
+
+        if _BREAK_RE.match(stripped):
+            if groups[-1][1]:
+                groups.append((None, []))
+            continue
+        cleaned = clean_line(raw)
+        if not cleaned:
+            continue  # annotation-only line
+        if _is_heading(cleaned):
+            if groups[-1][1]:
+                groups.append((None, []))
+            groups[-1] = (cleaned.lstrip("#").strip(), groups[-1][1])
+            groups[-1][1].append(TextBlock("heading", start + raw.find(stripped[0]), end, cleaned))
+            continue
+
+        offset = start + raw.find(stripped[0])
+        blocks = groups[-1][1]
+        kind = "dialogue" if cleaned.startswith(_DIALOGUE_OPEN) else "paragraph"
+        if max_scene_chars and end - offset > max_scene_chars:
+            for piece_start, piece_end in _cut(text, offset, end, max_scene_chars):
+                blocks.append(TextBlock(kind, piece_start, piece_end, clean_line(text[piece_start:piece_end])))
+        elif (kind == "dialogue" and blocks and blocks[-1].kind == "dialogue"
+              and not (max_scene_chars and end - blocks[-1].start > max_scene_chars)):
+            run = blocks[-1]
+            run.end, run.text, run.lines = end, f"{run.text}\n{cleaned}", run.lines + 1
+        else:
+            blocks.append(TextBlock(kind, offset, end, cleaned))
+
+    scenes: List[SceneSpan] = []
+    for heading, blocks in groups:
+        if not blocks:
+            continue
+        current: List[TextBlock] = []
+        for block in blocks:
+            # Soft split: close the scene before a block that would overflow it,
+            # or after a content-defined cut point
+            if (max_scene_chars and current and block.kind != "heading"
+                    and (block.end - current[0].start > max_scene_chars
+                         or (current[-1].end - current[0].start >= max_scene_chars // 4
+                             and _is_cut_point(current[-1].text)))):
+                scenes.append(SceneSpan("", current[0].start, current[-1].end, heading, current))
+                current, heading = [], None
+            current.append(block)
+        scenes.append(SceneSpan("", current[0].start, current[-1].end, heading, current))
+
+    for index, scene in enumerate(scenes):
+        scene.id = f"SC{index + 1:02d}"
+    return Segmentation(title=title, scenes=scenes)
+
+
+def group_scenes(scenes: List[SceneSpan], max_chars: int, overhead: int = 0) -> List[List[SceneSpan]]:
+    """
+    Packs consecutive scenes into groups whose compact text, plus `overhead`
+    characters prepended to every group (e.g. the title line), stays within
+    max_chars; a group also ends after a content-defined cut point scene.
+    """
+    groups: List[List[SceneSpan]] = []
+    size = 0
+    for scene in scenes:
+        length = len(scene.compact()) + 2
+        if (groups and size + length <= max_chars
+                and not (size - overhead >= max_chars // 4 and _is_cut_point(groups[-1][-1].body()))):
+            groups[-1].append(scene)
+            size += length
+        else:
+            groups.append([scene])
+            size = overhead + length
+    return groups
+
+
+def align_scenes(soul: StorySoul, scenes: List[SceneSpan]) -> StorySoul:
+    """Attaches source offsets to the soul's scenes whose IDs match a segment"""
+    spans: Dict[str, Tuple[int, int]] = {scene.id: (scene.start, scene.end) for scene in scenes}
+    structure = [
+        node.model_copy(update={"source_span": spans[node.id]}) if node.id in spans else node
+        for node in soul.structure
+    ]
+    return soul.model_copy(update={"structure": structure})
@@ -0,0 +1,116 @@
+import asyncio
+import copy
+import hashlib
+import json
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+def flight_key(**request: Any) -> str:
+    """Stable key for an LLM request (model, prompts, sampling params)"""
+    raw = json.dumps(request, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _FlightStats:
+    def __init__(self):
+        self.calls = 0
+        self.upstream = 0
+        self.inflight = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "upstream": self.upstream,
+            "coalesced": self.calls - self.upstream,
+            "inflight": self.inflight,
+        }
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls from threads.
+
+    The first caller for a key runs fn; callers arriving while it is in
+    flight wait and receive a copy of the same result (or exception).
+    Nothing is cached once the call completes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._stats = _FlightStats()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            self._stats.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats.upstream += 1
+                self._stats.inflight += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                self._stats.inflight -= 1
+            call.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return self._stats.to_dict()
+
+
+class AsyncSingleFlight:
+    """
+    Event-loop counterpart of SingleFlight.
+
+    The shared call runs as its own task, so one waiter being cancelled
+    (e.g. a client disconnecting) does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._stats = _FlightStats()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self._stats.calls += 1
+        task = self._tasks.get(key)
+        if task is not None:
+            result = await asyncio.shield(task)
+            return copy.deepcopy(result)
+
+        self._stats.upstream += 1
+        self._stats.inflight += 1
+        task = asyncio.ensure_future(fn())
+        self._tasks[key] = task
+
+        def _release(_):
+            self._tasks.pop(key, None)
+            self._stats.inflight -= 1
+
+        task.add_done_callback(_release)
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        return self._stats.to_dict()
@@ -0,0 +1,268 @@
+"""
+Precompiled ontology snapshot.
+
+Parses every CSV and every node/relationship MERGE in the .cypher sources
+under ontology/ into one pickled snapshot, next to a JSON manifest holding
+the SHA-256 of each source file and of the snapshot itself. OntologyLoader
+quick-loads the snapshot and only falls back to parsing when it is stale.
+
+Build it ahead of time (e.g. in the deploy build step; Procfile deploys
+run it from bin/post_compile):
+
+    python -m src.core.snapshot [ontology_dir]
+
+The -m form must be run from the repository root; `python
+src/core/snapshot.py` works from anywhere. Without ontology_dir the
+ontology/ directory of this checkout is used, found relative to this file.
+"""
+import csv
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import re
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+SNAPSHOT_FORMAT = 2
+SNAPSHOT_DIR = ".snapshot"
+SNAPSHOT_FILE = "ontology.pickle"
+MANIFEST_FILE = "manifest.json"
+
+_NODE_RE = re.compile(r"\((\w*)((?::\w+)+)\s*(\{[^{}]*\})?\s*\)", re.S)
+_VAR_RE = re.compile(r"\((\w+)\)")
+_REL_RE = re.compile(
+    r"MERGE\s+(\([^()]*\))\s*-\[\s*\w*:(\w+)\s*(\{[^{}]*\})?\s*\]->\s*(\([^()]*\))", re.S
+)
+_PROP_RE = re.compile(r"""(\w+)\s*:\s*('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|\[[^\]]*\]|[-\w.]+)""")
+_WHERE_IN_RE = re.compile(r"WHERE\s+(\w+)\.(\w+)\s+IN\s+\[([^\]]*)\]", re.S)
+_STRING_RE = re.compile(r"'((?:[^'\\]|\\.)*)'" r'|"((?:[^"\\]|\\.)*)"')
+
+NodeKey = Tuple[str, str]
+
+
+def _strings(raw: str) -> List[str]:
+    # Cypher accepts both quote styles and the sources mix them
+    return [single or double for single, double in _STRING_RE.findall(raw)]
+
+
+def source_files(root: Path) -> List[Path]:
+    return sorted(p for p in [*root.glob("**/*.csv"), *root.glob("**/*.cypher")]
+                  if SNAPSHOT_DIR not in p.parts)
+
+
+def _sha256(data) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def source_checksums(root: Path) -> Dict[str, str]:
+    return {p.relative_to(root).as_posix(): _sha256(p.read_bytes()) for p in source_files(root)}
+
+
+def _parse_value(raw: str) -> Any:
+    if raw[:1] in ("'", '"'):
+        return raw[1:-1].replace("\\" + raw[0], raw[0])
+    if raw.startswith("["):
+        return _strings(raw)
+    if raw in ("true", "false"):
+        return raw == "true"
+    try:
+        return int(raw)
+    except ValueError:
+        try:
+            return float(raw)
+        except ValueError:
+            return raw
+
+
+def _parse_props(block: Optional[str]) -> Dict[str, Any]:
+    if not block:
+        return {}
+    return {k: _parse_value(v) for k, v in _PROP_RE.findall(block)}
+
+
+def _node_key(labels: List[str], props: Dict[str, Any]) -> Optional[NodeKey]:
+    for field in ("name_en", "name", "name_ja", "number"):
+        if field in props:
+            return labels[0], str(props[field])
+    return None
+
+
+def _strip_comments(text: str) -> str:
+    return "\n".join(line.split("//", 1)[0] for line in text.splitlines())
+
+
+def _parse_cypher(text: str, rel_path: str, nodes: Dict[NodeKey, Dict[str, Any]],
+                  relationships: List[Dict[str, Any]]) -> None:
+    # Variable bindings are kept per file: the sources often bind a variable
+    # with MATCH in one statement and use it after the next semicolon.
+    bindings: Dict[str, List[NodeKey]] = {}
+
+    def resolve(pattern: str) -> List[NodeKey]:
+        node = _NODE_RE.fullmatch(pattern.strip())
+        if node:
+            var, labels, props = node.group(1), node.group(2).split(":")[1:], _parse_props(node.group(3))
+            key = _node_key(labels, props)
+            if key is None:
+                return bindings.get(var, [])
+            if var:
+                bindings[var] = [key]
+            return [key]
+        var = _VAR_RE.fullmatch(pattern.strip())
+        return bindings.get(var.group(1), []) if var else []
+
+    for statement in _strip_comments(text).split(";"):
+        if "LOAD CSV" in statement:
+            continue
+        # Bind MATCH variables, including `WHERE x.prop IN [...]` fan-outs
+        for clause in re.findall(r"MATCH\s+(.*?)(?=\bMATCH\b|\bMERGE\b|\bWHERE\b|\bRETURN\b|\bWITH\b|$)", statement, re.S):
+            for node in _NODE_RE.finditer(clause):
+                var, labels, props = node.group(1), node.group(2).split(":")[1:], _parse_props(node.group(3))
+                key = _node_key(labels, props)
+                if var and key:
+                    bindings[var] = [key]
+                elif var:
+                    bindings.setdefault(var, [])
+                    bindings[f"{var}:label"] = [(labels[0], "")]
+        for var, prop, values in _WHERE_IN_RE.findall(statement):
+            label = bindings.get(f"{var}:label", [("", "")])[0][0]
+            bindings[var] = [(label, v) for v in _strings(values)]
+
+        rel_spans = []
+        for rel in _REL_RE.finditer(statement):
+            rel_spans.append(rel.span())
+            sources, targets = resolve(rel.group(1)), resolve(rel.group(4))
+            for source in sources:
+                for target in targets:
+                    relationships.append({
+                        "type": rel.group(2),
+                        "props": _parse_props(rel.group(3)),
+                        "source": source,
+                        "target": target,
+                        "file": rel_path,
+                    })
+
+        for merge in re.finditer(r"MERGE\s+(\([^()]*\))", statement):
+            if any(start <= merge.start() < end for start, end in rel_spans):
+                continue
+            node = _NODE_RE.fullmatch(merge.group(1))
+            if not node:
+                continue
+            var, labels, props = node.group(1), node.group(2).split(":")[1:], _parse_props(node.group(3))
+            key = _node_key(labels, props)
+            if key is None:
+                continue
+            if var:
+                bindings[var] = [key]
+            entry = nodes.setdefault(key, {"labels": labels, "props": {}, "file": rel_path})
+            entry["props"].update(props)
+
+        # Inline node patterns inside relationship MERGEs also create nodes
+        for start, end in rel_spans:
+            for node in _NODE_RE.finditer(statement[start:end]):
+                labels, props = node.group(2).split(":")[1:], _parse_props(node.group(3))
+                key = _node_key(labels, props)
+                if key is not None and key not in nodes:
+                    nodes[key] = {"labels": labels, "props": props, "file": rel_path}
+
+
+def parse_sources(root: Path) -> Dict[str, Any]:
+    """Parses the ontology sources into plain Python data."""
+    concepts: Dict[str, Dict[str, str]] = {}
+    nodes: Dict[NodeKey, Dict[str, Any]] = {}
+    relationships: List[Dict[str, Any]] = []
+
+    for path in source_files(root):
+        rel_path = path.relative_to(root).as_posix()
+        if path.suffix == ".csv":
+            with open(path, "r", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    if "id" in row:
+                        concepts[row["id"]] = row
+        else:
+            _parse_cypher(path.read_text(encoding="utf-8"), rel_path, nodes, relationships)
+
+    return {
+        "concepts": concepts,
+        "nodes": list(nodes.values()),
+        "relationships": relationships,
+    }
+
+
+def write_snapshot(root: Path, data: Dict[str, Any], checksums: Optional[Dict[str, str]] = None) -> Path:
+    out_dir = root / SNAPSHOT_DIR
+    out_dir.mkdir(parents=True, exist_ok=True)
+    blob = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "python": list(sys.version_info[:2]),
+        "snapshot_sha256": _sha256(blob),
+        "sources": checksums if checksums is not None else source_checksums(root),
+    }
+
+    # Write the blob before the manifest so a crash never leaves a manifest
+    # pointing at a half-written snapshot
+    for name, payload in ((SNAPSHOT_FILE, blob),
+                          (MANIFEST_FILE, json.dumps(manifest, indent=2).encode("utf-8"))):
+        tmp = out_dir / f"{name}.{os.getpid()}.tmp"
+        tmp.write_bytes(payload)
+        os.replace(tmp, out_dir / name)
+    return out_dir / SNAPSHOT_FILE
+
+
+def build_snapshot(root: Path) -> Path:
+    checksums = source_checksums(root)
+    return write_snapshot(root, parse_sources(root), checksums)
+
+
+def load_snapshot(root: Path, checksums: Optional[Dict[str, str]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Returns the snapshot data, or None when it is missing, corrupt or stale
+    with respect to the current source files.
+    """
+    snap_dir = root / SNAPSHOT_DIR
+    try:
+        manifest = json.loads((snap_dir / MANIFEST_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        return None
+    if manifest.get("sources") != (checksums if checksums is not None else source_checksums(root)):
+        return None
+
+    try:
+        with open(snap_dir / SNAPSHOT_FILE, "rb") as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if _sha256(mm) != manifest.get("snapshot_sha256"):
+                return None
+            return pickle.loads(mm)
+    except (OSError, ValueError, pickle.UnpicklingError):
+        return None
+
+
+def load_or_build(root: Path) -> Dict[str, Any]:
+    """Quick-loads the snapshot, rebuilding it from source when stale."""
+    checksums = source_checksums(root)
+    data = load_snapshot(root, checksums)
+    if data is not None:
+        return data
+
+    data = parse_sources(root)
+    try:
+        write_snapshot(root, data, checksums)
+    except OSError as e:
+        # Read-only filesystems still work, they just parse on every start
+        print(f"Could not write ontology snapshot: {e}")
+    return data
+
+
+if __name__ == "__main__":
+    default_root = Path(__file__).resolve().parent.parent.parent / "ontology"
+    target = Path(sys.argv[1]) if len(sys.argv) > 1 else default_root
+    path = build_snapshot(target)
+    data = load_snapshot(target)
+    print(f"Wrote {path} ({len(data['concepts'])} concepts, "
+          f"{len(data['nodes'])} nodes, {len(data['relationships'])} relationships)")
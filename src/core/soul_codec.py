@@ -0,0 +1,103 @@
+import json
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+from .schema import StorySoul, SceneNode, ConceptRef
+
+_ASCII_RUN_RE = re.compile(r"[\x00-\x7f]+")
+
+LEGEND = (
+    "# 記法: cN=概念表のキー / 出来事 `行為者 -行為-> 対象 emo=感情 why=動機 sense=感覚` / "
+    "関係 `A -関係-> B 強度`(省略時1.0)"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for GLM prompts without a tokenizer: ASCII runs cost
+    about one token per four characters, every other character (kana, kanji,
+    full-width punctuation) about one token each.
+    """
+    ascii_chars = sum(len(run) for run in _ASCII_RUN_RE.findall(text))
+    return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+
+class _ConceptTable:
+    def __init__(self):
+        self.keys: Dict[Tuple, str] = {}
+        self.rows: List[str] = []
+
+    def ref(self, concept: Optional[ConceptRef]) -> Optional[str]:
+        if concept is None:
+            return None
+        ident = (concept.category, concept.id, concept.label, json.dumps(concept.value, ensure_ascii=False))
+        key = self.keys.get(ident)
+        if key is None:
+            key = self.keys[ident] = f"c{len(self.keys) + 1}"
+            row = f"{key} {concept.label} [{concept.category}]"
+            if concept.value is not None:
+                row += f" ={json.dumps(concept.value, ensure_ascii=False)}"
+            self.rows.append(row)
+        return key
+
+
+def _scene_lines(scene: SceneNode, table: _ConceptTable) -> List[str]:
+    context = " ".join(f"{name}={table.ref(ref)}" for name, ref in scene.context.items())
+    lines = [f"{scene.id} {context}".rstrip()]
+    for event in scene.events:
+        line = f" {event.actor_id} -{table.ref(event.action)}->"
+        if event.target_id:
+            line += f" {event.target_id}"
+        for name, ref in (("emo", event.emotion), ("why", event.motivation), ("sense", event.sensory_detail)):
+            if ref is not None:
+                line += f" {name}={table.ref(ref)}"
+        lines.append(line)
+    return lines
+
+
+def encode_soul(soul: StorySoul, max_tokens: Optional[int] = None) -> str:
+    """
+    Serializes a StorySoul into a terse, line-based notation for prompts.
+
+    Concepts are listed once in a table and referenced by short keys, null
+    and default fields are dropped. If max_tokens is given and the result is
+    larger, scenes are removed from the middle of the story (the opening and
+    the ending are kept) until it fits.
+    """
+    def render(kept: List[int]) -> str:
+        # Built per attempt so the concept table only lists what is referenced
+        table = _ConceptTable()
+        theme = table.ref(soul.theme)
+        characters = []
+        for ch in soul.characters:
+            line = f"{ch.id} {ch.name} role={table.ref(ch.role)}"
+            if ch.archetype is not None:
+                line += f" arch={table.ref(ch.archetype)}"
+            characters.append(line)
+        scenes = []
+        for pos, index in enumerate(kept):
+            if pos and index != kept[pos - 1] + 1:
+                scenes.append(f"...({index - kept[pos - 1] - 1} scenes omitted)")
+            scenes += _scene_lines(soul.structure[index], table)
+        relations = []
+        for rel in soul.relationships:
+            line = f"{rel.source_id} -{table.ref(rel.relation)}-> {rel.target_id}"
+            if rel.strength != 1.0:
+                line += f" {rel.strength:g}"
+            relations.append(line)
+
+        lines = [LEGEND, f"title: {soul.title}"]
+        if theme:
+            lines.append(f"theme: {theme}")
+        lines += ["concepts:", *table.rows, "characters:", *characters, "scenes:", *scenes]
+        if relations:
+            lines += ["relations:", *relations]
+        return "\n".join(lines)
+
+    kept = list(range(len(soul.structure)))
+    encoded = render(kept)
+    while max_tokens is not None and len(kept) > 2 and estimate_tokens(encoded) > max_tokens:
+        kept.pop(len(kept) // 2)
+        encoded = render(kept)
+    return encoded
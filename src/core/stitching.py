@@ -0,0 +1,82 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+# Scene labels the model tends to prepend despite the prompt (## 第2場面, 【SC02】, シーン3: ...)
+_SCENE_HEADING_RE = re.compile(
+    r"^(?:#{1,6}\s*.*|【[^】]*】|[\[［(（]?(?:第[0-9０-９一二三四五六七八九十]+場面|場面\s*[0-9０-９]+"
+    r"|シーン\s*[0-9０-９]+|SC\d+)[\]］)）]?[：:\s].*|[\[［(（]?SC\d+[\]］)）]?)$"
+)
+_HEADING_MAX_CHARS = 40
+_TRAILER_RE = re.compile(r"^[（(]?(?:続く|つづく|次の場面へ|To be continued)[…。.)）]*$")
+_SENTENCE_RE = re.compile(r"[^。！？!?\n]*[。！？!?]+[」』]?|[^。！？!?\n]+")
+
+
+def parse_cast(data: Any, names: Iterable[str]) -> Dict[str, str]:
+    """
+    Original name -> domain name from the cast-sheet JSON ({"cast": {...}}
+    or a flat object), keeping only entries for the given character names.
+    """
+    if isinstance(data, dict) and isinstance(data.get("cast"), dict):
+        data = data["cast"]
+    if not isinstance(data, dict):
+        return {}
+    known = set(names)
+    return {k.strip(): v.strip() for k, v in data.items()
+            if isinstance(k, str) and isinstance(v, str) and k.strip() in known and v.strip()}
+
+
+def clean_scene(text: str) -> str:
+    """Drops scene headings at the start and "to be continued" trailers at the end"""
+    lines = text.strip().splitlines()
+    while lines and (not lines[0].strip() or (len(lines[0].strip()) <= _HEADING_MAX_CHARS
+                                              and _SCENE_HEADING_RE.match(lines[0].strip()))):
+        lines.pop(0)
+    while lines and (not lines[-1].strip() or _TRAILER_RE.match(lines[-1].strip())):
+        lines.pop()
+    return "\n".join(lines)
+
+
+def apply_cast(text: str, cast: Dict[str, str]) -> str:
+    """Replaces original names the model left in the scene with their domain names"""
+    for original in sorted(cast, key=len, reverse=True):
+        renamed = cast[original]
+        # Skip names contained in their translation (メロス -> メロス王) to avoid double replacement
+        if len(original) >= 2 and original not in renamed:
+            text = text.replace(original, renamed)
+    return text
+
+
+def _sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_RE.findall(text) if s.strip()]
+
+
+def next_part(previous: Optional[str], text: str, cast: Dict[str, str]) -> str:
+    """
+    Continuity pass for one scene, given the already stitched previous scene:
+    cleans it, applies the cast sheet and drops an opening sentence that
+    repeats the previous scene's closing sentence.
+    """
+    text = apply_cast(clean_scene(text), cast)
+    if previous:
+        tail = _sentences(previous)[-1:]
+        head = _sentences(text)[:1]
+        if tail and head and tail[0] == head[0]:
+            text = text.strip()[len(head[0]):].lstrip()
+    return text
+
+
+def stitch_parts(parts: List[str], cast: Dict[str, str]) -> List[str]:
+    """Applies the continuity pass to scene texts in order; one (possibly empty) text per part"""
+    stitched: List[str] = []
+    previous: Optional[str] = None
+    for part in parts:
+        text = next_part(previous, part, cast)
+        stitched.append(text)
+        if text:
+            previous = text
+    return stitched
+
+
+def stitch(parts: List[str], cast: Dict[str, str]) -> str:
+    """Joins scene texts in order, applying the continuity pass to each"""
+    return "\n\n".join(text for text in stitch_parts(parts, cast) if text)
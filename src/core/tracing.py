@@ -0,0 +1,158 @@
+import contextvars
+import cProfile
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+@dataclass
+class Span:
+    name: str
+    started: float
+    attrs: Dict[str, Any] = field(default_factory=dict)
+    duration: Optional[float] = None
+    error: Optional[str] = None
+    children: List["Span"] = field(default_factory=list)
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        data = {
+            "name": self.name,
+            "start_ms": round((self.started - origin) * 1000, 3),
+            "duration_ms": round((self.duration or 0.0) * 1000, 3),
+        }
+        if self.attrs:
+            data["attrs"] = self.attrs
+        if self.error:
+            data["error"] = self.error
+        if self.children:
+            data["children"] = [child.to_dict(origin) for child in self.children]
+        return data
+
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("lnaes_span", default=None)
+_listeners: List[Callable[[Span], None]] = []
+
+
+def add_span_listener(listener: Callable[[Span], None]) -> None:
+    """Registers a callback for every finished span (e.g. to export to a tracing backend)"""
+    _listeners.append(listener)
+
+
+def remove_span_listener(listener: Callable[[Span], None]) -> None:
+    _listeners.remove(listener)
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Optional[Span]]:
+    """
+    Times a block as a child of the current span. Costs nothing beyond a
+    context-variable lookup unless a trace is active or a listener is set.
+    """
+    parent = _current.get()
+    if parent is None and not _listeners:
+        yield None
+        return
+    current = Span(name, time.perf_counter(), attrs)
+    if parent is not None:
+        parent.children.append(current)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.duration = time.perf_counter() - current.started
+        try:
+            _current.reset(token)
+        except ValueError:
+            # An async generator holding a span across yields may be closed from another context
+            pass
+        for listener in list(_listeners):
+            listener(current)
+
+
+class Trace:
+    """Root of a span tree collected for one request"""
+
+    def __init__(self, name: str):
+        self.root = Span(name, time.perf_counter())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.root.to_dict(self.root.started)
+
+
+@contextmanager
+def trace(name: str, enabled: bool = True) -> Iterator[Optional[Trace]]:
+    """Collects nested spans for the enclosed block; yields None when disabled"""
+    if not enabled:
+        yield None
+        return
+    collected = Trace(name)
+    token = _current.set(collected.root)
+    try:
+        yield collected
+    finally:
+        collected.root.duration = time.perf_counter() - collected.root.started
+        _current.reset(token)
+
+
+def bind(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Wraps fn to run in a copy of the caller's context, so spans opened in pool threads nest correctly"""
+    context = contextvars.copy_context()
+    # A Context can only be entered by one thread at a time, so each call gets its own copy
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+
+_profile_lock = threading.Lock()
+
+
+@contextmanager
+def profile(directory: Optional[Path], label: str = "request") -> Iterator[Dict[str, str]]:
+    """
+    Captures cProfile stats (<id>.prof, readable with pstats/snakeviz) and a
+    tracemalloc top-allocations report (<id>.mem.txt) for the enclosed block.
+    Yields a dict that is filled with the written paths. Does nothing when
+    directory is None or another capture is already running, since both
+    profilers are process-wide.
+    """
+    written: Dict[str, str] = {}
+    if directory is None or not _profile_lock.acquire(blocking=False):
+        yield written
+        return
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        stem = directory / f"{time.strftime('%Y%m%d-%H%M%S')}-{label}-{uuid.uuid4().hex[:8]}"
+        profiler = cProfile.Profile()
+        started_tracemalloc = not tracemalloc.is_tracing()
+        if started_tracemalloc:
+            tracemalloc.start()
+        profiler.enable()
+        try:
+            yield written
+        finally:
+            profiler.disable()
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if started_tracemalloc:
+                tracemalloc.stop()
+
+            profiler.dump_stats(f"{stem}.prof")
+            with open(f"{stem}.mem.txt", "w", encoding="utf-8") as f:
+                f.write(f"current={current} peak={peak}\n")
+                for stat in snapshot.statistics("lineno")[:50]:
+                    f.write(f"{stat}\n")
+            written.update(cpu=f"{stem}.prof", memory=f"{stem}.mem.txt")
+    finally:
+        _profile_lock.release()
+
+
+def profile_dir_from_env() -> Optional[Path]:
+    value = os.getenv("PROFILE_DIR")
+    return Path(value) if value else None
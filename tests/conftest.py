@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+
+# Modules import each other as core.*, with src on sys.path (as in src/api/main.py)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+# ...and the repository root, for the ontology loader (ontology.integrated_manager)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+ONTOLOGY_PATH = Path(__file__).resolve().parent.parent / "ontology"
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """StoryEngine on the fake LLM backend, with its stores under tmp_path"""
+    from core.engine import StoryEngine
+
+    monkeypatch.setenv("LLM_BACKEND", "fake")
+    monkeypatch.setenv("FAKE_LLM_LATENCY", "0")
+    monkeypatch.setenv("MEMU_DB_PATH", str(tmp_path / "memu.sqlite3"))
+    monkeypatch.setenv("DOCUMENT_STORE_DIR", str(tmp_path / "documents"))
+    for name in ("SOUL_CACHE_DIR", "PROSE_CACHE_DIR", "STORY_MODE"):
+        monkeypatch.delenv(name, raising=False)
+    engine = StoryEngine(ONTOLOGY_PATH)
+    yield engine
+    engine.memory.close()
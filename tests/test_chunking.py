@@ -0,0 +1,67 @@
+from core.chunking import merge_souls
+from core.schema import CharacterNode, ConceptRef, EventNode, RelationshipEdge, SceneNode, StorySoul
+
+NIGHT = ConceptRef(category="temporal", id="TM_NIGHT", label="夜")
+RUN = ConceptRef(category="action", id="AC_RUN", label="走る")
+HERO = ConceptRef(category="character_function", id="CF_HERO", label="主人公")
+FRIEND = ConceptRef(category="relationship", id="RL_FRIENDSHIP", label="友情")
+
+
+def soul(characters, scenes, relationships=(), theme=None):
+    return StorySoul(
+        title="走れメロス", theme=theme, relationships=list(relationships),
+        characters=[CharacterNode(id=cid, name=name, role=HERO) for cid, name in characters],
+        structure=scenes,
+    )
+
+
+def test_identical_adjacent_scenes_are_both_kept():
+    first = soul([], [SceneNode(id="SC01", context={"time": NIGHT}, source_span=(0, 100))])
+    second = soul([], [SceneNode(id="SC02", context={"time": NIGHT}, source_span=(100, 200))])
+    merged = merge_souls([first, second])
+    assert [(s.id, s.source_span) for s in merged.structure] == [("SC01", (0, 100)), ("SC02", (100, 200))]
+
+
+def test_out_of_order_scenes_are_sorted_not_dropped():
+    reply = soul([], [
+        SceneNode(id="SC03", source_span=(200, 300)),
+        SceneNode(id="SC02", source_span=(100, 200)),
+        SceneNode(id="SC03b"),
+        SceneNode(id="SC01", source_span=(0, 100)),
+    ])
+    merged = merge_souls([reply])
+    assert [s.id for s in merged.structure] == ["SC01", "SC02", "SC03b", "SC03"]
+
+
+def test_overlapping_spans_are_deduplicated():
+    first = soul([], [SceneNode(id="SC01", source_span=(0, 100))])
+    repeat = soul([], [SceneNode(id="SC01", source_span=(0, 100)), SceneNode(id="SC02", source_span=(100, 150))])
+    merged = merge_souls([first, repeat])
+    assert [s.id for s in merged.structure] == ["SC01", "SC02"]
+
+
+def test_unaligned_duplicate_ids_get_free_numbers():
+    first = soul([], [SceneNode(id="SC01", source_span=(0, 100)), SceneNode(id="SC02", source_span=(100, 200))])
+    second = soul([], [SceneNode(id="SC01")])
+    merged = merge_souls([first, second])
+    assert [s.id for s in merged.structure] == ["SC01", "SC02", "SC03"]
+
+
+def test_characters_and_relationships_are_remapped_by_name():
+    first = soul([("CH001", "メロス"), ("CH002", "王")],
+                 [SceneNode(id="SC01", source_span=(0, 10),
+                            events=[EventNode(actor_id="CH001", action=RUN, target_id="CH002")])])
+    second = soul([("CH001", "セリヌンティウス"), ("CH002", "メロス")],
+                  [SceneNode(id="SC02", source_span=(10, 20), events=[EventNode(actor_id="CH002", action=RUN)])],
+                  relationships=[
+                      RelationshipEdge(source_id="CH002", target_id="CH001", relation=FRIEND, strength=0.4),
+                  ])
+    third = soul([("CH001", "メロス"), ("CH002", "セリヌンティウス")], [],
+                 relationships=[RelationshipEdge(source_id="CH001", target_id="CH002", relation=FRIEND, strength=0.9)])
+    merged = merge_souls([first, second, third])
+
+    assert [(c.id, c.name) for c in merged.characters] == [
+        ("CH001", "メロス"), ("CH002", "王"), ("CH003", "セリヌンティウス"),
+    ]
+    assert merged.structure[1].events[0].actor_id == "CH001"
+    assert [(e.source_id, e.target_id, e.strength) for e in merged.relationships] == [("CH001", "CH003", 0.9)]
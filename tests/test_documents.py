@@ -0,0 +1,20 @@
+from core.documents import DocumentStore, document_id_for
+
+
+def test_crlf_text_survives_reload_from_disk(tmp_path):
+    text = "走れメロス\r\n\r\nメロスは激怒した。\r\n"
+    document_id = DocumentStore(tmp_path).put(text)
+
+    # A fresh store has an empty hot tier, so the text comes from disk
+    reloaded = DocumentStore(tmp_path).get(document_id)
+
+    assert reloaded == text
+    assert document_id_for(reloaded) == document_id
+
+
+def test_memory_only_store(tmp_path):
+    store = DocumentStore(None)
+    document_id = store.put("本文")
+    assert store.get(document_id) == "本文"
+    assert store.get("not-a-hex-id") is None
+    assert DocumentStore(tmp_path).get(document_id) is None
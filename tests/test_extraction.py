@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from core.cache import SoulCache
+from core.fake_llm import AsyncFakeLLMClient, FakeLLMClient
+from core.memory import MemUStore
+
+CHUNK_SIZE = 600
+
+# About 20 prompts' worth of text, with dialogue runs and a scene far past the first 3000 chars
+TEXT = "走れメロス\n\n" + "\n\n\n".join(
+    f"第{i + 1}章\n" + f"メロスは{i}里を走った。" * 12 + "\n" + "「待っていろ」" * 30
+    for i in range(20)
+) + "\n\nメロスは最後に友の名を呼んだ。"
+
+
+class RecordingFake(FakeLLMClient):
+    def __init__(self):
+        super().__init__(latency=0)
+        self.prompts = []
+
+    def _create(self, system_prompt, user_prompt, temperature, kind):
+        self.prompts.append(user_prompt)
+        return super()._create(system_prompt, user_prompt, temperature, kind)
+
+
+class AsyncRecordingFake(AsyncFakeLLMClient):
+    def __init__(self):
+        super().__init__(latency=0)
+        self.prompts = []
+
+    async def _post(self, payload, kind):
+        self.prompts.append(payload["messages"][-1]["content"])
+        return await super()._post(payload, kind)
+
+
+@pytest.fixture
+def engine(engine):
+    engine.chunk_size = CHUNK_SIZE
+    engine.llm, engine.async_llm = RecordingFake(), AsyncRecordingFake()
+    return engine
+
+
+def chunk_of(prompt):
+    return prompt.split(":\n\n", 1)[1]
+
+
+def chunks_in_order(prompts):
+    # Groups are extracted concurrently; the prompt names its part as "(i/n)"
+    return [chunk_of(p) for p in sorted(prompts, key=lambda p: int(p.split("（", 1)[1].split("/", 1)[0]))]
+
+
+def test_long_text_is_extracted_in_groups_within_the_budget(engine):
+    logs = []
+    soul, _ = engine.soul_for(TEXT, logs=logs)
+
+    chunks = [chunk_of(prompt) for prompt in engine.llm.prompts]
+    assert len(chunks) > 1
+    assert all(len(chunk) <= CHUNK_SIZE for chunk in chunks)
+    # Nothing is truncated: the last scene reaches the LLM
+    assert any("最後に友の名を呼んだ" in chunk for chunk in chunks)
+    assert any("Chunked Extraction" in line for line in logs)
+    assert soul.structure
+
+
+def test_every_scene_is_sent_exactly_once(engine):
+    segmentation = engine.segment(TEXT)
+    engine.soul_for(TEXT)
+    markers = [line for chunk in chunks_in_order(engine.llm.prompts) for line in chunk.splitlines()
+               if line.startswith("[SC")]
+    assert [marker.split("]")[0][1:] for marker in markers] == [scene.id for scene in segmentation.scenes]
+
+
+def test_edit_re_extracts_only_groups_near_the_change(engine):
+    _, document_id = engine.soul_for(TEXT)
+    first = len(engine.llm.prompts)
+
+    edited = TEXT.replace("メロスは19里を走った。", "メロスは19里を駆けた。", 1)
+    engine.soul_for(edited, document_id=document_id)
+    resent = [chunk_of(prompt) for prompt in engine.llm.prompts[first:]]
+    # The edited group, plus at most a neighbour whose boundary the edit moved
+    assert 1 <= len(resent) <= 2 < first
+    assert any("19里を駆けた" in chunk for chunk in resent)
+
+
+def test_async_extraction_matches_sync(engine):
+    sync_soul = engine.extract_soul(TEXT)
+    engine.soul_cache, engine.memory = SoulCache(), MemUStore()
+
+    async_soul = asyncio.run(engine.extract_soul_async(TEXT))
+    assert chunks_in_order(engine.async_llm.prompts) == chunks_in_order(engine.llm.prompts)
+    assert async_soul == sync_soul
@@ -0,0 +1,84 @@
+from core.lexicon import AhoCorasick, Lexicon, Term, _verb_forms, find_characters, heuristic_soul
+from core.segmenter import segment_text
+
+
+def test_aho_corasick_follows_fail_links():
+    automaton = AhoCorasick()
+    for word in ("he", "she", "his", "hers"):
+        automaton.add(word, word)
+    found = sorted((start, end, word) for start, end, word in automaton.iter("ushers"))
+    # "she" -> fail to "he" -> continue into "hers"
+    assert found == [(1, 4, "she"), (2, 4, "he"), (2, 6, "hers")]
+
+
+def test_aho_corasick_reports_overlapping_and_nested_matches():
+    automaton = AhoCorasick()
+    for word in ("激怒", "怒り", "激怒した"):
+        automaton.add(word, word)
+    found = {word for _, _, word in automaton.iter("メロスは激怒した")}
+    assert found == {"激怒", "激怒した"}
+
+
+def term(cid, category, label, weight=1.0, ascii=False):
+    return Term(cid, category, label, weight, ascii)
+
+
+def make_lexicon():
+    return Lexicon([
+        ("激怒", term("EM_RAGE", "emotion", "激怒")),
+        ("怒", term("EM_ANGER", "emotion", "怒り")),  # too short, never compiled
+        ("夕暮れ", term("TM_DUSK", "temporal", "夕暮れ")),
+        ("暮れ", term("TM_END", "temporal", "暮れ")),
+        ("走る", term("AC_RUN", "action", "走る")),
+        ("走っ", term("AC_RUN", "action", "走る")),
+        ("run", term("AC_RUN_EN", "action", "走る", ascii=True)),
+        ("町", term("SP_TOWN", "spatial", "町")),
+        ("城下町", term("SP_CASTLE_TOWN", "spatial", "城下町")),
+    ])
+
+
+def test_scan_prefers_the_longest_then_earliest_match():
+    matches = make_lexicon().scan("夕暮れの城下町でメロスは激怒した。")
+    assert [(m.term.concept_id, m.start, m.end) for m in matches] == [
+        ("TM_DUSK", 0, 3),
+        ("SP_CASTLE_TOWN", 4, 7),
+        ("EM_RAGE", 12, 14),
+    ]
+
+
+def test_scan_requires_whole_words_for_ascii_labels():
+    lexicon = make_lexicon()
+    assert [m.term.concept_id for m in lexicon.scan("They run home")] == ["AC_RUN_EN"]
+    assert lexicon.scan("a rerun, running") == []
+
+
+def test_scan_folds_width_and_case():
+    lexicon = make_lexicon()
+    assert [m.term.concept_id for m in lexicon.scan("ＲＵＮ")] == ["AC_RUN_EN"]
+
+
+def test_verb_forms_cover_godan_and_ichidan():
+    assert {"走っ", "走り", "走ら"} <= set(_verb_forms("走る"))
+    assert "信じた" in _verb_forms("信じる")
+    assert "悲しく" in _verb_forms("悲しい")
+    assert _verb_forms("る") == []
+
+
+def test_find_characters_counts_recurring_names():
+    text = "メロスは走った。セリヌンティウスは待った。メロスは叫んだ。王様は笑った。セリヌンティウスは頷いた。ディオニス"
+    names = dict(find_characters(text))
+    assert names == {"メロス": 2, "セリヌンティウス": 2}
+
+
+def test_heuristic_soul_builds_one_scene_per_segment():
+    text = "夕暮れの町。\nメロスは激怒した。メロスは走った。\n\n\n城下町でセリヌンティウスは待った。セリヌンティウスとメロス。\n"
+    segmentation = segment_text(text)
+    soul = heuristic_soul(make_lexicon(), text, segmentation)
+
+    assert [scene.id for scene in soul.structure] == ["SC01", "SC02"]
+    assert [scene.source_span for scene in soul.structure] == [(s.start, s.end) for s in segmentation.scenes]
+    first, second = soul.structure
+    assert first.context["time"].id == "TM_DUSK"
+    assert first.events[0].action.id == "AC_RUN" and first.events[0].emotion.id == "EM_RAGE"
+    assert second.context["place"].id == "SP_CASTLE_TOWN"
+    assert [c.name for c in soul.characters] == ["メロス", "セリヌンティウス"]
@@ -0,0 +1,56 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from core.llm_client import AsyncLLMClient
+from core.tracing import trace
+
+
+def streaming_client(monkeypatch, handler):
+    monkeypatch.setenv("GLM_API_KEY", "test")
+    client = AsyncLLMClient()
+    client._client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(handler))
+    return client
+
+
+def sse(*deltas):
+    lines = [f"data: {json.dumps({'choices': [{'delta': {'content': d}}]})}" for d in deltas]
+    return ("\n\n".join([*lines, "data: [DONE]"]) + "\n\n").encode("utf-8")
+
+
+def collect(client):
+    async def run():
+        with trace("request") as collected:
+            try:
+                return [token async for token in client.stream_text("system", "user")], collected
+            finally:
+                await client.aclose()
+    return asyncio.run(run())
+
+
+def test_stream_text_is_traced(monkeypatch):
+    client = streaming_client(monkeypatch, lambda request: httpx.Response(200, content=sse("メロスは", "走った。")))
+    tokens, collected = collect(client)
+    assert tokens == ["メロスは", "走った。"]
+    [child] = collected.to_dict()["children"]
+    assert child["name"] == "llm.stream"
+    assert child["attrs"] == {"client": "async", "model": client.model, "prompt_chars": len("systemuser")}
+    assert "error" not in child
+
+
+def test_failed_stream_span_has_the_error(monkeypatch):
+    client = streaming_client(monkeypatch, lambda request: httpx.Response(400, content=b"bad request"))
+
+    async def run():
+        with trace("request") as collected:
+            with pytest.raises(httpx.HTTPStatusError):
+                async for _ in client.stream_text("system", "user"):
+                    pass
+        await client.aclose()
+        return collected
+
+    [child] = asyncio.run(run()).to_dict()["children"]
+    assert child["name"] == "llm.stream" and child["error"].startswith("HTTPStatusError")
+    assert client.in_flight == 0
@@ -0,0 +1,40 @@
+import pytest
+
+from conftest import ONTOLOGY_PATH
+from core.engine import OntologyLoader
+from core.schema import ConceptRef
+
+
+@pytest.fixture(scope="module")
+def ontology():
+    return OntologyLoader(ONTOLOGY_PATH)
+
+
+def resolve(ontology, category, cid, label):
+    ref = ontology.resolve_refs([ConceptRef(category=category, id=cid, label=label)])[0]
+    return ref.category, ref.id, ref.label
+
+
+def test_find_by_label_stays_within_the_category(ontology):
+    assert ontology.find_by_label("未来", "temporal") == "TM_FUTURE"
+    assert ontology.find_by_label("未来", "spatial") is None
+    assert ontology.find_by_label("未来") in ("FC_FUTURISTIC", "TM_FUTURE")
+
+
+def test_label_match_in_another_category_keeps_the_ref(ontology):
+    assert resolve(ontology, "spatial", "SP_FUTURE", "未来") == ("spatial", "SP_FUTURE", "未来")
+    assert resolve(ontology, "relationship", "RL_XXX", "怒り") == ("relationship", "RL_XXX", "怒り")
+
+
+def test_label_match_in_the_refs_category_is_canonicalized(ontology):
+    assert resolve(ontology, "temporal", "TM_XXX", "未来") == ("temporal", "TM_FUTURE", "未来")
+    assert resolve(ontology, "emotion", "EM_XXX", "怒り") == ("emotion", "EM_ANGER", "怒り")
+
+
+def test_unknown_category_is_repaired_from_the_id_prefix(ontology):
+    assert resolve(ontology, "feeling", "EM_XXX", "怒り") == ("emotion", "EM_ANGER", "怒り")
+    assert resolve(ontology, "feeling", "EM_XXX", "未来") == ("emotion", "EM_XXX", "未来")
+
+
+def test_known_id_wins(ontology):
+    assert resolve(ontology, "emotion", "AC_FEAR", "恐れ") == ("action", "AC_FEAR", "恐れ")
@@ -0,0 +1,92 @@
+from collections import Counter
+
+import pytest
+
+pytest.importorskip("yaml")
+
+from ontology.fake_neo4j import FakeNeo4jDriver
+from ontology.integrated_manager import LNAESv3OntologyManager
+
+NODES = "\n".join(f"MERGE (:Concept:Emotion {{id: 'EM{i:03d}', name_ja: '感情{i}'}});" for i in range(5))
+EDGES = "MATCH (a:Concept {id: 'EM000'}), (b:Concept {id: 'EM001'}) MERGE (a)-[:NEXT]->(b);"
+
+
+def make_manager(tmp_path, files):
+    manifest = ["ontologies:"]
+    for name, (layer, content) in files.items():
+        path = tmp_path / f"{name}.cypher"
+        path.write_text(content, encoding="utf-8")
+        # Absolute file paths override the ontology directory the manager resolves against
+        manifest += [f"- name: {name}", f"  layer: {layer}", f"  file_path: {path}"]
+    config = tmp_path / "manifest.yaml"
+    config.write_text("\n".join(manifest) + "\n", encoding="utf-8")
+    manager = LNAESv3OntologyManager(str(config))
+    driver = FakeNeo4jDriver()
+    manager.connect_neo4j(driver=driver)
+    return manager, driver
+
+
+def loaded_queries(driver):
+    return [q for q in driver.queries if "OntologyLoad" not in q.query]
+
+
+def test_node_merges_are_batched_into_unwinds(tmp_path):
+    manager, driver = make_manager(tmp_path, {"emotion": ("foundation", NODES + "\n" + EDGES)})
+    manager.unwind_batch_size = 2
+    manager.tx_batch_size = 2
+
+    assert manager.load_ontology_to_neo4j("emotion")
+
+    queries = loaded_queries(driver)
+    unwinds = [q for q in queries if q.query.startswith("UNWIND")]
+    assert [len(q.params["rows"]) for q in unwinds] == [2, 2, 1]
+    assert queries[-1].query == EDGES[:-1]
+    # 4 operations in transactions of at most 2 statements
+    per_tx = Counter(q.transaction for q in queries)
+    assert sorted(per_tx.values()) == [2, 2]
+    assert driver.commits == 2 and driver.rollbacks == 0
+
+
+def test_failed_transaction_is_retried_statement_by_statement(tmp_path):
+    manager, driver = make_manager(tmp_path, {"emotion": ("foundation", NODES + "\n" + EDGES)})
+    driver._fail = lambda query: ":NEXT" in query
+
+    assert manager.load_ontology_to_neo4j("emotion")
+
+    assert driver.rollbacks == 1
+    # The UNWIND from the rolled-back batch still lands, as an auto-commit statement
+    retried = [q for q in loaded_queries(driver) if q.transaction is None]
+    assert [q.query.split()[0] for q in retried] == ["UNWIND"]
+    # One statement failed, so the checksum is not recorded and the next run retries
+    assert "emotion" not in driver.checksums
+
+
+def test_unchanged_file_is_skipped_by_checksum(tmp_path):
+    manager, driver = make_manager(tmp_path, {"emotion": ("foundation", NODES)})
+    assert manager.load_ontology_to_neo4j("emotion")
+    first = len(loaded_queries(driver))
+
+    assert manager.load_ontology_to_neo4j("emotion")
+    assert len(loaded_queries(driver)) == first
+
+    assert manager.load_ontology_to_neo4j("emotion", force=True)
+    assert len(loaded_queries(driver)) == 2 * first
+
+
+def test_dependent_file_loads_in_a_later_wave(tmp_path):
+    uses = "MATCH (e:Emotion {id: 'EM000'}) MERGE (e)-[:FELT_IN]->(:Place {id: 'SP001'});"
+    other = "MERGE (:Season {id: 'NT001', name_ja: '春'});"
+    manager, driver = make_manager(tmp_path, {
+        "uses_emotion": ("foundation", uses),
+        "emotion": ("foundation", NODES),
+        "season": ("foundation", other),
+    })
+
+    waves = manager._dependency_waves(["uses_emotion", "emotion", "season"])
+    assert waves == [["emotion", "season"], ["uses_emotion"]]
+
+    results = manager.load_all_ontologies(max_workers=4)
+    assert all(results.values())
+    order = [q.query for q in loaded_queries(driver)]
+    last_emotion = max(i for i, q in enumerate(order) if q.startswith("UNWIND") and ":Emotion" in q)
+    assert order.index(uses[:-1]) > last_emotion
@@ -0,0 +1,122 @@
+import asyncio
+import time
+from email.utils import formatdate
+
+import httpx
+import pytest
+
+from core.ratelimit import AdaptiveConcurrency, RateLimiter, TokenBucket, _retry_after
+
+
+def status_error(code, headers=None):
+    request = httpx.Request("POST", "https://glm.example/chat")
+    response = httpx.Response(code, request=request, headers=headers)
+    return httpx.HTTPStatusError(f"HTTP {code}", request=request, response=response)
+
+
+def make_limiter(**kwargs):
+    window = AdaptiveConcurrency(initial=4, minimum=1, maximum=8, latency_target=1.0, cooldown=0)
+    return RateLimiter(TokenBucket(rate=0, burst=1), window, backoff_base=0, **kwargs)
+
+
+def test_window_grows_additively_and_is_capped():
+    window = AdaptiveConcurrency(initial=4, maximum=5, latency_target=1.0)
+    window.acquire()
+    window.release(0.1)
+    assert window.limit == pytest.approx(4.25)
+    for _ in range(50):
+        window.acquire()
+        window.release(0.1)
+    assert window.limit == 5
+
+
+def test_window_decreases_multiplicatively_with_cooldown():
+    window = AdaptiveConcurrency(initial=8, latency_target=1.0, cooldown=60)
+    window.acquire()
+    window.release(0.1, throttled=True)
+    assert window.limit == 4
+    # A second 429 inside the cooldown does not collapse the window further
+    window.acquire()
+    window.release(0.1, throttled=True)
+    assert window.limit == 4
+
+
+def test_slow_call_shrinks_window():
+    window = AdaptiveConcurrency(initial=10, latency_target=1.0, cooldown=0)
+    window.acquire()
+    window.release(5.0)
+    assert window.limit == pytest.approx(9.0)
+
+
+@pytest.mark.parametrize("error, expected", [
+    (status_error(429), 2.0),
+    (status_error(503), 2.0),
+    (status_error(502), 2.0),
+    (httpx.ConnectTimeout("timed out"), 2.0),
+    (status_error(400), 4.0),
+    (status_error(500), 4.0),
+])
+def test_failures_never_grow_the_window(error, expected):
+    limiter = make_limiter(max_retries=0)
+    started = limiter.acquire()
+    assert limiter.record_failure(error, started, attempt=0) is None
+    assert limiter.window.limit == expected
+    assert limiter.window.inflight == 0
+
+
+def test_retry_after_seconds_and_http_date():
+    assert _retry_after(status_error(429, {"Retry-After": "7"})) == 7.0
+    date = formatdate(time.time() + 30, usegmt=True)
+    assert 25 <= _retry_after(status_error(429, {"Retry-After": date})) <= 30
+    assert _retry_after(status_error(429, {"Retry-After": "soon"})) is None
+    assert _retry_after(status_error(429)) is None
+
+
+def test_backoff_honours_retry_after_up_to_the_cap():
+    limiter = make_limiter(backoff_max=10)
+    assert limiter.backoff(0, status_error(429, {"Retry-After": "4"})) == 4.0
+    assert limiter.backoff(0, status_error(429, {"Retry-After": "120"})) == 10.0
+
+
+def test_call_retries_retryable_errors_then_succeeds():
+    limiter = make_limiter(max_retries=3)
+    errors = [status_error(503), status_error(429)]
+
+    def flaky():
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    assert limiter.call(flaky) == "ok"
+    assert (limiter.calls, limiter.retries, limiter.throttled) == (1, 2, 1)
+    assert limiter.window.inflight == 0
+
+
+def test_call_gives_up_on_non_retryable_errors():
+    limiter = make_limiter(max_retries=3)
+
+    def bad_request():
+        raise status_error(400)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        limiter.call(bad_request)
+    assert limiter.retries == 0
+    assert limiter.window.inflight == 0
+
+
+def test_async_waiters_are_admitted_as_slots_free_up():
+    window = AdaptiveConcurrency(initial=1, maximum=1)
+    order = []
+
+    async def worker(name):
+        await window.acquire_async()
+        order.append(name)
+        await asyncio.sleep(0)
+        window.release(0.01)
+
+    async def main():
+        await asyncio.gather(*(worker(i) for i in range(3)))
+
+    asyncio.run(main())
+    assert order == [0, 1, 2]
+    assert window.inflight == 0
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from core.llm_client import AsyncLLMClient
+
+
+@pytest.fixture
+def api(engine, monkeypatch):
+    # Requesting engine sets the environment (fake backend, tmp stores) the app builds its own from
+    from api import main
+
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    with TestClient(main.app) as client:
+        yield client
+
+
+def test_reload_is_disabled_without_admin_token(api, monkeypatch):
+    from api import main
+
+    monkeypatch.setattr(main, "ADMIN_TOKEN", None)
+    assert api.post("/api/reload", headers={"X-Admin-Token": ""}).status_code == 403
+
+
+def test_reload_requires_the_admin_token(api):
+    assert api.post("/api/reload").status_code == 401
+    assert api.post("/api/reload", headers={"X-Admin-Token": "wrong"}).status_code == 401
+    response = api.post("/api/reload", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.json()["concepts"] > 0
+
+
+def test_retired_client_closes_after_its_last_call():
+    async def scenario():
+        client = AsyncLLMClient()
+        client._get_client()
+        async with client._tracked():
+            await client.retire()
+            assert client._client is not None
+        assert client._client is None
+
+        idle = AsyncLLMClient()
+        idle._get_client()
+        await idle.retire()
+        assert idle._client is None
+
+    asyncio.run(scenario())
+
+
+def test_reload_async_drops_idle_retired_clients(engine):
+    old = engine.async_llm
+    asyncio.run(engine.reload_async())
+    assert engine.async_llm is not old
+    assert engine._retired_async_clients == []
@@ -0,0 +1,79 @@
+import asyncio
+
+from core.fake_llm import CANNED_SOUL, AsyncFakeLLMClient, FakeLLMClient
+from core.schema import StorySoul
+
+SOUL = StorySoul(**CANNED_SOUL)
+
+
+class FailingScene(FakeLLMClient):
+    """Fails the prompt for one scene; every other call answers normally"""
+
+    def __init__(self, scene_id):
+        super().__init__(latency=0)
+        self.scene_id = scene_id
+
+    def _create(self, system_prompt, user_prompt, temperature, kind):
+        if f"# Output ({self.scene_id})" in user_prompt:
+            raise RuntimeError("upstream 500")
+        return super()._create(system_prompt, user_prompt, temperature, kind)
+
+
+class AsyncFailingScene(AsyncFakeLLMClient):
+    def __init__(self, scene_id):
+        super().__init__(latency=0)
+        self.scene_id = scene_id
+
+    async def _post(self, payload, kind):
+        if f"# Output ({self.scene_id})" in payload["messages"][-1]["content"]:
+            raise RuntimeError("upstream 500")
+        return await super()._post(payload, kind)
+
+
+def test_failed_scene_is_summarized_not_rendered_as_an_error(engine):
+    engine.llm = FailingScene("SC02")
+    story = engine.instantiate_scenes(SOUL, "jidai")
+    assert "Error" not in story and "upstream" not in story
+    assert "〔メロスは走る（希望）〕" in story
+
+
+def test_failed_scene_is_flagged_and_retried_on_the_next_render(engine):
+    engine.async_llm = AsyncFailingScene("SC02")
+    result = asyncio.run(engine.regenerate_scenes_async(SOUL, "jidai"))
+    assert [(s["id"], s["cached"], s["failed"]) for s in result["scenes"]] == [
+        ("SC01", False, False), ("SC02", False, True),
+    ]
+    assert any("Scene Fallback: SC02" in line for line in result["logs"])
+
+    engine.async_llm = AsyncFakeLLMClient(latency=0)
+    result = asyncio.run(engine.regenerate_scenes_async(SOUL, "jidai"))
+    assert [(s["id"], s["cached"], s["failed"]) for s in result["scenes"]] == [
+        ("SC01", True, False), ("SC02", False, False),
+    ]
+
+
+def test_second_scene_render_makes_no_calls_even_with_an_empty_cast(engine):
+    # The fake's cast-sheet answer names no character, so the cast is empty
+    engine.llm = FakeLLMClient(latency=0)
+    first = engine.instantiate_scenes(SOUL, "jidai")
+    calls = engine.llm.calls
+    assert calls == 1 + len(SOUL.structure)
+    assert engine.instantiate_scenes(SOUL, "jidai") == first
+    assert engine.llm.calls == calls
+
+
+def test_whole_story_is_cached_across_sync_async_and_stream(engine):
+    engine.llm, engine.async_llm = FakeLLMClient(latency=0), AsyncFakeLLMClient(latency=0)
+    story = engine.instantiate_story(SOUL, "jidai", "whole")
+    assert asyncio.run(engine.instantiate_story_async(SOUL, "jidai", "whole")) == story
+
+    async def streamed(domain):
+        return [token async for token in engine.instantiate_story_stream(SOUL, domain, "whole")]
+
+    assert asyncio.run(streamed("jidai")) == [story]
+    assert engine.llm.calls == 1 and engine.async_llm.calls == 0
+
+    # A completed stream is cached for the next render in the same domain
+    assert "".join(asyncio.run(streamed("school"))) == story
+    assert engine.instantiate_story(SOUL, "school", "whole") == story
+    assert engine.llm.calls == 1 and engine.async_llm.calls == 1
@@ -0,0 +1,96 @@
+from core.schema import SceneNode, StorySoul
+from core.segmenter import align_scenes, clean_line, group_scenes, segment_text
+
+AOZORA = """走れメロス
+太宰治
+
+-------------------------------------------------------
+【テキスト中に現れる記号について】
+《》：ルビ
+-------------------------------------------------------
+
+第一章
+　メロスは激怒した。必ず、かの邪智暴虐《じゃちぼうぎゃく》の王を除かなければならぬと決意した。
+「市を暴君の手から救うのだ」
+「罪の無い人を殺して、何が平和だ」
+　メロスは単純な男であった。
+
+＊＊＊
+
+　メロスは走った。
+
+第二章
+　セリヌンティウスは待っていた。
+
+
+　夜が明けた。
+
+底本：「走れメロス」新潮文庫
+"""
+
+
+def test_headings_breaks_and_blank_runs_start_scenes():
+    segmentation = segment_text(AOZORA)
+    assert segmentation.title == "走れメロス"
+    assert [scene.heading for scene in segmentation.scenes] == ["第一章", None, "第二章", None]
+    assert [scene.id for scene in segmentation.scenes] == ["SC01", "SC02", "SC03", "SC04"]
+    # The colophon is not part of the body
+    assert "底本" not in segmentation.compact()
+
+
+def test_blocks_keep_offsets_and_group_dialogue():
+    scene = segment_text(AOZORA).scenes[0]
+    assert [block.kind for block in scene.blocks] == ["heading", "paragraph", "dialogue", "paragraph"]
+    dialogue = scene.blocks[2]
+    assert dialogue.lines == 2
+    assert AOZORA[dialogue.start:dialogue.end].startswith("「市を")
+    # Ruby is removed from the prompt text but the offsets still point at the source
+    paragraph = scene.blocks[1]
+    assert "《" not in paragraph.text
+    assert "《じゃちぼうぎゃく》" in AOZORA[paragraph.start:paragraph.end]
+    assert scene.compact().startswith("[SC01] 第一章\nメロスは激怒した。")
+
+
+def test_bare_numerals_are_headings_but_prose_is_not():
+    segmentation = segment_text("一\n本文です。\n十六の春だった。\n二\n続きです。")
+    assert [scene.heading for scene in segmentation.scenes] == ["一", "二"]
+
+
+def test_max_scene_chars_splits_paragraphs_and_dialogue():
+    text = "\n".join(["あいうえお。" * 30, "「かきくけこ」" * 40, *["「さしすせそ」"] * 30])
+    segmentation = segment_text(text, max_scene_chars=100)
+    assert all(scene.end - scene.start <= 100 for scene in segmentation.scenes)
+    assert segmentation.scenes[0].start == 0 and segmentation.scenes[-1].end == len(text)
+
+
+def test_an_edit_only_moves_nearby_boundaries():
+    paragraphs = [f"段落{i}の本文。" + "文章。" * (5 + i % 7) for i in range(60)]
+    before = segment_text("\n".join(paragraphs), max_scene_chars=200)
+    paragraphs[30] = paragraphs[30].replace("本文", "書き換えた本文")
+    after = segment_text("\n".join(paragraphs), max_scene_chars=200)
+    bodies_before = {scene.body() for scene in before.scenes}
+    unchanged = sum(1 for scene in after.scenes if scene.body() in bodies_before)
+    assert unchanged >= len(after.scenes) - 3
+
+
+def test_group_scenes_counts_overhead_against_the_budget():
+    segmentation = segment_text("\n\n\n".join(f"場面{i}。" + "本文。" * 20 for i in range(10)))
+    for overhead in (0, 50):
+        groups = group_scenes(segmentation.scenes, 300, overhead)
+        assert [s for group in groups for s in group] == segmentation.scenes
+        for group in groups:
+            assert overhead + len(segmentation.compact(group)) <= 300
+
+
+def test_align_scenes_attaches_offsets_by_id():
+    segmentation = segment_text(AOZORA)
+    soul = StorySoul(title="t", characters=[], relationships=[],
+                     structure=[SceneNode(id="SC02"), SceneNode(id="SC99")])
+    aligned = align_scenes(soul, segmentation.scenes)
+    scene = segmentation.scenes[1]
+    assert aligned.structure[0].source_span == (scene.start, scene.end)
+    assert aligned.structure[1].source_span is None
+
+
+def test_clean_line_strips_ruby_and_indentation():
+    assert clean_line("　｜邪智暴虐《じゃちぼうぎゃく》の王［＃「王」に傍点］") == "邪智暴虐の王"
@@ -0,0 +1,128 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from core.fake_llm import AsyncFakeLLMClient, FakeLLMClient
+from core.singleflight import AsyncSingleFlight, SingleFlight, flight_key
+
+
+def test_flight_key_ignores_argument_order():
+    assert flight_key(model="m", prompt="p") == flight_key(prompt="p", model="m")
+    assert flight_key(model="m", prompt="p") != flight_key(model="m", prompt="q")
+
+
+def run_concurrently(flight, key, fn, callers):
+    # fn blocks until released, so the callers are left running in the background
+    pool = ThreadPoolExecutor(max_workers=callers)
+    futures = [pool.submit(flight.do, key, fn) for _ in range(callers)]
+    pool.shutdown(wait=False)
+    return futures
+
+
+def test_concurrent_identical_calls_run_once():
+    flight = SingleFlight()
+    release = threading.Event()
+    runs = []
+
+    def fn():
+        runs.append(1)
+        release.wait(5)
+        return {"scenes": ["SC01"]}
+
+    futures = run_concurrently(flight, "k", fn, 4)
+    while flight.stats()["calls"] < 4:
+        time.sleep(0.001)
+    release.set()
+    results = [f.result() for f in futures]
+
+    assert len(runs) == 1
+    assert all(r == {"scenes": ["SC01"]} for r in results)
+    # Waiters get copies, so one caller mutating its result cannot affect another
+    assert len({id(r) for r in results}) == 4
+    assert flight.stats() == {"calls": 4, "upstream": 1, "coalesced": 3, "inflight": 0}
+
+
+def test_errors_reach_every_waiting_caller():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fn():
+        release.wait(5)
+        raise ValueError("upstream failed")
+
+    futures = run_concurrently(flight, "k", fn, 3)
+    while flight.stats()["calls"] < 3:
+        time.sleep(0.001)
+    release.set()
+    for future in futures:
+        with pytest.raises(ValueError, match="upstream failed"):
+            future.result()
+
+
+def test_nothing_is_cached_after_completion():
+    flight = SingleFlight()
+    assert flight.do("k", lambda: 1) == 1
+    assert flight.do("k", lambda: 2) == 2
+    assert flight.stats()["upstream"] == 2
+
+
+def test_async_calls_coalesce_and_share_errors():
+    flight = AsyncSingleFlight()
+    runs = []
+
+    async def ok():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return ["SC01"]
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def main():
+        results = await asyncio.gather(*(flight.do("ok", ok) for _ in range(3)))
+        errors = await asyncio.gather(*(flight.do("bad", failing) for _ in range(3)), return_exceptions=True)
+        return results, errors
+
+    results, errors = asyncio.run(main())
+    assert len(runs) == 1 and results == [["SC01"]] * 3
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert flight.stats() == {"calls": 6, "upstream": 2, "coalesced": 4, "inflight": 0}
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_call():
+    flight = AsyncSingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do("k", slow))
+        waiter = asyncio.ensure_future(flight.do("k", slow))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        return await leader, waiter
+
+    result, waiter = asyncio.run(main())
+    assert result == "done"
+    assert waiter.cancelled()
+
+
+def test_fake_clients_coalesce_identical_prompts():
+    client = FakeLLMClient(latency=0.05)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        stories = list(pool.map(lambda _: client.generate_text("system", "user"), range(4)))
+    assert len(set(stories)) == 1
+    assert client.calls == 1
+
+    async_client = AsyncFakeLLMClient(latency=0.01)
+
+    async def main():
+        return await asyncio.gather(*(async_client.generate_text("system", "user") for _ in range(4)))
+
+    assert len(set(asyncio.run(main()))) == 1
+    assert async_client.calls == 1
@@ -0,0 +1,38 @@
+from core.stitching import apply_cast, clean_scene, next_part, parse_cast, stitch, stitch_parts
+
+CAST = {"メロス": "若き剣士", "セリヌンティウス": "石工の友"}
+
+
+def test_parse_cast_keeps_known_names_only():
+    data = {"cast": {" メロス ": "若き剣士", "王": "暴君", "セリヌンティウス": "", "ディオニス": 3}}
+    assert parse_cast(data, ["メロス", "セリヌンティウス", "ディオニス"]) == {"メロス": "若き剣士"}
+    assert parse_cast({"メロス": "若き剣士"}, ["メロス"]) == {"メロス": "若き剣士"}
+    assert parse_cast(["メロス"], ["メロス"]) == {}
+
+
+def test_clean_scene_drops_headings_and_trailers():
+    text = "## 第2場面\n【SC02】\n\n夕暮れの街道を走った。\n友が待っている。\n\n（続く）\n"
+    assert clean_scene(text) == "夕暮れの街道を走った。\n友が待っている。"
+    assert clean_scene("SC03: 夜明け\n朝が来た。") == "朝が来た。"
+
+
+def test_clean_scene_keeps_long_first_lines():
+    line = "【" + "あ" * 50 + "】と彼は叫んだ。"
+    assert clean_scene(line) == line
+
+
+def test_apply_cast_prefers_longer_names_and_skips_self_contained_ones():
+    assert apply_cast("メロスはセリヌンティウスを抱いた。", CAST) == "若き剣士は石工の友を抱いた。"
+    assert apply_cast("メロスは走った。", {"メロス": "メロス王"}) == "メロスは走った。"
+
+
+def test_next_part_drops_a_repeated_opening_sentence():
+    previous = "陽が沈みかけていた。若き剣士は走った。"
+    assert next_part(previous, "メロスは走った。友の姿が見えた。", CAST) == "友の姿が見えた。"
+    assert next_part(None, "メロスは走った。", CAST) == "若き剣士は走った。"
+
+
+def test_stitch_parts_keeps_one_entry_per_scene():
+    parts = ["【SC01】\nメロスは激怒した。", "（続く）", "メロスは激怒した。王城へ向かった。"]
+    assert stitch_parts(parts, CAST) == ["若き剣士は激怒した。", "", "王城へ向かった。"]
+    assert stitch(parts, CAST) == "若き剣士は激怒した。\n\n王城へ向かった。"
@@ -0,0 +1,41 @@
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def api(engine):
+    # Requesting engine sets the environment (fake backend, tmp stores) the app builds its own from
+    from api import main
+
+    with TestClient(main.app) as client:
+        yield client
+
+
+def test_stream_upload_of_text_ends_with_the_document_id(api):
+    response = api.post("/api/upload/stream", files={"file": ("story.txt", "メロスは激怒した。".encode("utf-8"))})
+    assert response.status_code == 200
+    events = [block.split("\n")[0] for block in response.text.strip().split("\n\n")]
+    assert events == ["event: meta", "event: text", "event: done"]
+
+
+def test_stream_upload_maps_client_errors_to_4xx(api, monkeypatch):
+    from api import main
+
+    response = api.post("/api/upload/stream", files={"file": ("story.txt", b"\xff\xfe\x80\x81\x82")})
+    assert response.status_code == 400
+
+    monkeypatch.setattr(main, "MAX_UPLOAD_BYTES", 4)
+    response = api.post("/api/upload/stream", files={"file": ("story.txt", b"0123456789")})
+    assert response.status_code == 413
+
+
+def test_stream_upload_maps_unexpected_errors_to_500(api, monkeypatch):
+    from api import main
+
+    async def broken(file):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(main, "read_text_upload", broken)
+    response = api.post("/api/upload/stream", files={"file": ("story.txt", b"text")})
+    assert response.status_code == 500
+    assert response.json() == {"detail": "disk full"}